@@ -0,0 +1,347 @@
+"""Admission control for the public submission routes.
+
+Runs as ASGI middleware in front of the handlers, so a rejected request
+costs a dictionary lookup or two and never reaches pydantic validation,
+MongoDB or the mail queue. In order, a POST to a guarded path goes through:
+
+1. ``Idempotency-Key`` replay: a key seen before gets the stored response
+   of the first request back (a key still in flight gets a 409);
+2. a per-client-IP token bucket, checked before the body is read;
+3. a per-email token bucket, on the ``email``/``client_email`` field;
+4. content dedupe: an identical body on the same path within the window
+   gets the first response replayed instead of creating a second record.
+
+On the batch paths every item is charged: the IP bucket takes one token
+before the body is read and one more per further item once it is, and each
+email takes one token per item carrying it. A charge larger than the burst
+is admitted from a full bucket and leaves it in debt, so a big batch waits
+for the bucket to be full rather than never passing.
+
+Buckets are ``(tokens, last refill)`` tuples in a dict keyed by IP or
+email, swept periodically for entries idle long enough to be full again.
+All state is per process, which is enough to blunt bursts and
+double-clicks; it is not a global quota.
+"""
+import hashlib
+import math
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+import orjson
+
+# Bodies beyond this are rejected without being parsed
+MAX_BODY_BYTES = 64 * 1024
+
+
+class TokenBuckets:
+    """One token bucket per key: ``capacity`` burst, refilled at ``rate`` tokens/second"""
+
+    def __init__(self, rate: float, capacity: float, sweep_interval: float = 60.0, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._next_sweep = clock() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, cost: float = 1) -> float:
+        """0 when ``cost`` tokens were taken, otherwise seconds until they are available
+
+        A cost above ``capacity`` only needs a full bucket and leaves it negative.
+        """
+        now = self.clock()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        needed = min(cost, self.capacity)
+        if tokens < needed:
+            self._buckets[key] = (tokens, now)
+            return (needed - tokens) / self.rate
+        self._buckets[key] = (tokens - cost, now)
+        return 0.0
+
+    def sweep(self, now: Optional[float] = None):
+        """Drop buckets that have refilled completely; they behave like absent ones"""
+        now = self.clock() if now is None else now
+        self._buckets = {
+            k: (tokens, updated) for k, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate < self.capacity
+        }
+        self._next_sweep = now + self.sweep_interval
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status: int
+    headers: Tuple[Tuple[bytes, bytes], ...]
+    body: bytes
+
+
+# Marks a key whose first request has not finished yet
+IN_FLIGHT = object()
+
+
+class ExpiringStore:
+    """Insertion-ordered map whose entries expire ``ttl`` seconds after being set"""
+
+    def __init__(self, ttl: float, maxsize: int, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self, now: float):
+        # Every entry lives for the same ttl, so the oldest expire first
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        self._expire(self.clock())
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def set(self, key: str, value):
+        now = self.clock()
+        self._expire(now)
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        ip_rate: float = 0.2,
+        ip_burst: float = 10,
+        email_rate: float = 0.05,
+        email_burst: float = 3,
+        dedupe_window: float = 60.0,
+        idempotency_ttl: float = 24 * 3600.0,
+        max_entries: int = 100_000,
+        forwarded_hops: int = 0,
+        clock=time.monotonic,
+    ):
+        self.ip_buckets = TokenBuckets(ip_rate, ip_burst, clock=clock)
+        self.email_buckets = TokenBuckets(email_rate, email_burst, clock=clock)
+        self.recent = ExpiringStore(dedupe_window, max_entries, clock=clock)
+        self.idempotent = ExpiringStore(idempotency_ttl, max_entries, clock=clock)
+        # Proxies in front of the app that append to X-Forwarded-For; 0 uses the socket peer
+        self.forwarded_hops = forwarded_hops
+        self.rejected: Dict[str, int] = {"ip": 0, "email": 0, "duplicate": 0, "in_flight": 0, "too_large": 0}
+        self.replayed = 0
+
+    def client_ip(self, scope) -> str:
+        if self.forwarded_hops:
+            # Entries are appended left to right; only the last ``forwarded_hops`` were added
+            # by our proxies, anything further left came from the client and is not trusted
+            entries = [
+                entry.strip()
+                for name, value in scope["headers"] if name == b"x-forwarded-for"
+                for entry in value.decode("latin-1").split(",")
+            ]
+            if len(entries) >= self.forwarded_hops:
+                return entries[-self.forwarded_hops]
+        client = scope.get("client")
+        return client[0] if client else ""
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _parse(body: bytes):
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        # Left for the handler to reject; the raw bytes still dedupe
+        return None
+
+
+def _submission_email(payload) -> Optional[str]:
+    if not isinstance(payload, dict):
+        return None
+    email = payload.get("email") or payload.get("client_email")
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def _content_key(path: str, body: bytes, payload) -> str:
+    # Key order and whitespace do not make a submission different
+    canonical = body if payload is None else orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(path.encode() + b"\0" + canonical).hexdigest()
+
+
+async def _send_json(send, status: int, detail: str, headers: Iterable[Tuple[bytes, bytes]] = ()):
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, stored: StoredResponse):
+    await send({
+        "type": "http.response.start",
+        "status": stored.status,
+        "headers": [*stored.headers, (b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": stored.body})
+
+
+async def _too_many(send, retry_after: float):
+    await _send_json(
+        send, 429, "Trop de requêtes, veuillez réessayer plus tard",
+        [(b"retry-after", str(max(1, math.ceil(retry_after))).encode())],
+    )
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying an AdmissionController to POSTs on ``paths`` and ``batch_paths``
+
+    A batch path takes a JSON array of submissions and a body of up to ``batch_max_body`` bytes.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str],
+                 batch_paths: Iterable[str] = (), batch_max_body: int = MAX_BODY_BYTES):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+        self.batch_paths = frozenset(batch_paths)
+        self.batch_max_body = batch_max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or (
+            scope["path"] not in self.paths and scope["path"] not in self.batch_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+        batch = scope["path"] in self.batch_paths
+        max_body = self.batch_max_body if batch else MAX_BODY_BYTES
+
+        controller = self.controller
+        key = _header(scope, b"idempotency-key")
+        idempotency_key = f"{scope['path']}\0{key.decode('latin-1')}" if key else None
+        if idempotency_key:
+            stored = controller.idempotent.get(idempotency_key)
+            if stored is IN_FLIGHT:
+                controller.rejected["in_flight"] += 1
+                await _send_json(send, 409, "Requête déjà en cours de traitement")
+                return
+            if stored is not None:
+                controller.replayed += 1
+                await _replay(send, stored)
+                return
+
+        client_ip = controller.client_ip(scope)
+        wait = controller.ip_buckets.take(client_ip)
+        if wait:
+            controller.rejected["ip"] += 1
+            await _too_many(send, wait)
+            return
+
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.extend(message.get("body", b""))
+            more_body = message.get("more_body", False)
+            if len(body) > max_body:
+                controller.rejected["too_large"] += 1
+                await _send_json(send, 413, "Requête trop volumineuse")
+                return
+        body = bytes(body)
+
+        payload = _parse(body)
+        if batch:
+            items = payload if isinstance(payload, list) else []
+            if len(items) > 1:
+                wait = controller.ip_buckets.take(client_ip, len(items) - 1)
+                if wait:
+                    controller.rejected["ip"] += 1
+                    await _too_many(send, wait)
+                    return
+        else:
+            items = [payload]
+        emails = Counter(email for email in map(_submission_email, items) if email)
+        for email, count in emails.items():
+            wait = controller.email_buckets.take(email, count)
+            if wait:
+                controller.rejected["email"] += 1
+                await _too_many(send, wait)
+                return
+
+        content_key = _content_key(scope["path"], body, payload)
+        stored = controller.recent.get(content_key)
+        if stored is IN_FLIGHT:
+            controller.rejected["duplicate"] += 1
+            await _send_json(send, 409, "Requête déjà en cours de traitement")
+            return
+        if stored is not None:
+            controller.replayed += 1
+            await _replay(send, stored)
+            return
+
+        claims = [(controller.recent, content_key)]
+        if idempotency_key:
+            claims.append((controller.idempotent, idempotency_key))
+        await self._forward(scope, receive, send, body, claims)
+
+    async def _forward(self, scope, receive, send, body: bytes, claims):
+        """Run the handler on the buffered body; store its response under every claimed key"""
+        for store, key in claims:
+            store.set(key, IN_FLIGHT)
+
+        delivered = False
+
+        async def replay_body():
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        stored = None
+        try:
+            await self.app(scope, replay_body, capture)
+            # Only successes are remembered; a failed attempt can be retried as is
+            if start is not None and 200 <= start["status"] < 300:
+                stored = StoredResponse(start["status"], tuple(start.get("headers", ())), b"".join(chunks))
+        finally:
+            for store, key in claims:
+                if stored is not None:
+                    store.set(key, stored)
+                else:
+                    store.discard(key)
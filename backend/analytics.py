@@ -0,0 +1,235 @@
+"""Quote analytics rollups.
+
+``quote_stats`` holds one document per (UTC day, service id) with the
+number of quotes that included the service and the USD revenue attributed
+to it, plus one ``service: "*"`` document per day with whole-quote totals.
+Creating a quote applies ``$inc`` upserts to those buckets in a single
+bulk write, so dashboards read O(days x services) documents instead of
+scanning quotes.
+
+Revenue attribution: an à-la-carte line goes to its service; a pack's price
+is split across the requested services it covers, pro rata to their list
+prices. Attributed revenue therefore sums to the quote's ``total_usd``.
+
+    python analytics.py --rebuild     # recompute every rollup from raw and archived quotes
+"""
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, time, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from retention import iter_archived
+
+logger = logging.getLogger(__name__)
+
+ALL_SERVICES = "*"
+
+# (day, service) -> [quotes, revenue_usd]
+Buckets = Dict[Tuple[datetime, str], List[float]]
+
+
+def bucket_day(created_at) -> datetime:
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return datetime.combine(created_at.astimezone(timezone.utc).date(), time(), tzinfo=timezone.utc)
+
+
+def allocate_revenue(quote: dict, list_price: Callable[[str], float]) -> Dict[str, float]:
+    """USD revenue of one quote per requested service id"""
+    services = quote["services"]
+    pricing = quote.get("pricing")
+    if not pricing:
+        # Quotes stored before server-side pricing: split the total evenly
+        share = quote.get("total_usd", 0) / len(services) if services else 0
+        return {s: share for s in services}
+
+    revenue = {item["id"]: item["price_usd"] for item in pricing["items"]}
+    requested = set(services)
+    for pack in pricing["packs"]:
+        covered = [s for s in pack["services"] if s in requested]
+        weights = [list_price(s) for s in covered]
+        total_weight = sum(weights) or len(covered)
+        for service_id, weight in zip(covered, weights):
+            share = (weight or 1) / total_weight * pack["price_usd"]
+            revenue[service_id] = revenue.get(service_id, 0) + share
+    return revenue
+
+
+def add_quote(buckets: Buckets, quote: dict, list_price: Callable[[str], float]):
+    day = bucket_day(quote["created_at"])
+    for service_id, revenue in allocate_revenue(quote, list_price).items():
+        bucket = buckets[(day, service_id)]
+        bucket[0] += 1
+        bucket[1] += revenue
+    total = buckets[(day, ALL_SERVICES)]
+    total[0] += 1
+    total[1] += quote.get("total_usd", 0)
+
+
+def _bucket_id(day: datetime, service_id: str) -> str:
+    return f"{day.date().isoformat()}|{service_id}"
+
+
+def rollup_updates(buckets: Buckets, category_of: Callable[[str], Optional[str]]) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"_id": _bucket_id(day, service_id)},
+            {
+                "$inc": {"quotes": int(quotes), "revenue_usd": round(revenue, 4)},
+                "$setOnInsert": {"day": day, "service": service_id, "category": category_of(service_id)},
+            },
+            upsert=True,
+        )
+        for (day, service_id), (quotes, revenue) in buckets.items()
+    ]
+
+
+class QuoteRollups:
+    def __init__(self, collection, list_price: Callable[[str], float], category_of: Callable[[str], Optional[str]]):
+        self.collection = collection
+        self.list_price = list_price
+        self.category_of = category_of
+
+    async def record(self, quotes: Iterable[dict]):
+        """Fold freshly created quotes into their day/service buckets"""
+        buckets: Buckets = defaultdict(lambda: [0, 0.0])
+        for quote in quotes:
+            add_quote(buckets, quote, self.list_price)
+        if buckets:
+            await self.collection.bulk_write(rollup_updates(buckets, self.category_of), ordered=False)
+
+    async def query(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> dict:
+        """Totals, per-day, per-service and per-category series for [since, until)
+
+        Rollups are per UTC day, so both bounds are rounded down to their day:
+        the result covers every day from since's up to, not including, until's.
+        """
+        bounds = {}
+        if since:
+            bounds["$gte"] = bucket_day(since)
+        if until:
+            bounds["$lt"] = bucket_day(until)
+        query = {"day": bounds} if bounds else {}
+        docs = await self.collection.find(query, {"_id": 0}).sort("day", 1).to_list(None)
+
+        totals = {"quotes": 0, "revenue_usd": 0.0}
+        by_day = []
+        by_service: Dict[str, dict] = {}
+        by_category: Dict[str, dict] = {}
+        for doc in docs:
+            if doc["service"] == ALL_SERVICES:
+                totals["quotes"] += doc["quotes"]
+                totals["revenue_usd"] += doc["revenue_usd"]
+                by_day.append({"day": doc["day"], "quotes": doc["quotes"], "revenue_usd": round(doc["revenue_usd"], 2)})
+                continue
+            service = by_service.setdefault(doc["service"], {
+                "service": doc["service"], "category": doc.get("category"), "quotes": 0, "revenue_usd": 0.0,
+            })
+            service["quotes"] += doc["quotes"]
+            service["revenue_usd"] += doc["revenue_usd"]
+            # A quote with several services of one category counts once per service here
+            category = by_category.setdefault(doc.get("category"), {
+                "category": doc.get("category"), "services_sold": 0, "revenue_usd": 0.0,
+            })
+            category["services_sold"] += doc["quotes"]
+            category["revenue_usd"] += doc["revenue_usd"]
+
+        def ranked(rows):
+            rows = sorted(rows, key=lambda r: r["revenue_usd"], reverse=True)
+            for row in rows:
+                row["revenue_usd"] = round(row["revenue_usd"], 2)
+            return rows
+
+        totals["revenue_usd"] = round(totals["revenue_usd"], 2)
+        return {
+            "totals": totals,
+            "by_day": by_day,
+            "by_service": ranked(by_service.values()),
+            "by_category": ranked(by_category.values()),
+        }
+
+    async def rebuild(self, quotes_collection, batch_size: int = 1000) -> int:
+        """Recompute every bucket from raw and archived quotes and swap them in.
+
+        Buckets are accumulated in memory (O(days x services)), written to a
+        scratch collection and renamed over ``quote_stats`` in one step.
+        Quotes created while the rebuild runs may be missed; rerun it during
+        a quiet period if exact counts matter.
+        """
+        buckets: Buckets = defaultdict(lambda: [0, 0.0])
+        count = 0
+        cursor = quotes_collection.find(
+            {}, {"_id": 0, "services": 1, "pricing": 1, "total_usd": 1, "created_at": 1}
+        ).batch_size(batch_size)
+        async for quote in cursor:
+            add_quote(buckets, quote, self.list_price)
+            count += 1
+
+        async def add_archived(batch: List[dict]) -> int:
+            # An interrupted retention run leaves archived quotes in the hot collection too
+            ids = [quote["id"] for quote in batch]
+            still_hot = {doc["id"] async for doc in quotes_collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})}
+            archived = [quote for quote in batch if quote["id"] not in still_hot]
+            for quote in archived:
+                add_quote(buckets, quote, self.list_price)
+            return len(archived)
+
+        batch = []
+        async for quote in iter_archived(quotes_collection.database, quotes_collection.name):
+            batch.append(quote)
+            if len(batch) >= batch_size:
+                count += await add_archived(batch)
+                batch = []
+        if batch:
+            count += await add_archived(batch)
+
+        database = self.collection.database
+        scratch = database[f"{self.collection.name}_rebuild"]
+        await scratch.drop()
+        updates = rollup_updates(buckets, self.category_of)
+        for start in range(0, len(updates), batch_size):
+            await scratch.bulk_write(updates[start:start + batch_size], ordered=False)
+        if updates:
+            await scratch.rename(self.collection.name, dropTarget=True)
+        else:
+            await self.collection.drop()
+        logger.info(f"Rebuilt {len(updates)} quote rollups from {count} quotes")
+        return count
+
+
+async def _main(argv: List[str]) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    if "--rebuild" not in argv:
+        print(__doc__)
+        return 2
+
+    load_dotenv(Path(__file__).parent / '.env')
+    # Importing server opens no connections; it provides the catalog lookups
+    import server
+    from indexes import ensure_indexes
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    try:
+        rollups = QuoteRollups(db.quote_stats, server.rollup_list_price, server.rollup_category)
+        await rollups.rebuild(db.quotes)
+        # The renamed collection comes without the rollup index
+        await ensure_indexes(db)
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,208 @@
+"""Server side of the Julia assistant.
+
+Two entry points share one retrieval index:
+
+* ``recommend(answers)`` turns quiz answers (one option index per
+  question) into a pack and/or services that fit the stated budget;
+* ``answer(message)`` matches a free-text question against services, packs
+  and the FAQ.
+
+The index holds L2-normalised TF-IDF vectors for every document in a NumPy
+matrix, so ranking a query is one matrix-vector product (cosine scores).
+It is rebuilt with each catalog version. Answers only carry ids; prices are
+attached by the caller from the current rate version, which keeps the LRU
+caches valid across rate changes.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from search import tokenize
+
+QUIZ_QUESTIONS = [
+    {
+        "id": 1,
+        "question": "Quel est votre objectif principal ?",
+        "options": [
+            {"text": "Créer ma présence en ligne", "tags": ["site-vitrine", "logo"]},
+            {"text": "Vendre en ligne", "tags": ["ecommerce", "site-pro"]},
+            {"text": "Automatiser mon business", "tags": ["agent-ai", "automatisation"]},
+            {"text": "Lancer mon entreprise", "tags": ["business-plan", "coaching"]},
+        ],
+    },
+    {
+        "id": 2,
+        "question": "Quel est votre budget approximatif ?",
+        "options": [
+            {"text": "Moins de 200$", "budget": 200},
+            {"text": "200$ - 500$", "budget": 500},
+            {"text": "500$ - 1000$", "budget": 1000},
+            {"text": "Plus de 1000$", "budget": 2000},
+        ],
+    },
+    {
+        "id": 3,
+        "question": "Quel est votre secteur d'activité ?",
+        "options": [
+            {"text": "Commerce / Retail", "tags": ["ecommerce", "identite-visuelle"]},
+            {"text": "Services / Consulting", "tags": ["site-pro", "agent-ai"]},
+            {"text": "Tech / Startup", "tags": ["app-web", "prototype-ai-iot"]},
+            {"text": "Autre", "tags": ["site-vitrine", "logo"]},
+        ],
+    },
+]
+
+DEFAULT_BUDGET = 500
+
+FAQ = [
+    {
+        "id": "faq-delais",
+        "question": "Quels sont vos délais de livraison ? combien de temps",
+        "answer": "Nos délais sont optimisés ⚡\n\n• Site vitrine: 72h\n• Application web: 168h (7 jours)\n• Projet IA: 2 semaines\n\nOn est rapides ! 🚀",
+    },
+    {
+        "id": "faq-tarifs",
+        "question": "Quels sont vos prix, tarifs et coûts ? combien ça coûte",
+        "answer": "Pour les tarifs, je te conseille de consulter notre section Tarifs ou de générer un devis personnalisé ! 💰",
+    },
+    {
+        "id": "faq-contact",
+        "question": "Comment vous contacter ? WhatsApp, email, téléphone, appel",
+        "answer": "Tu peux nous écrire sur WhatsApp au +243 846 378 116 ou par email à serviceneuronova@gmail.com 📧",
+    },
+    {
+        "id": "faq-salutation",
+        "question": "Bonjour salut hello",
+        "answer": "Salut ! 👋 Bienvenue chez Neuronova ! Comment puis-je t'aider aujourd'hui ?",
+    },
+]
+
+# Below this cosine score a free-text message is not considered answered
+MIN_SCORE = 0.12
+
+
+class InvalidQuizAnswers(ValueError):
+    """Raised when answers do not match the quiz questions"""
+
+
+@dataclass(frozen=True)
+class Document:
+    id: str
+    name: str
+    kind: str  # "service", "pack" or "faq"
+    price_usd: Optional[float]
+
+
+class RetrievalIndex:
+    def __init__(self, services_database: dict, packs: List[dict], faq: List[dict] = FAQ):
+        texts = []
+        self.documents: List[Document] = []
+        names = {}
+        for category in services_database.values():
+            for service in category["services"]:
+                names[service["id"]] = service["name"]
+                self.documents.append(Document(service["id"], service["name"], "service", service["price_usd"]))
+                texts.append(f"{service['name']} {service['id']} {category['name']}")
+        for pack in packs:
+            members = " ".join(names.get(s, s) for s in pack["services"])
+            self.documents.append(Document(pack["id"], pack["name"], "pack", pack["price_usd"]))
+            texts.append(f"{pack['name']} {pack.get('description', '')} {members}")
+        self.faq = {entry["id"]: entry["answer"] for entry in faq}
+        for entry in faq:
+            self.documents.append(Document(entry["id"], entry["question"], "faq", None))
+            texts.append(entry["question"])
+
+        tokenized = [tokenize(text) for text in texts]
+        self.vocabulary = {t: i for i, t in enumerate(sorted({t for tokens in tokenized for t in tokens}))}
+        df = np.zeros(len(self.vocabulary))
+        for tokens in tokenized:
+            for token in set(tokens):
+                df[self.vocabulary[token]] += 1
+        self.idf = np.log((1 + len(texts)) / (1 + df)) + 1
+
+        self.matrix = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(tokenized):
+            self.matrix[row] = self._vector(tokens)
+        self.by_id = {d.id: d for d in self.documents}
+        self.kinds = np.array([d.kind for d in self.documents])
+        self.prices = np.array([np.nan if d.price_usd is None else d.price_usd for d in self.documents])
+
+        self._recommend = lru_cache(maxsize=256)(self._recommend_uncached)
+        self._answer = lru_cache(maxsize=1024)(self._answer_uncached)
+
+    def _vector(self, tokens: Sequence[str]) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for token, count in Counter(tokens).items():
+            column = self.vocabulary.get(token)
+            if column is not None:
+                vector[column] = (1 + np.log(count)) * self.idf[column]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of ``text`` to every document"""
+        return self.matrix @ self._vector(tokenize(text))
+
+    def recommend(self, answers: Sequence[int]) -> dict:
+        return self._recommend(tuple(answers))
+
+    def answer(self, message: str) -> dict:
+        return self._answer(" ".join(tokenize(message)))
+
+    def cache_info(self) -> dict:
+        return {"recommend": self._recommend.cache_info()._asdict(), "answer": self._answer.cache_info()._asdict()}
+
+    def _recommend_uncached(self, answers: Tuple[int, ...]) -> dict:
+        if len(answers) != len(QUIZ_QUESTIONS):
+            raise InvalidQuizAnswers(f"Expected {len(QUIZ_QUESTIONS)} answers")
+        options = []
+        for question, index in zip(QUIZ_QUESTIONS, answers):
+            if not 0 <= index < len(question["options"]):
+                raise InvalidQuizAnswers(f"No option {index} for question {question['id']}")
+            options.append(question["options"][index])
+
+        budget = next((o["budget"] for o in options if "budget" in o), DEFAULT_BUDGET)
+        tags = [t for o in options for t in o.get("tags", [])]
+        # Query: the chosen answers plus the services they point at
+        scores = self.scores(" ".join([o["text"] for o in options] + tags))
+        affordable = ~np.isnan(self.prices) & (np.nan_to_num(self.prices, nan=np.inf) <= budget)
+
+        pack = None
+        packs = np.flatnonzero((self.kinds == "pack") & affordable & (scores > 0))
+        if len(packs):
+            pack = self.documents[packs[np.argmax(scores[packs])]].id
+
+        services = np.flatnonzero((self.kinds == "service") & affordable & (scores > 0))
+        ranked = services[np.argsort(-scores[services], kind="stable")][:3]
+
+        if pack:
+            text = "Parfait ! Ce pack correspond à ton objectif et à ton budget. Il inclut tout ce dont tu as besoin pour démarrer ! 🚀"
+        elif budget <= 200:
+            text = "Avec ton budget, je te recommande de commencer par l'essentiel. C'est la base ! 🎯"
+        else:
+            text = "Avec ce budget, tu peux vraiment faire des choses incroyables ! Je te propose un devis personnalisé. 🌟"
+        return {
+            "text": text,
+            "budget": budget,
+            "pack": pack,
+            "services": [self.documents[i].id for i in ranked],
+        }
+
+    def _answer_uncached(self, normalized: str) -> dict:
+        scores = self.scores(normalized)
+        best = int(np.argmax(scores)) if len(scores) else 0
+        if not normalized or scores[best] < MIN_SCORE:
+            return {"text": "Merci pour ton message ! 😊 Pour mieux t'aider, tu peux générer un devis ou parler à l'équipe.", "matches": []}
+
+        document = self.documents[best]
+        if document.kind == "faq":
+            return {"text": self.faq[document.id], "matches": []}
+        catalog = np.flatnonzero((self.kinds != "faq") & (scores >= MIN_SCORE))
+        ranked = catalog[np.argsort(-scores[catalog], kind="stable")][:3]
+        return {
+            "text": "Voici ce qui correspond le mieux à ta demande 👇",
+            "matches": [self.documents[i].id for i in ranked],
+        }
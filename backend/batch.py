@@ -0,0 +1,77 @@
+"""Validation helpers for the batch submission endpoints.
+
+The body is read with a byte limit (``read_body``), so an oversized upload
+is refused while it streams in. It is then decoded once and the items are
+counted before any of them is validated: a batch over ``max_items`` costs a
+JSON parse, not a validation pass. The list is validated in one
+``TypeAdapter(List[Model])`` pass; only when that fails are the items that
+did validate re-checked, so a single bad item costs the batch a second pass
+instead of rejecting it.
+"""
+from typing import AsyncIterator, Dict, List, Tuple, Type
+
+import orjson
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+_adapters: Dict[type, TypeAdapter] = {}
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+class MalformedBatch(ValueError):
+    pass
+
+
+class BodyTooLarge(ValueError):
+    pass
+
+
+async def read_body(chunks: AsyncIterator[bytes], max_bytes: int) -> bytes:
+    """Concatenate a request body stream, raising BodyTooLarge as soon as it passes ``max_bytes``"""
+    body = bytearray()
+    async for chunk in chunks:
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise BodyTooLarge(max_bytes)
+    return bytes(body)
+
+
+def _adapter(model: Type[BaseModel]) -> TypeAdapter:
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = _adapters[model] = TypeAdapter(List[model])
+    return adapter
+
+
+def validate_batch(body: bytes, model: Type[BaseModel], max_items: int) -> Tuple[List[Tuple[int, BaseModel]], List[dict]]:
+    """Split a JSON array body into ``(index, item)`` pairs and per-item errors"""
+    try:
+        raw = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise MalformedBatch(str(e)) from e
+    if not isinstance(raw, list):
+        raise MalformedBatch("expected a JSON array")
+    if len(raw) > max_items:
+        raise BatchTooLarge(len(raw))
+    try:
+        items = _adapter(model).validate_python(raw)
+    except ValidationError as e:
+        return _partial(raw, model, e)
+    return list(enumerate(items)), []
+
+
+def _partial(raw: list, model: Type[BaseModel], error: ValidationError):
+    errors_by_index: Dict[int, List[dict]] = {}
+    for err in error.errors(include_url=False, include_context=False, include_input=False):
+        index = err["loc"][0]
+        errors_by_index.setdefault(index, []).append({"loc": list(err["loc"][1:]), "msg": err["msg"]})
+
+    good = [i for i in range(len(raw)) if i not in errors_by_index]
+    items = _adapter(model).validate_python([raw[i] for i in good])
+    invalid = [
+        {"index": i, "status": "invalid", "errors": errs}
+        for i, errs in sorted(errors_by_index.items())
+    ]
+    return list(zip(good, items)), invalid
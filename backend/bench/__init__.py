@@ -0,0 +1 @@
+"""Local, network-free load and latency benchmarks for the API (python -m bench)"""
@@ -0,0 +1,429 @@
+"""In-memory stand-in for the subset of Motor the API uses.
+
+Collections keep plain dicts in insertion order and evaluate filters in
+Python. Single-field unique indexes are enforced, so duplicate-key paths
+behave like MongoDB, and double as hash lookups for equality queries. This
+is meant for benchmarks and local runs without a server, not as a general
+MongoDB emulator.
+"""
+import asyncio
+import copy
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+
+def _get(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _compare(value, op: str, operand) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+        if op == "$gt":
+            return value > operand
+        return value >= operand
+    except TypeError:
+        # MongoDB only compares values of the same BSON type
+        return False
+
+
+def _match_value(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$in":
+                if isinstance(value, list):
+                    if not any(v in operand for v in value):
+                        return False
+                elif value is _MISSING or value not in operand:
+                    if not (value is _MISSING and None in operand):
+                        return False
+            elif op == "$nin":
+                if _match_value(value, {"$in": operand}):
+                    return False
+            elif op == "$ne":
+                if _match_value(value, operand):
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(operand):
+                    return False
+            elif op == "$type":
+                if operand == "string" and not isinstance(value, str):
+                    return False
+                if operand == "date" and not hasattr(value, "tzinfo"):
+                    return False
+            elif op in ("$lt", "$lte", "$gt", "$gte"):
+                if isinstance(value, list):
+                    if not any(_compare(v, op, operand) for v in value):
+                        return False
+                elif not _compare(value, op, operand):
+                    return False
+            else:
+                raise NotImplementedError(f"Unsupported query operator {op}")
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    if value is _MISSING:
+        return condition is None
+    return value == condition
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif not _match_value(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        projected = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for key, value in projection.items():
+        if not value:
+            doc.pop(key, None)
+    return doc
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool = False):
+    for op, fields in update.items():
+        for key, value in fields.items():
+            if op == "$set":
+                doc[key] = copy.deepcopy(value)
+            elif op == "$setOnInsert":
+                if inserting:
+                    doc[key] = copy.deepcopy(value)
+            elif op == "$unset":
+                doc.pop(key, None)
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + value
+            elif op == "$max":
+                if key not in doc or doc[key] < value:
+                    doc[key] = value
+            elif op == "$min":
+                if key not in doc or doc[key] > value:
+                    doc[key] = value
+            else:
+                raise NotImplementedError(f"Unsupported update operator {op}")
+
+
+# BSON comparison order, so mixed types sort the way MongoDB sorts them
+_TYPE_ORDER = {int: 1, float: 1, str: 2, dict: 3, list: 4, bytes: 5, ObjectId: 6, bool: 7, datetime: 8}
+
+
+def _sort_key(value):
+    # Missing/None sort first
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (_TYPE_ORDER.get(type(value), 9), value)
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, n: int):
+        self._skip = n
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int):
+        return self
+
+    def _results(self) -> List[dict]:
+        docs = [d for d in self._collection._candidates(self._query) if matches(d, self._query)]
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(_get(d, key)), reverse=direction == -1)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(d, self._projection) for d in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        await self._collection._yield()
+        docs = self._results()
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        self._iter = None
+        return self
+
+    async def __anext__(self):
+        if self._iter is None:
+            await self._collection._yield()
+            self._iter = iter(self._results())
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    def __init__(self, name: str, latency: float = 0.0, database: Optional["MemoryDatabase"] = None):
+        self.name = name
+        self.latency = latency
+        self.database = database
+        self._docs: List[dict] = []
+        self._indexes: Dict[str, dict] = {}
+        # Single-field unique indexes double as hash lookups: field -> value -> doc
+        self._unique: Dict[str, Dict[Any, dict]] = {}
+        self._add_index("_id_", [("_id", 1)], unique=True)
+
+    async def _yield(self):
+        # Always give up the loop once, like a real network round trip
+        await asyncio.sleep(self.latency)
+
+    def _add_index(self, name: str, keys, unique: bool):
+        self._indexes[name] = {"key": list(keys), "unique": unique}
+        if unique and len(keys) == 1:
+            field = keys[0][0]
+            if field not in self._unique:
+                self._unique[field] = {
+                    _get(d, field): d for d in self._docs if _get(d, field) is not _MISSING
+                }
+
+    def _reindex(self):
+        for field in self._unique:
+            self._unique[field] = {_get(d, field): d for d in self._docs if _get(d, field) is not _MISSING}
+
+    def _insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        for field, values in self._unique.items():
+            value = _get(doc, field)
+            if value is not _MISSING and value in values:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} dup key: {{ {field}: {value!r} }}", 11000)
+        stored = copy.deepcopy(doc)
+        self._docs.append(stored)
+        for field, values in self._unique.items():
+            value = _get(stored, field)
+            if value is not _MISSING:
+                values[value] = stored
+
+    def _candidates(self, query: Optional[dict]) -> List[dict]:
+        """Docs that may match: a hash lookup for equality on a unique field"""
+        if query:
+            for field, values in self._unique.items():
+                value = query.get(field, _MISSING)
+                if value is not _MISSING and not isinstance(value, (dict, list)):
+                    doc = values.get(value)
+                    return [doc] if doc is not None else []
+        return self._docs
+
+    async def insert_one(self, doc: dict):
+        await self._yield()
+        self._insert(doc)
+        return SimpleNamespace(inserted_id=doc["_id"], acknowledged=True)
+
+    async def insert_many(self, docs: List[dict], ordered: bool = True):
+        await self._yield()
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                self._insert(doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+        return SimpleNamespace(inserted_ids=[d["_id"] for d in docs], acknowledged=True)
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        return MemoryCursor(self, query, projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        await self._yield()
+        for doc in self._candidates(query):
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def count_documents(self, query: dict, **kwargs) -> int:
+        await self._yield()
+        return sum(1 for d in self._docs if matches(d, query))
+
+    def _upsert_doc(self, query: dict, update: dict) -> dict:
+        doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        _apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return doc
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self._yield()
+        for doc in self._candidates(query):
+            if matches(doc, query):
+                _apply_update(doc, update)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = self._upsert_doc(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False):
+        await self._yield()
+        count = 0
+        for doc in self._docs:
+            if matches(doc, query):
+                _apply_update(doc, update)
+                count += 1
+        if not count and upsert:
+            doc = self._upsert_doc(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=count, modified_count=count, upserted_id=None)
+
+    async def bulk_write(self, requests, ordered: bool = True):
+        """UpdateOne requests only, which is all the API sends"""
+        matched = modified = 0
+        upserted_ids = {}
+        for index, request in enumerate(requests):
+            result = await self.update_one(request._filter, request._doc, upsert=bool(request._upsert))
+            matched += result.matched_count
+            modified += result.modified_count
+            if result.upserted_id is not None:
+                upserted_ids[index] = result.upserted_id
+        return SimpleNamespace(
+            matched_count=matched, modified_count=modified, upserted_ids=upserted_ids, acknowledged=True,
+        )
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None,
+                                  upsert: bool = False, return_document: bool = False, **kwargs):
+        await self._yield()
+        for doc in self._candidates(query):
+            if matches(doc, query):
+                before = _project(doc, projection)
+                _apply_update(doc, update)
+                return _project(doc, projection) if return_document else before
+        if upsert:
+            doc = self._upsert_doc(query, update)
+            return _project(doc, projection) if return_document else None
+        return None
+
+    async def delete_one(self, query: dict):
+        await self._yield()
+        for i, doc in enumerate(self._docs):
+            if matches(doc, query):
+                del self._docs[i]
+                self._reindex()
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def delete_many(self, query: dict):
+        await self._yield()
+        before = len(self._docs)
+        self._docs = [d for d in self._docs if not matches(d, query)]
+        self._reindex()
+        return SimpleNamespace(deleted_count=before - len(self._docs))
+
+    async def create_indexes(self, models) -> List[str]:
+        names = []
+        for model in models:
+            spec = model.document
+            self._add_index(spec["name"], list(spec["key"].items()), spec.get("unique", False))
+            names.append(spec["name"])
+        return names
+
+    async def create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        name = kwargs.get("name") or "_".join(f"{k}_{d}" for k, d in keys)
+        self._add_index(name, list(keys), kwargs.get("unique", False))
+        return name
+
+    async def drop(self):
+        if self.database is not None:
+            self.database._collections.pop(self.name, None)
+        self._docs = []
+        self._reindex()
+
+    async def rename(self, new_name: str, dropTarget: bool = False):
+        collections = self.database._collections
+        if new_name in collections and not dropTarget:
+            raise OperationFailure(f"target namespace exists: {new_name}")
+        # Handles address collections by name: the target's handle sees the renamed contents
+        target = self.database[new_name]
+        target._docs, target._indexes, target._unique = self._docs, self._indexes, self._unique
+        collections.pop(self.name, None)
+        self._docs, self._indexes, self._unique = [], {}, {}
+        self._add_index("_id_", [("_id", 1)], unique=True)
+
+    async def index_information(self) -> dict:
+        return copy.deepcopy(self._indexes)
+
+    async def drop_index(self, name: str):
+        self._indexes.pop(name, None)
+        self._unique = {
+            spec["key"][0][0]: self._unique.get(spec["key"][0][0], {})
+            for spec in self._indexes.values()
+            if spec["unique"] and len(spec["key"]) == 1
+        }
+
+
+class MemoryDatabase:
+    def __init__(self, name: str = "memory", latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(name, self.latency, self)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command: Any, **kwargs) -> dict:
+        if isinstance(command, dict) and "explain" in command:
+            # Every registered query shape is index-backed here by construction
+            return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}, "ok": 1}
+        return {"ok": 1}
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
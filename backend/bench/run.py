@@ -0,0 +1,236 @@
+"""Benchmark runner.
+
+Drives ``server.app`` in process through httpx's ASGI transport, with the
+in-memory database from ``bench.memory_db`` and a MemoryTransport for email,
+so nothing leaves the process. Each workload hammers one route with a fixed
+number of concurrent clients and reports throughput and latency
+percentiles.
+
+    cd backend
+    python -m bench                       # run and print results
+    python -m bench --save-baseline       # record bench/baseline.json
+    python -m bench --threshold 0.25      # fail on >25% regression or any new errors vs baseline
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+SEED_CLIENT = "bench-client@example.com"
+
+SEARCH_QUERIES = ["logo", "site e-commerce", "prototype iot", "prototpye", "video promo"]
+
+
+@dataclass
+class Workload:
+    name: str
+    method: str
+    path: Callable[[int], str]
+    body: Optional[Callable[[int], dict]] = None
+
+
+def quote_body(i: int) -> dict:
+    baskets = [
+        ["logo", "site-vitrine"],
+        ["pack-lancement"],
+        ["site-pro", "agent-ai", "hebergement", "ssl"],
+        ["identite-visuelle", "video-promo", "affiche", "montage-video", "logo"],
+    ]
+    return {
+        "client_name": f"Bench {i}",
+        "client_email": f"bench{i % 50}@example.com",
+        "services": baskets[i % len(baskets)],
+    }
+
+
+def contact_body(i: int) -> dict:
+    return {"name": f"Bench {i}", "email": f"bench{i}@example.com", "message": "Benchmark message"}
+
+
+def build_workloads(quote_ids: List[str]) -> List[Workload]:
+    return [
+        Workload("services_pricing", "GET", lambda i: "/api/services-pricing"),
+        Workload("packs", "GET", lambda i: "/api/packs"),
+        Workload("services", "GET", lambda i: "/api/services"),
+        Workload("bootstrap", "GET", lambda i: "/api/bootstrap"),
+        Workload("services_search", "GET", lambda i: f"/api/services/search?q={SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}"),
+        Workload("assistant_quiz", "POST", lambda i: "/api/assistant", lambda i: {"quiz_answers": [i % 4, i // 4 % 4, i // 16 % 4]}),
+        Workload("testimonials", "GET", lambda i: "/api/testimonials"),
+        Workload("quote_create", "POST", lambda i: "/api/quotes", quote_body),
+        Workload("quote_get", "GET", lambda i: f"/api/quotes/{quote_ids[i % len(quote_ids)]}"),
+        Workload("client_quotes", "GET", lambda i: f"/api/quotes/client/{SEED_CLIENT}"),
+        Workload("contact_create", "POST", lambda i: "/api/contact", contact_body),
+        Workload("contacts_list", "GET", lambda i: "/api/contacts"),
+    ]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_workload(client, workload: Workload, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            path = workload.path(i)
+            kwargs = {"json": workload.body(i)} if workload.body else {}
+            start = time.perf_counter()
+            response = await client.request(workload.method, path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def load_server(db_latency: float):
+    """Build the app wired to the in-memory database and email transport"""
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'bench')
+    # One client hammering the write routes is exactly what admission control rejects
+    os.environ.setdefault('ADMISSION_CONTROL', '0')
+    sys.path.insert(0, str(BENCH_DIR.parent))
+
+    import server
+    from bench.memory_db import MemoryDatabase
+    from mailer import MemoryTransport
+
+    # Per-request info lines would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server.app = server.create_app(
+        database=MemoryDatabase("bench", latency=db_latency),
+        mail_transport=MemoryTransport(),
+    )
+    return server
+
+
+async def seed(client, quotes: int, contacts: int) -> List[str]:
+    quote_ids = []
+    for i in range(quotes):
+        body = {**quote_body(i), "client_email": SEED_CLIENT}
+        response = await client.post("/api/quotes", json=body)
+        quote_ids.append(response.json()["quote_id"])
+    for i in range(contacts):
+        await client.post("/api/contact", json=contact_body(i))
+    return quote_ids
+
+
+async def run(args) -> Dict[str, dict]:
+    import httpx
+
+    server = load_server(args.db_latency_ms / 1000)
+    app = server.app
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            quote_ids = await seed(client, args.seed_quotes, args.seed_contacts)
+            for workload in build_workloads(quote_ids):
+                if args.routes and workload.name not in args.routes:
+                    continue
+                # Warm caches and code paths before measuring
+                await run_workload(client, workload, min(50, args.requests), args.concurrency)
+                results[workload.name] = await run_workload(client, workload, args.requests, args.concurrency)
+                print(_format_row(workload.name, results[workload.name]))
+    return results
+
+
+def _format_row(name: str, r: dict) -> str:
+    return (
+        f"{name:<18} {r['rps']:>10.1f} rps   p50 {r['p50_ms']:>8.3f} ms   "
+        f"p95 {r['p95_ms']:>8.3f} ms   p99 {r['p99_ms']:>8.3f} ms   errors {r['errors']}"
+    )
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Routes whose p95 grew or throughput dropped by more than ``threshold``, or that fail more often
+
+    Errors have no tolerance: any rise in their count or rate is a regression, and so is
+    a route without a baseline that errors at all.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            if current["errors"]:
+                regressions.append(f"{name}: {current['errors']} errors, no baseline")
+            continue
+        previous_errors = previous.get("errors", 0)
+        previous_rate = previous_errors / previous["requests"] if previous.get("requests") else 0.0
+        rate = current["errors"] / current["requests"] if current["requests"] else 0.0
+        if current["errors"] > previous_errors or rate > previous_rate:
+            regressions.append(f"{name}: errors {previous_errors} -> {current['errors']} ({previous_rate:.2%} -> {rate:.2%})")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients per route")
+    parser.add_argument("--routes", nargs="*", help="only run these workloads")
+    parser.add_argument("--seed-quotes", type=int, default=200)
+    parser.add_argument("--seed-contacts", type=int, default=200)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated round trip per DB call")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression ratio")
+    parser.add_argument("--output", type=Path, help="also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    report = {"run_id": str(uuid.uuid4()), "created_at": time.time(), "routes": results}
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())["routes"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print("Regressions past threshold:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("No regressions against baseline")
+    return 0
@@ -0,0 +1,98 @@
+"""One-round-trip payload for the first page load.
+
+``/api/bootstrap`` returns the services list, the priced catalog, the packs
+and the testimonials as one JSON object, or only the sections named in
+``?fields=``. The body is spliced from bytes that are already encoded (the
+catalog payloads of the current catalog version and the testimonials as
+last loaded), then compressed once and kept for that combination of
+sections. The ``version`` in the body is a digest of the section payloads
+and the ETag a digest of the body, so workers serving the same content
+answer with the same bytes and a repeat visit revalidates with a single
+conditional request that gets a 304 from any of them. The per-process
+counters below only decide when the kept bodies are rebuilt.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from catalog_cache import CatalogResponseCache, EncodedPayload, encode_body
+
+# Section name -> catalog payload key; "testimonials" is loaded separately
+CATALOG_SECTIONS = {"services": "services", "pricing": "services-pricing", "packs": "packs"}
+SECTIONS = (*CATALOG_SECTIONS, "testimonials")
+
+
+class UnknownSectionError(ValueError):
+    def __init__(self, section: str):
+        self.section = section
+        super().__init__(f"Unknown bootstrap section: {section}")
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Requested sections in canonical order; all of them when ``fields`` is empty"""
+    if not fields:
+        return SECTIONS
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    for section in requested:
+        if section not in SECTIONS:
+            raise UnknownSectionError(section)
+    return tuple(s for s in SECTIONS if s in requested) or SECTIONS
+
+
+@dataclass
+class BootstrapSnapshot:
+    catalog_version: int
+    testimonials_version: int
+    payloads: Dict[Tuple[str, ...], EncodedPayload] = field(default_factory=dict)
+
+
+class BootstrapResponses:
+    def __init__(self, catalog: CatalogResponseCache, serialize_testimonial: Callable[[dict], dict] = dict):
+        """``serialize_testimonial`` shapes one stored testimonial as the API returns it"""
+        self.catalog = catalog
+        self.serialize_testimonial = serialize_testimonial
+        self._testimonials: Optional[List[dict]] = None
+        self._testimonials_body = b"[]"
+        self._testimonials_digest = ""
+        self._testimonials_version = 0
+        self._snapshot = BootstrapSnapshot(catalog_version=0, testimonials_version=0)
+
+    def _encode_testimonials(self, testimonials: List[dict]):
+        # The testimonial cache hands out the same list until it reloads
+        if testimonials is self._testimonials:
+            return
+        shaped = [self.serialize_testimonial(t) for t in testimonials]
+        body = json.dumps(shaped, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        self._testimonials = testimonials
+        if digest != self._testimonials_digest:
+            self._testimonials_body = body
+            self._testimonials_digest = digest
+            self._testimonials_version += 1
+
+    def payload(self, sections: Iterable[str], testimonials: Optional[List[dict]] = None) -> EncodedPayload:
+        sections = tuple(sections)
+        if "testimonials" in sections:
+            self._encode_testimonials(testimonials if testimonials is not None else [])
+
+        snapshot = self._snapshot
+        if (snapshot.catalog_version, snapshot.testimonials_version) != (self.catalog.version, self._testimonials_version):
+            snapshot = BootstrapSnapshot(self.catalog.version, self._testimonials_version)
+            self._snapshot = snapshot
+
+        encoded = snapshot.payloads.get(sections)
+        if encoded is None:
+            parts = []
+            for section in sections:
+                if section == "testimonials":
+                    body = self._testimonials_body
+                else:
+                    body = self.catalog.get(CATALOG_SECTIONS[section]).identity
+                parts.append(b'"' + section.encode() + b'":' + body)
+            content = b",".join(parts)
+            version = hashlib.sha256(content).hexdigest()[:16]
+            body = b'{"version":"' + version.encode() + b'",' + content + b"}"
+            encoded = encode_body(body)
+            snapshot.payloads[sections] = encoded
+        return encoded
@@ -0,0 +1,108 @@
+"""In-process read-through cache.
+
+Entries are evicted least-recently-used once ``maxsize`` is reached and
+expire after ``ttl`` seconds. Concurrent misses on the same key share a
+single load (single flight), so a cold key costs one database read no
+matter how many requests ask for it at once. The load runs in its own task
+and every caller, the first one included, waits on it through
+``asyncio.shield``: a caller that is cancelled (client gone) stops waiting
+without cancelling the load the others depend on. Invalidating a key
+detaches its in-flight load: callers already waiting still get its result,
+later callers start a fresh load, and only a load that is still the key's
+current one may store what it read, so writes to one key never keep the
+others from being cached. ``None`` results can be
+cached for a shorter ``negative_ttl`` to absorb repeated lookups of missing
+ids.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class AsyncTTLCache:
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0, negative_ttl: float = 0.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def _lookup(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: Hashable, value: Any):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._loaded(key, t))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        # A write invalidated this key while we were loading: serve the
+        # value to the waiters but don't keep a possibly stale copy.
+        if self._inflight.get(key) is asyncio.current_task():
+            self._store(key, value)
+        return value
+
+    def _loaded(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Every waiter may have gone; mark the exception as retrieved
+            task.exception()
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything when ``key`` is None, with any load of it in flight"""
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+        }
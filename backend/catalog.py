@@ -0,0 +1,267 @@
+"""Versioned service catalog.
+
+The catalog (service categories, packs, the legacy services list and the
+fallback testimonials) comes from ``catalog.json`` or from the single
+``{"_id": "current"}`` document of the Mongo ``catalog`` collection. Each
+load is validated into a CatalogSnapshot: immutable, with id indexes,
+pack membership sets and each pack's ``savings_usd`` (list price of its
+services minus the pack price) computed once; the pack's ``savings`` label
+is written from it, so the two never disagree. CatalogStore holds the current
+snapshot in one attribute and replaces it wholesale when the content
+changes, so readers take ``store.snapshot`` without locking and always see
+one consistent version.
+
+Structures built from the catalog (pricing engine, search indexes, ...)
+are attached to the snapshot with ``derive(key, builder)``: built on first
+use, once per version, and dropped with the snapshot.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogError(ValueError):
+    """Raised when catalog data fails validation; the current snapshot stays in place"""
+
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise CatalogError(message)
+
+
+def _price(value, where: str) -> float:
+    _require(isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0,
+             f"{where}: price_usd must be a positive number")
+    return value
+
+
+def validate_catalog(data: dict) -> dict:
+    """Check structure and references; returns the normalised catalog dict"""
+    _require(isinstance(data, dict), "Catalog must be an object")
+    categories = data.get("categories")
+    _require(isinstance(categories, dict) and categories, "Catalog needs at least one category")
+
+    ids = set()
+    for category_id, category in categories.items():
+        _require(isinstance(category, dict) and isinstance(category.get("name"), str),
+                 f"Category {category_id}: name is required")
+        services = category.get("services")
+        _require(isinstance(services, list) and services, f"Category {category_id}: no services")
+        for service in services:
+            _require(isinstance(service, dict) and isinstance(service.get("id"), str) and service["id"],
+                     f"Category {category_id}: service without id")
+            _require(service["id"] not in ids, f"Duplicate id {service['id']}")
+            _require(isinstance(service.get("name"), str), f"Service {service['id']}: name is required")
+            _price(service.get("price_usd"), f"Service {service['id']}")
+            ids.add(service["id"])
+
+    services = set(ids)
+    packs = data.get("packs", [])
+    _require(isinstance(packs, list), "packs must be a list")
+    for pack in packs:
+        _require(isinstance(pack, dict) and isinstance(pack.get("id"), str) and pack["id"], "Pack without id")
+        _require(pack["id"] not in ids, f"Duplicate id {pack['id']}")
+        _require(isinstance(pack.get("name"), str), f"Pack {pack['id']}: name is required")
+        _price(pack.get("price_usd"), f"Pack {pack['id']}")
+        members = pack.get("services")
+        _require(isinstance(members, list) and members, f"Pack {pack['id']}: no services")
+        unknown = sorted(set(members) - services)
+        _require(not unknown, f"Pack {pack['id']}: unknown services {', '.join(unknown)}")
+        ids.add(pack["id"])
+
+    for key in ("services", "testimonials"):
+        _require(isinstance(data.get(key, []), list), f"{key} must be a list")
+
+    return {
+        "categories": categories,
+        "packs": packs,
+        "services": data.get("services", []),
+        "testimonials": data.get("testimonials", []),
+    }
+
+
+def catalog_digest(data: dict) -> str:
+    body = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _frozen(value):
+    """Read-only view of nested dicts and lists"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _frozen(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_frozen(v) for v in value)
+    return value
+
+
+def _thawed(value):
+    if isinstance(value, Mapping):
+        return {k: _thawed(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thawed(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    digest: str
+    categories: Mapping[str, Mapping]
+    packs: Tuple[Mapping, ...]
+    services_list: Tuple[Mapping, ...]
+    testimonials: Tuple[Mapping, ...]
+    services: Mapping[str, Mapping]
+    category_of: Mapping[str, str]
+    packs_by_id: Mapping[str, Mapping]
+    pack_members: Mapping[str, frozenset]
+    packs_containing: Mapping[str, frozenset]
+    _derived: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def build(cls, data: dict, version: int) -> "CatalogSnapshot":
+        data = validate_catalog(data)
+        digest = catalog_digest(data)
+        list_prices = {
+            service["id"]: service["price_usd"]
+            for category in data["categories"].values() for service in category["services"]
+        }
+        packs = []
+        for pack in data["packs"]:
+            savings = round(sum(list_prices[s] for s in pack["services"]) - pack["price_usd"], 2)
+            packs.append({**pack, "savings_usd": savings, "savings": f"Économie de {savings:g}$" if savings > 0 else ""})
+        frozen = _frozen({**data, "packs": packs})
+        services = {}
+        category_of = {}
+        for category_id, category in frozen["categories"].items():
+            for service in category["services"]:
+                services[service["id"]] = service
+                category_of[service["id"]] = category_id
+        pack_members = {pack["id"]: frozenset(pack["services"]) for pack in frozen["packs"]}
+        containing: Dict[str, set] = {}
+        for pack_id, members in pack_members.items():
+            for service_id in members:
+                containing.setdefault(service_id, set()).add(pack_id)
+        return cls(
+            version=version,
+            digest=digest,
+            categories=frozen["categories"],
+            packs=frozen["packs"],
+            services_list=frozen["services"],
+            testimonials=frozen["testimonials"],
+            services=MappingProxyType(services),
+            category_of=MappingProxyType(category_of),
+            packs_by_id=MappingProxyType({pack["id"]: pack for pack in frozen["packs"]}),
+            pack_members=MappingProxyType(pack_members),
+            packs_containing=MappingProxyType({k: frozenset(v) for k, v in containing.items()}),
+        )
+
+    def derive(self, key: str, builder: Callable[["CatalogSnapshot"], Any]):
+        """``builder(self)``, computed once for this version"""
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived.setdefault(key, builder(self))
+        return value
+
+    def to_dict(self) -> dict:
+        """Plain, mutable copy in the catalog file format"""
+        return {
+            "categories": _thawed(self.categories),
+            "packs": _thawed(self.packs),
+            "services": _thawed(self.services_list),
+            "testimonials": _thawed(self.testimonials),
+        }
+
+
+# ============== SOURCES ==============
+
+class FileCatalogSource:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def read(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    async def load(self) -> dict:
+        return await asyncio.to_thread(self.read)
+
+
+class MongoCatalogSource:
+    """The ``current`` document of a catalog collection; ``fallback`` while there is none"""
+
+    def __init__(self, collection, fallback: Optional[FileCatalogSource] = None):
+        self.collection = collection
+        self.fallback = fallback
+
+    async def load(self) -> dict:
+        doc = await self.collection.find_one({"_id": "current"}, {"_id": 0})
+        if doc is None and self.fallback is not None:
+            return await self.fallback.load()
+        if doc is None:
+            raise CatalogError("No catalog document in MongoDB")
+        return doc
+
+
+class CatalogStore:
+    def __init__(self, snapshot: CatalogSnapshot, on_change: Optional[Callable[[CatalogSnapshot], None]] = None):
+        self.snapshot = snapshot
+        self.on_change = on_change
+        self.source = None
+        self._watch: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_file(cls, path: Path) -> "CatalogStore":
+        return cls(CatalogSnapshot.build(FileCatalogSource(path).read(), version=1))
+
+    def publish(self, data: dict) -> bool:
+        """Validate ``data`` and swap it in as the next version; False if the content is unchanged"""
+        digest = catalog_digest(validate_catalog(data))
+        if digest == self.snapshot.digest:
+            return False
+        snapshot = CatalogSnapshot.build(data, self.snapshot.version + 1)
+        self.snapshot = snapshot
+        logger.info(f"Catalog version {snapshot.version} published")
+        if self.on_change is not None:
+            self.on_change(snapshot)
+        return True
+
+    async def reload(self) -> bool:
+        if self.source is None:
+            return False
+        return self.publish(await self.source.load())
+
+    async def follow(self, source, interval: float):
+        """Load from ``source`` now, then poll it every ``interval`` seconds and publish what changed"""
+        self.source = source
+        await self._reload_logged()
+        if self._watch is None and interval > 0:
+            self._watch = asyncio.create_task(self._poll(interval))
+
+    async def _reload_logged(self):
+        try:
+            await self.reload()
+        except CatalogError as e:
+            logger.error(f"Rejected catalog update: {str(e)}")
+        except Exception as e:
+            logger.error(f"Catalog reload failed: {str(e)}")
+
+    async def _poll(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self._reload_logged()
+
+    async def stop(self):
+        if self._watch is not None:
+            self._watch.cancel()
+            try:
+                await self._watch
+            except asyncio.CancelledError:
+                pass
+            self._watch = None
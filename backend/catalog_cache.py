@@ -0,0 +1,133 @@
+"""Pre-serialized responses for the static catalog routes.
+
+Each payload is encoded to JSON once per catalog version and kept in memory
+as identity, gzip and (when the brotli package is available) brotli bytes.
+Requests are answered straight from those bytes, with strong ETags so a
+matching If-None-Match gets a bodiless 304.
+
+ETags are derived from the bytes alone. The snapshot version is a counter
+each process keeps for itself (workers publish a different number of
+times), so it never reaches a client: every worker serving the same
+content answers with the same ETag.
+"""
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    etag: str
+    identity: bytes
+    gzip: bytes
+    br: Optional[bytes]
+
+    def variant(self, accept_encoding: str):
+        """Pick the smallest encoding the client accepts"""
+        accepted = set()
+        for token in accept_encoding.lower().split(","):
+            coding, _, params = token.partition(";")
+            if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(coding.strip())
+        if self.br is not None and "br" in accepted:
+            return "br", self.br
+        if "gzip" in accepted:
+            return "gzip", self.gzip
+        return None, self.identity
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        # Strong ETags identify bytes, so each content-coding gets its own tag
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    payloads: Dict[str, EncodedPayload]
+
+
+def encode_payload(payload) -> EncodedPayload:
+    return encode_body(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def encode_body(body: bytes) -> EncodedPayload:
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return EncodedPayload(
+        etag=f'"{digest}"',
+        identity=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=11) if brotli is not None else None,
+    )
+
+
+class CatalogResponseCache:
+    """Versioned store of encoded catalog payloads.
+
+    publish() builds a complete snapshot off to the side and swaps it in with
+    a single assignment, so readers always see one consistent version.
+    """
+
+    def __init__(self, max_age: int = 300):
+        self.cache_control = f"public, max-age={max_age}"
+        self._snapshot = CatalogSnapshot(version=0, payloads={})
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def publish(self, payloads: dict) -> int:
+        version = self._snapshot.version + 1
+        encoded = {key: encode_payload(payload) for key, payload in payloads.items()}
+        self._snapshot = CatalogSnapshot(version=version, payloads=encoded)
+        return version
+
+    def get(self, key: str) -> EncodedPayload:
+        return self._snapshot.payloads[key]
+
+    def respond(self, key: str, request: Request) -> Response:
+        return encoded_response(self._snapshot.payloads[key], request, self.cache_control)
+
+
+def encoded_response(payload: EncodedPayload, request: Request, cache_control: str) -> Response:
+    """The best variant of ``payload`` for this request, or a 304"""
+    encoding, body = payload.variant(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": payload.variant_etag(encoding),
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, payload):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: str, payload: EncodedPayload) -> bool:
+    """Weak comparison as required for If-None-Match, across all codings"""
+    if if_none_match.strip() == "*":
+        return True
+    known = {payload.variant_etag(encoding) for encoding in (None, "gzip", "br")}
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in known:
+            return True
+    return False
@@ -0,0 +1,147 @@
+"""Multi-currency pricing matrix.
+
+Every sellable item (service or pack) has one base price in USD. A
+RateTable says how many units of each currency one USD buys and carries a
+version that changes with every rate update. For a given version, all
+currency prices are derived at once as ``round(base[:, None] * rates)``,
+then cached, so a rate change costs a single vectorized recomputation
+instead of edits to every catalog entry.
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+
+BASE_CURRENCY = "USD"
+
+# Currency behind the legacy ``*_fc`` fields (Congolese franc)
+FC_CURRENCY = "CDF"
+
+# Units per USD; overridable at runtime through RateTable updates
+DEFAULT_RATES = {
+    "USD": 1.0,
+    "CDF": 2200.0,
+    "EUR": 0.92,
+    "XAF": 605.0,
+    "XOF": 605.0,
+    "RWF": 1300.0,
+    "KES": 129.0,
+    "NGN": 1550.0,
+    "ZAR": 18.5,
+    "MAD": 9.9,
+}
+
+# Decimal places prices are rounded to; currencies not listed use 2
+CURRENCY_DECIMALS = {"CDF": 0, "XAF": 0, "XOF": 0, "RWF": 0, "KES": 0, "NGN": 0}
+
+
+class UnknownCurrencyError(ValueError):
+    """Raised when a currency has no rate in the current table"""
+
+    def __init__(self, currency: str):
+        self.currency = currency
+        super().__init__(f"Unknown currency: {currency}")
+
+
+@dataclass(frozen=True)
+class RateTable:
+    version: int
+    rates: Mapping[str, float]
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def with_rate(self, currency: str, rate: float) -> "RateTable":
+        """A new version with ``currency`` set to ``rate`` units per USD"""
+        if len(currency) != 3 or not currency.isalpha():
+            raise ValueError("Currency codes are three letters")
+        if currency == BASE_CURRENCY:
+            raise ValueError("The base currency rate is fixed at 1")
+        if rate <= 0:
+            raise ValueError("Rates must be positive")
+        return RateTable(version=self.version + 1, rates={**self.rates, currency: float(rate)})
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "rates": dict(self.rates), "updated_at": self.updated_at}
+
+
+@dataclass(frozen=True)
+class CurrencyColumns:
+    """Every item priced in every currency for one rate version"""
+    version: int
+    currencies: Tuple[str, ...]
+    matrix: np.ndarray
+    scale: np.ndarray
+    rows: Dict[str, int]
+    columns: Dict[str, int]
+
+    def column(self, currency: str) -> int:
+        try:
+            return self.columns[currency]
+        except KeyError:
+            raise UnknownCurrencyError(currency) from None
+
+    def prices(self, item_id: str) -> Dict[str, float]:
+        row = self.matrix[self.rows[item_id]]
+        return {c: _number(row[i]) for i, c in enumerate(self.currencies)}
+
+    def price(self, item_id: str, currency: str) -> float:
+        return _number(self.matrix[self.rows[item_id], self.column(currency)])
+
+    def totals(self, item_ids: Iterable[str]) -> Dict[str, float]:
+        """Sum of the listed items' prices, per currency"""
+        rows = [self.rows[i] for i in item_ids]
+        summed = self.matrix[rows].sum(axis=0) if rows else np.zeros(len(self.currencies))
+        summed = np.round(summed * self.scale) / self.scale
+        return {c: _number(summed[i]) for i, c in enumerate(self.currencies)}
+
+
+def _number(value) -> float:
+    # Whole amounts go out as ints so JSON shows 880000, not 880000.0
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class PricingMatrix:
+    def __init__(self, prices_usd: Mapping[str, float], rates: Optional[RateTable] = None):
+        self.ids = tuple(prices_usd)
+        self.base = np.array([prices_usd[i] for i in self.ids], dtype=np.float64)
+        self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+        self._rates = rates or RateTable(version=1, rates=dict(DEFAULT_RATES))
+        self._columns: Dict[int, CurrencyColumns] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rates(self) -> RateTable:
+        return self._rates
+
+    def set_rates(self, table: RateTable):
+        """Switch to ``table``; derived columns for the old version are dropped"""
+        with self._lock:
+            self._rates = table
+            self._columns = {k: v for k, v in self._columns.items() if k == table.version}
+
+    def columns(self) -> CurrencyColumns:
+        table = self._rates
+        derived = self._columns.get(table.version)
+        if derived is None:
+            derived = self._derive(table)
+            with self._lock:
+                if self._rates is table:
+                    self._columns[table.version] = derived
+        return derived
+
+    def _derive(self, table: RateTable) -> CurrencyColumns:
+        currencies = tuple(table.rates)
+        rates = np.array([table.rates[c] for c in currencies], dtype=np.float64)
+        scale = np.array([10.0 ** CURRENCY_DECIMALS.get(c, 2) for c in currencies])
+        matrix = np.round(self.base[:, None] * (rates * scale)[None, :]) / scale[None, :]
+        matrix.setflags(write=False)
+        return CurrencyColumns(
+            version=table.version,
+            currencies=currencies,
+            matrix=matrix,
+            scale=scale,
+            rows=self._rows,
+            columns={c: i for i, c in enumerate(currencies)},
+        )
@@ -0,0 +1,161 @@
+"""Streaming bulk export of quotes and contacts.
+
+Documents are read from a Motor cursor in fixed-size batches and encoded
+batch by batch, so memory stays bounded by one batch and the first bytes
+leave before the query has finished. Supported formats: NDJSON, CSV,
+Parquet (one row group per batch) and the Arrow IPC stream format; the two
+columnar formats need the optional pyarrow package. Any async iterable of
+documents works as the source, e.g. archived records chained before the
+hot collection's cursor with ``concat``.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar formats are unavailable without pyarrow
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+# Flat columns for CSV and the columnar formats; NDJSON keeps whole documents
+EXPORT_FIELDS: Dict[str, List[str]] = {
+    "quotes": [
+        "id", "client_name", "client_email", "client_phone", "company_name",
+        "services", "total_usd", "total_fc", "notes", "created_at",
+    ],
+    "contacts": ["id", "name", "email", "phone", "message", "created_at"],
+}
+
+_NUMERIC_FIELDS = {"total_usd", "total_fc"}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _flat_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return "|".join(str(v) for v in value)
+    return value
+
+
+async def iter_batches(cursor, batch_size: int) -> AsyncIterator[List[dict]]:
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def concat(*sources) -> AsyncIterator[dict]:
+    """Documents of each async iterable in turn (archived records, then the hot cursor)"""
+    for source in sources:
+        async for doc in source:
+            yield doc
+
+
+async def ndjson_stream(cursor, batch_size: int) -> AsyncIterator[bytes]:
+    async for batch in iter_batches(cursor, batch_size):
+        yield "".join(
+            json.dumps(doc, ensure_ascii=False, default=_json_default) + "\n" for doc in batch
+        ).encode("utf-8")
+
+
+async def csv_stream(cursor, fields: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    async for batch in iter_batches(cursor, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows({f: _flat_value(doc.get(f)) for f in fields} for doc in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def arrow_schema(fields: List[str]):
+    return pa.schema([
+        pa.field(f, pa.float64() if f in _NUMERIC_FIELDS else pa.string()) for f in fields
+    ])
+
+
+def _record_batch(batch: List[dict], fields: List[str], schema):
+    columns = {}
+    for f in fields:
+        if f in _NUMERIC_FIELDS:
+            columns[f] = [doc.get(f) for doc in batch]
+        else:
+            columns[f] = [None if doc.get(f) is None else str(_flat_value(doc.get(f))) for doc in batch]
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def columnar_stream(cursor, fields: List[str], batch_size: int, fmt: str) -> AsyncIterator[bytes]:
+    schema = arrow_schema(fields)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    async for batch in iter_batches(cursor, batch_size):
+        # Parquet: one row group per batch; Arrow: one record batch
+        writer.write_batch(_record_batch(batch, fields, schema))
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+
+def export_stream(cursor, collection: str, fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    fields = EXPORT_FIELDS[collection]
+    if fmt == "ndjson":
+        return ndjson_stream(cursor, batch_size)
+    if fmt == "csv":
+        return csv_stream(cursor, fields, batch_size)
+    return columnar_stream(cursor, fields, batch_size, fmt)
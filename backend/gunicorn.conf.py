@@ -0,0 +1,28 @@
+"""Multi-process launch: one uvicorn worker per core behind gunicorn.
+
+    cd backend
+    gunicorn -c gunicorn.conf.py server:app
+
+Each worker runs the app lifespan itself, so every process opens its own
+Motor client and pool after the fork; nothing is shared between workers.
+Metrics, caches and profiles are per worker too. Tuning is by environment:
+WEB_CONCURRENCY (workers, default one per CPU), BIND, MONGO_MAX_POOL_SIZE /
+MONGO_MIN_POOL_SIZE / MONGO_WARM_CONNECTIONS (per worker). Keep
+workers * MONGO_MAX_POOL_SIZE within what the MongoDB server accepts.
+
+A single process without gunicorn works as before: ``uvicorn server:app``.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8001')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Importing server opens no connections, so the code can load once before forking
+preload_app = True
+
+keepalive = 5
+graceful_timeout = 30
+timeout = 60
+accesslog = '-'
@@ -0,0 +1,186 @@
+"""MongoDB index registry and query-plan verification.
+
+INDEXES declares every index the API relies on; ``ensure_indexes`` applies
+them idempotently at startup. QUERY_SHAPES lists the filter/sort shape of
+each read route, and ``verify_query_plans`` explains every one of them and
+refuses any plan that falls back to a collection scan.
+
+Run as a script to provision and check a database from the command line:
+
+    python indexes.py            # create indexes, then verify plans
+    python indexes.py --verify   # verify only
+"""
+import asyncio
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a registered query shape is not served by an index"""
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    route: str
+    collection: str
+    filter: dict
+    sort: Optional[List[Tuple[str, int]]] = None
+
+
+# How long delivered outbox messages are kept; the TTL index must be dropped to change it
+OUTBOX_SENT_TTL_DAYS = int(os.environ.get('OUTBOX_SENT_TTL_DAYS', '30'))
+
+# How long spool replay markers are kept
+SPOOL_NOTIFIED_TTL_DAYS = int(os.environ.get('SPOOL_NOTIFIED_TTL_DAYS', '30'))
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "quotes": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("client_email", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="client_email_created_at_id",
+        ),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([("services", ASCENDING), ("created_at", ASCENDING)], name="services_created_at"),
+    ],
+    "contacts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    "outbox": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        # Delivered notifications are disposable; pending and failed ones are kept
+        IndexModel(
+            [("sent_at", ASCENDING)], name="sent_at_ttl",
+            expireAfterSeconds=OUTBOX_SENT_TTL_DAYS * 86400, partialFilterExpression={"status": "sent"},
+        ),
+    ],
+    "quote_stats": [
+        IndexModel([("day", ASCENDING), ("service", ASCENDING)], name="day_service"),
+    ],
+    # Replay markers of spooled submissions (see spool.py); a segment is replayed within days, not weeks
+    "spool_notified": [
+        IndexModel([("notified_at", ASCENDING)], name="notified_at_ttl", expireAfterSeconds=SPOOL_NOTIFIED_TTL_DAYS * 86400),
+    ],
+    # Compressed chunks of old quotes and contacts (see retention.py)
+    "archive": [
+        IndexModel([("collection", ASCENDING), ("ids", ASCENDING)], name="collection_ids"),
+        IndexModel([("collection", ASCENDING), ("first_created_at", ASCENDING)], name="collection_first_created_at"),
+    ],
+}
+
+# Placeholder values: created_at is a datetime, legacy documents still hold strings
+_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_AFTER = [
+    {"created_at": {"$lt": _DATE}},
+    {"created_at": _DATE, "id": {"$lt": "x"}},
+    {"created_at": {"$type": "string"}},
+]
+_RANGE = {"$or": [{"created_at": {"$gte": _DATE}}, {"created_at": {"$gte": "x"}}]}
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("GET /api/quotes/{quote_id}", "quotes", {"id": "x"}),
+    QueryShape(
+        "GET /api/quotes/client/{email}", "quotes",
+        {"client_email": "x", "$or": _AFTER},
+        [("created_at", DESCENDING), ("id", DESCENDING)],
+    ),
+    QueryShape(
+        "GET /api/contacts", "contacts",
+        {"$or": _AFTER},
+        [("created_at", DESCENDING), ("id", DESCENDING)],
+    ),
+    QueryShape("GET /api/export/quotes", "quotes", _RANGE, [("created_at", ASCENDING)]),
+    QueryShape(
+        "GET /api/export/quotes?service=", "quotes",
+        {"services": "x", **_RANGE}, [("created_at", ASCENDING)],
+    ),
+    QueryShape("GET /api/export/contacts", "contacts", _RANGE, [("created_at", ASCENDING)]),
+    QueryShape("GET /api/analytics/quotes", "quote_stats", {"day": {"$gte": _DATE}}, [("day", ASCENDING)]),
+    QueryShape("GET /api/quotes/{quote_id} (archived)", "archive", {"collection": "quotes", "ids": "x"}),
+    QueryShape(
+        "GET /api/export/* (archived)", "archive",
+        {"collection": "quotes", "first_created_at": {"$lt": _DATE}, "last_created_at": {"$gte": _DATE}},
+        [("first_created_at", ASCENDING)],
+    ),
+    QueryShape("retention", "quotes", {"created_at": {"$lt": _DATE}}, [("created_at", ASCENDING)]),
+    QueryShape("retention", "contacts", {"created_at": {"$lt": _DATE}}, [("created_at", ASCENDING)]),
+    QueryShape("created_at migration", "quotes", {"created_at": {"$type": "string"}}, [("created_at", ASCENDING)]),
+    QueryShape("created_at migration", "contacts", {"created_at": {"$type": "string"}}, [("created_at", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db):
+    """Create every registered index; existing identical indexes are a no-op"""
+    for collection, models in INDEXES.items():
+        names = await db[collection].create_indexes(models)
+        logger.info(f"Indexes ensured on {collection}: {', '.join(names)}")
+
+
+def _plan_stages(plan) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def explain_shape(db, shape: QueryShape) -> List[str]:
+    """Stages of the winning plan for a query shape"""
+    find = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        find["sort"] = dict(shape.sort)
+    result = await db.command({"explain": find, "verbosity": "queryPlanner"})
+    return _plan_stages(result["queryPlanner"]["winningPlan"])
+
+
+async def verify_query_plans(db, shapes: List[QueryShape] = QUERY_SHAPES):
+    """Raise QueryPlanError listing every route whose plan contains a COLLSCAN"""
+    failures = []
+    for shape in shapes:
+        stages = await explain_shape(db, shape)
+        if "COLLSCAN" in stages:
+            failures.append(f"{shape.route} ({shape.collection}): {' -> '.join(stages)}")
+        else:
+            logger.info(f"Query plan OK for {shape.route}: {' -> '.join(stages)}")
+    if failures:
+        raise QueryPlanError("Collection scan in query plans:\n  " + "\n  ".join(failures))
+
+
+async def _main(argv: List[str]) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if "--verify" not in argv:
+            await ensure_indexes(db)
+        await verify_query_plans(db)
+    except QueryPlanError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,272 @@
+"""Non-blocking, structured logging.
+
+Loggers keep their usual API, but the root logger has a single handler: a
+BoundedQueueHandler that stamps the record with the current request id and
+puts it on a bounded in-memory queue. Formatting and the write to stderr
+happen on the QueueListener thread, so a slow terminal, pipe or log
+collector never stalls the event loop. When the queue is full the record is
+dropped and counted instead of waiting; the listener reports the drops with
+its next line.
+
+Output is one JSON object per line (``LOG_FORMAT=text`` keeps the old
+human-readable format). Records emitted while a request is being handled
+carry ``request_id`` and ``elapsed_ms``; the access line written by
+RequestLogMiddleware carries ``duration_ms``, and the id is returned to the
+client in ``X-Request-ID``.
+
+Noisy success lines can be thinned per logger (the rule for ``a`` applies to
+``a.b`` too): ``sample`` keeps a fraction of records, ``rate_limits`` caps
+records per second. Both only apply below WARNING, so problems are always
+logged.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# (request id, perf_counter at start) of the request being handled
+_request: contextvars.ContextVar[Optional[Tuple[str, float]]] = contextvars.ContextVar("log_request", default=None)
+
+# Attributes every LogRecord has; anything else came from ``extra=`` and is output as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def current_request_id() -> Optional[str]:
+    """Id of the request being handled, as set by RequestLogMiddleware"""
+    request = _request.get()
+    return request[0] if request is not None else None
+
+
+def parse_rules(value: str) -> Dict[str, float]:
+    """``"access=0.1,mailer=5"`` -> ``{"access": 0.1, "mailer": 5.0}``"""
+    rules = {}
+    for item in value.split(","):
+        name, _, number = item.partition("=")
+        if name.strip() and number.strip():
+            rules[name.strip()] = float(number)
+    return rules
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Per-logger sampling and per-second caps for records below WARNING"""
+
+    def __init__(self, sample: Optional[Dict[str, float]] = None, rate_limits: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.sample = dict(sample or {})
+        self.rate_limits = dict(rate_limits or {})
+        self.sampled_out = 0
+        self.rate_limited = 0
+        # logger name -> (sample rate, rule name of the rate limit)
+        self._resolved: Dict[str, Tuple[float, Optional[str]]] = {}
+        # rule name -> (current second, records let through in it)
+        self._windows: Dict[str, Tuple[int, int]] = {}
+
+    def _rule(self, rules: Dict[str, float], name: str) -> Optional[str]:
+        while name:
+            if name in rules:
+                return name
+            name = name.rpartition(".")[0]
+        return None
+
+    def _resolve(self, name: str) -> Tuple[float, Optional[str]]:
+        resolved = self._resolved.get(name)
+        if resolved is None:
+            sample_rule = self._rule(self.sample, name)
+            resolved = (self.sample[sample_rule] if sample_rule else 1.0, self._rule(self.rate_limits, name))
+            self._resolved[name] = resolved
+        return resolved
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate, limit_rule = self._resolve(record.name)
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        if limit_rule is not None:
+            second = int(time.monotonic())
+            window, count = self._windows.get(limit_rule, (second, 0))
+            if window != second:
+                window, count = second, 0
+            if count >= self.rate_limits[limit_rule]:
+                self.rate_limited += 1
+                return False
+            self._windows[limit_rule] = (window, count + 1)
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Enqueue without blocking; a full queue drops the record and counts it"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # No formatting here: the listener thread does it
+        request = _request.get()
+        if request is not None and not hasattr(record, "request_id"):
+            record.request_id = request[0]
+            record.elapsed_ms = round((time.perf_counter() - request[1]) * 1000, 3)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def __init__(self, log_queue: queue.Queue, handler: logging.Handler, source: BoundedQueueHandler):
+        super().__init__(log_queue, handler, respect_handler_level=True)
+        self.source = source
+        self.reported = source.dropped
+
+    def enqueue_sentinel(self):
+        # Waits for room: stopping must not fail on a full queue
+        self.queue.put(self._sentinel)
+
+    def handle(self, record: logging.LogRecord):
+        dropped = self.source.dropped
+        if dropped != self.reported:
+            notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0, "%d log records dropped, queue full",
+                                       (dropped - self.reported,), None)
+            self.reported = dropped
+            super().handle(notice)
+        super().handle(record)
+
+
+class LogPipeline:
+    def __init__(self, handler: logging.Handler, queue_size: int, sampling: SamplingFilter):
+        self.output = handler
+        self.queue_size = queue_size
+        self.sampling = sampling
+        self.handler = BoundedQueueHandler(queue.Queue(queue_size))
+        self.handler.addFilter(sampling)
+        self.listener: Optional[_Listener] = None
+
+    @classmethod
+    def install(
+        cls,
+        level: str = "INFO",
+        json_format: bool = True,
+        queue_size: int = 10_000,
+        sample: Optional[Dict[str, float]] = None,
+        rate_limits: Optional[Dict[str, float]] = None,
+        stream=None,
+    ) -> "LogPipeline":
+        """Route the root logger through a new pipeline, replacing its handlers"""
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+        pipeline = cls(output, queue_size, SamplingFilter(sample, rate_limits))
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(pipeline.handler)
+        root.setLevel(level)
+        pipeline.start()
+        # The listener thread does not survive a fork (gunicorn preload): each child starts its own
+        os.register_at_fork(after_in_child=pipeline._after_fork)
+        atexit.register(pipeline.stop)
+        return pipeline
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    @property
+    def depth(self) -> int:
+        return self.handler.queue.qsize()
+
+    def start(self):
+        if self.listener is None:
+            self.listener = _Listener(self.handler.queue, self.output, self.handler)
+            self.listener.start()
+
+    def stop(self):
+        """Flush what is queued and stop the listener thread"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _after_fork(self):
+        # The parent's queue lock may have been held by its listener at fork time
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.listener = None
+        self.start()
+
+
+class RequestLogMiddleware:
+    """Pure ASGI middleware: assigns the request id and writes one access line per request"""
+
+    def __init__(self, app, logger_name: str = "access"):
+        self.app = app
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id" and 0 < len(value) <= 64:
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or uuid.uuid4().hex
+        started = time.perf_counter()
+        token = _request.set((request_id, started))
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            code = status or 500
+            level = logging.ERROR if code >= 500 else logging.INFO
+            if self.logger.isEnabledFor(level):
+                self.logger.log(level, "%s %s %d", scope["method"], scope["path"], code, extra={
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": code,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                })
+            _request.reset(token)
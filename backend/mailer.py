@@ -0,0 +1,400 @@
+"""Background email delivery.
+
+Notifications are written to the Mongo ``outbox`` collection and handed to a
+long-lived asyncio worker through a bounded in-memory queue. The worker
+groups messages per recipient, sends them through a pluggable transport and
+retries failures with exponential backoff. Every ``poll_interval`` seconds,
+however busy the queue is, the worker also claims the outbox messages that
+are due: retries, anything the queue could not hold and anything pending
+when a process stopped. A slow or unavailable provider never reaches
+request handlers.
+"""
+import asyncio
+import json
+import logging
+import random
+import smtplib
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sendgrid.helpers.mail import Mail
+
+logger = logging.getLogger(__name__)
+
+
+class MailError(Exception):
+    """Permanent delivery failure, the message will not be retried"""
+
+
+class TransientMailError(MailError):
+    """Temporary failure (timeout, throttling, 5xx), retried with backoff"""
+
+
+# ============== TRANSPORTS ==============
+
+class MailTransport:
+    """Delivers one or more messages to a single recipient.
+
+    ``send`` receives every message of a batch; transports that cannot merge
+    them set ``batch_size = 1`` and always get exactly one.
+    """
+    batch_size = 1
+
+    async def send(self, to_email: str, messages: List[dict]):
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class SendGridTransport(MailTransport):
+    """SendGrid v3 over a pooled keep-alive HTTP client.
+
+    Several pending notifications for the same recipient go out as a single
+    digest email, one API call for the whole batch.
+    """
+
+    def __init__(self, api_key: str, sender_email: str, batch_size: int = 20,
+                 timeout: float = 10.0, max_connections: int = 10):
+        self.sender_email = sender_email
+        self.batch_size = batch_size
+        self.client = httpx.AsyncClient(
+            base_url="https://api.sendgrid.com",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def send(self, to_email: str, messages: List[dict]):
+        if len(messages) == 1:
+            subject, content = messages[0]["subject"], messages[0]["html"]
+        else:
+            subject = f"{len(messages)} nouvelles notifications Neuronova"
+            content = "<hr>".join(m["html"] for m in messages)
+        mail = Mail(from_email=self.sender_email, to_emails=to_email, subject=subject, html_content=content)
+
+        try:
+            response = await self.client.post("/v3/mail/send", json=mail.get())
+        except httpx.HTTPError as e:
+            raise TransientMailError(str(e)) from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientMailError(f"SendGrid returned {response.status_code}")
+        if response.status_code != 202:
+            raise MailError(f"SendGrid returned {response.status_code}: {response.text[:200]}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class FileTransport(MailTransport):
+    """Appends messages as JSON lines to a local file (tests and local dev)"""
+    batch_size = 100
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def _write(self, lines: List[str]):
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+    async def send(self, to_email: str, messages: List[dict]):
+        lines = [
+            json.dumps({"to": to_email, "subject": m["subject"], "html": m["html"]}, ensure_ascii=False) + "\n"
+            for m in messages
+        ]
+        await asyncio.to_thread(self._write, lines)
+
+
+class MemoryTransport(MailTransport):
+    """Keeps messages in a list; for benchmarks and tests, never touches the network"""
+    batch_size = 100
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent: List[Tuple[str, dict]] = []
+
+    async def send(self, to_email: str, messages: List[dict]):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.extend((to_email, m) for m in messages)
+
+
+class SMTPTransport(MailTransport):
+    """Plain SMTP with one reused connection, e.g. to a local sink like MailHog"""
+
+    def __init__(self, host: str, port: int, sender_email: str, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender_email = sender_email
+        self.timeout = timeout
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def _send_sync(self, to_email: str, messages: List[dict]):
+        for attempt in range(2):
+            try:
+                if self._smtp is None:
+                    self._smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                for m in messages:
+                    msg = EmailMessage()
+                    msg["From"] = self.sender_email
+                    msg["To"] = to_email
+                    msg["Subject"] = m["subject"]
+                    msg.set_content(m["html"], subtype="html")
+                    self._smtp.send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, OSError) as e:
+                self._smtp = None
+                if attempt:
+                    raise TransientMailError(str(e)) from e
+
+    async def send(self, to_email: str, messages: List[dict]):
+        await asyncio.to_thread(self._send_sync, to_email, messages)
+
+    async def aclose(self):
+        if self._smtp is not None:
+            try:
+                await asyncio.to_thread(self._smtp.quit)
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+def transport_from_env(environ) -> Optional[MailTransport]:
+    """Build the transport selected by MAIL_TRANSPORT (sendgrid, file or smtp)"""
+    kind = environ.get('MAIL_TRANSPORT', 'sendgrid')
+    sender_email = environ.get('SENDER_EMAIL', 'noreply@neuronova.com')
+    if kind == 'file':
+        return FileTransport(environ.get('MAIL_FILE_PATH', 'outbox.jsonl'))
+    if kind == 'smtp':
+        return SMTPTransport(environ.get('SMTP_HOST', 'localhost'), int(environ.get('SMTP_PORT', '1025')), sender_email)
+    api_key = environ.get('SENDGRID_API_KEY')
+    if not api_key:
+        return None
+    return SendGridTransport(api_key, sender_email, batch_size=int(environ.get('MAIL_BATCH_SIZE', '20')))
+
+
+# ============== WORKER ==============
+
+class MailWorker:
+    """Outbox-backed delivery loop.
+
+    Outbox documents move pending -> sending -> sent (or failed once
+    ``max_attempts`` is reached). ``sending`` is a lease: if a worker dies
+    mid-send the document becomes claimable again after ``lease_seconds``.
+    """
+
+    def __init__(self, outbox, transport: Optional[MailTransport], queue_size: int = 1000,
+                 max_batch: int = 100, max_attempts: int = 6, backoff_base: float = 2.0, backoff_max: float = 600.0,
+                 poll_interval: float = 5.0, lease_seconds: float = 60.0):
+        self.outbox = outbox
+        self.transport = transport
+        self.queue_size = queue_size
+        # Created by start(), on the loop that runs the worker
+        self.queue: Optional[asyncio.Queue] = None
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.sent = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._next_poll = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def enqueue(self, to_email: str, subject: str, html: str) -> Optional[str]:
+        """Persist a message to the outbox and wake the worker"""
+        ids = await self.enqueue_many([(to_email, subject, html)])
+        return ids[0] if ids else None
+
+    async def enqueue_many(self, messages: List[Tuple[str, str, str]]) -> List[str]:
+        """Persist several (to, subject, html) messages with one outbox write"""
+        if not messages:
+            return []
+        if self.transport is None:
+            logger.warning("No mail transport configured, skipping email")
+            return []
+        now = datetime.now(timezone.utc)
+        docs = [
+            {
+                "id": str(uuid.uuid4()),
+                "to": to_email,
+                "subject": subject,
+                "html": html,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+            }
+            for to_email, subject, html in messages
+        ]
+        if len(docs) == 1:
+            await self.outbox.insert_one(docs[0])
+        else:
+            await self.outbox.insert_many(docs, ordered=False)
+        for doc in docs:
+            if self.queue is None:
+                break  # worker not running; the outbox keeps the messages
+            try:
+                self.queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                # Still durable: the poller picks it up from the outbox
+                logger.warning("Mail queue full, message %s left to the outbox poller", doc['id'])
+        return [doc["id"] for doc in docs]
+
+    async def start(self):
+        if self.transport is None or self._task is not None:
+            return
+        self._stopping = False
+        # A fresh queue per start: an asyncio.Queue is bound to the loop that first uses it
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._next_poll = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="mail-worker")
+
+    async def stop(self, timeout: float = 5.0):
+        """Flush what is already queued (bounded by ``timeout``), then stop"""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+        # Whatever is still queued is pending in the outbox and gets claimed after the next start
+        self.queue = None
+        if self.transport is not None:
+            await self.transport.aclose()
+
+    async def _run(self):
+        while True:
+            try:
+                batch = await self._next_batch()
+                if batch:
+                    await self._deliver(batch)
+                elif self._stopping:
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Mail worker error: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _next_batch(self) -> List[dict]:
+        if not self._stopping and time.monotonic() >= self._next_poll:
+            # On a fixed schedule, so retries are not starved by steady traffic
+            self._next_poll = time.monotonic() + self.poll_interval
+            due = await self._claim_due()
+            if due:
+                return due
+        try:
+            if self._stopping:
+                first = self.queue.get_nowait()
+            else:
+                first = await asyncio.wait_for(self.queue.get(), max(0.0, self._next_poll - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return [doc for doc in batch if await self._claim(doc)]
+
+    async def _claim(self, doc: dict) -> bool:
+        result = await self.outbox.update_one(
+            {"id": doc["id"], "status": "pending"},
+            {"$set": {"status": "sending", "locked_until": self._lease_deadline()}},
+        )
+        return result.modified_count == 1
+
+    async def _claim_due(self) -> List[dict]:
+        """Claim up to ``max_batch`` messages due for (re)delivery, including expired leases
+
+        Three round trips whatever the batch size: pick candidate ids, lease
+        those still due with one update_many carrying a fresh token, then read
+        back what this token won (another worker may have claimed some first).
+        """
+        now = datetime.now(timezone.utc)
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_until": {"$lte": now}},
+        ]}
+        candidates = await self.outbox.find(due, {"_id": 0, "id": 1}).limit(self.max_batch).to_list(self.max_batch)
+        if not candidates:
+            return []
+        ids = [doc["id"] for doc in candidates]
+        lease = uuid.uuid4().hex
+        await self.outbox.update_many(
+            {"$and": [{"id": {"$in": ids}}, due]},
+            {"$set": {"status": "sending", "locked_until": self._lease_deadline(), "lease": lease}},
+        )
+        return await self.outbox.find({"id": {"$in": ids}, "lease": lease}, {"_id": 0}).to_list(len(ids))
+
+    def _lease_deadline(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+    async def _deliver(self, batch: List[dict]):
+        by_recipient: Dict[str, List[dict]] = {}
+        for doc in batch:
+            by_recipient.setdefault(doc["to"], []).append(doc)
+
+        size = max(1, self.transport.batch_size)
+        for to_email, docs in by_recipient.items():
+            for i in range(0, len(docs), size):
+                chunk = docs[i:i + size]
+                ids = [d["id"] for d in chunk]
+                try:
+                    await self.transport.send(to_email, chunk)
+                except TransientMailError as e:
+                    await self._retry(chunk, str(e))
+                except Exception as e:
+                    await self._fail(ids, str(e))
+                else:
+                    self.sent += len(chunk)
+                    await self.outbox.update_many(
+                        {"id": {"$in": ids}},
+                        {"$set": {"status": "sent", "sent_at": datetime.now(timezone.utc)},
+                         "$unset": {"locked_until": "", "lease": ""}},
+                    )
+                    logger.info("Email sent successfully to %s (%d message(s))", to_email, len(chunk))
+
+    async def _retry(self, docs: List[dict], error: str):
+        now = datetime.now(timezone.utc)
+        for doc in docs:
+            attempts = doc.get("attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                await self._fail([doc["id"]], error)
+                continue
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+            delay *= random.uniform(0.5, 1.0)
+            await self.outbox.update_one(
+                {"id": doc["id"]},
+                {"$set": {
+                    "status": "pending",
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt_at": now + timedelta(seconds=delay),
+                }, "$unset": {"locked_until": "", "lease": ""}},
+            )
+        logger.warning("Email delivery failed, will retry: %s", error)
+
+    async def _fail(self, ids: List[str], error: str):
+        self.failed += len(ids)
+        await self.outbox.update_many(
+            {"id": {"$in": ids}},
+            {"$set": {"status": "failed", "last_error": error}, "$unset": {"locked_until": "", "lease": ""}},
+        )
+        logger.error(f"Failed to send email: {error}")
@@ -0,0 +1,94 @@
+"""Background data migrations.
+
+``migrate_created_at`` rewrites documents whose ``created_at`` is still the
+legacy ISO string into a native BSON datetime. It walks the string range of
+the ``created_at`` index in batches, so once every document is converted a
+run costs one empty index probe, and each document is updated only if its
+value is still the string that was read. Values that do not parse are left
+in place and logged.
+
+    python migrations.py        # convert quotes and contacts now
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+CREATED_AT_COLLECTIONS = ("quotes", "contacts")
+
+
+def parse_created_at(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+async def migrate_collection(collection, batch_size: int = 500, pause: float = 0.0) -> int:
+    """Convert one collection; returns the number of documents rewritten"""
+    converted = 0
+    last = None
+    while True:
+        bounds = {"$type": "string"}
+        if last is not None:
+            bounds["$gt"] = last
+        docs = await collection.find(
+            {"created_at": bounds}, {"_id": 1, "created_at": 1}
+        ).sort("created_at", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return converted
+
+        updates: List[UpdateOne] = []
+        for doc in docs:
+            try:
+                created_at = parse_created_at(doc["created_at"])
+            except ValueError:
+                logger.error(f"Unparseable created_at in {collection.name} {doc['_id']}: {doc['created_at']!r}")
+                continue
+            updates.append(UpdateOne(
+                {"_id": doc["_id"], "created_at": doc["created_at"]},
+                {"$set": {"created_at": created_at}},
+            ))
+        if updates:
+            result = await collection.bulk_write(updates, ordered=False)
+            converted += result.modified_count
+        last = docs[-1]["created_at"]
+        if pause:
+            # Leave room for request traffic between batches
+            await asyncio.sleep(pause)
+
+
+async def migrate_created_at(db, collections: Iterable[str] = CREATED_AT_COLLECTIONS,
+                             batch_size: int = 500, pause: float = 0.0) -> Dict[str, int]:
+    """Rewrite legacy string ``created_at`` values as datetimes"""
+    counts = {}
+    for name in collections:
+        counts[name] = await migrate_collection(db[name], batch_size, pause)
+        if counts[name]:
+            logger.info(f"Converted created_at to datetime on {counts[name]} {name} documents")
+    return counts
+
+
+async def _main(argv: List[str]) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        await migrate_created_at(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,67 @@
+"""Keyset pagination over (created_at, id), newest first.
+
+A page is one indexed range query: the opaque cursor carries the sort key
+of the last document served and the next page starts strictly after it, so
+deep pages cost the same as the first one.
+
+Documents whose ``created_at`` is still a legacy ISO string (see
+migrations.py) sort after every datetime in descending BSON order, so a
+datetime cursor also admits them and paging runs through both.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+SORT = [("created_at", -1), ("id", -1)]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded"""
+
+
+def encode_cursor(doc: dict) -> str:
+    created_at = doc["created_at"]
+    is_datetime = isinstance(created_at, datetime)
+    raw = json.dumps([created_at.isoformat() if is_datetime else created_at, doc["id"], is_datetime])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[object, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, doc_id, is_datetime = json.loads(raw)
+        if is_datetime:
+            created_at = datetime.fromisoformat(created_at)
+        if not isinstance(doc_id, str):
+            raise TypeError("id must be a string")
+        return created_at, doc_id
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def keyset_filter(base_filter: dict, cursor: Optional[str]) -> dict:
+    """Restrict ``base_filter`` to documents sorting after ``cursor``"""
+    if not cursor:
+        return base_filter
+    created_at, doc_id = decode_cursor(cursor)
+    after = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": doc_id}},
+    ]}
+    if isinstance(created_at, datetime):
+        after["$or"].append({"created_at": {"$type": "string"}})
+    if not base_filter:
+        return after
+    return {"$and": [base_filter, after]}
+
+
+async def fetch_page(collection, base_filter: dict, cursor: Optional[str], limit: int,
+                     projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
+    """One page of documents and the cursor for the next one (None at the end)"""
+    query = keyset_filter(base_filter, cursor)
+    docs = await collection.find(query, projection).sort(SORT).limit(limit + 1).to_list(limit + 1)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1])
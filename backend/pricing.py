@@ -0,0 +1,202 @@
+"""Server-side quote pricing.
+
+The engine is built once per catalog version from its categories and packs and answers
+"what is the cheapest way to sell this basket?" for any list of service
+ids: a mix of packs plus à-la-carte services covering every requested id.
+The optimisation runs on USD base prices; other currencies are read from
+the pricing matrix (currency.py) when the breakdown is rendered.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from currency import FC_CURRENCY, CurrencyColumns, PricingMatrix
+
+
+class UnknownServiceError(ValueError):
+    """Raised when a quote references service ids missing from the catalog"""
+
+    def __init__(self, unknown: List[str]):
+        self.unknown = unknown
+        super().__init__(f"Unknown service ids: {', '.join(unknown)}")
+
+
+@dataclass(frozen=True)
+class ServicePrice:
+    id: str
+    name: str
+    category: str
+    price_usd: float
+
+
+@dataclass(frozen=True)
+class PackPrice:
+    id: str
+    name: str
+    services: frozenset
+    price_usd: float
+
+
+@dataclass(frozen=True)
+class QuoteBreakdown:
+    services: Tuple[str, ...]
+    packs: Tuple[PackPrice, ...]
+    items: Tuple[ServicePrice, ...]
+    total_usd: float
+    list_price_usd: float
+
+    def totals(self, columns: CurrencyColumns) -> Dict[str, float]:
+        """Quote total in every currency: the sum of each sold line's converted price"""
+        return columns.totals([p.id for p in self.packs] + [s.id for s in self.items])
+
+    def to_dict(self, columns: CurrencyColumns) -> dict:
+        """Plain dict form, safe to store in Mongo and return to clients"""
+        totals = self.totals(columns)
+        list_prices = columns.totals(self.services)
+        return {
+            "services": list(self.services),
+            "packs": [
+                {
+                    "id": p.id,
+                    "name": p.name,
+                    "services": sorted(p.services),
+                    "price_usd": p.price_usd,
+                    "price_fc": columns.price(p.id, FC_CURRENCY),
+                    "prices": columns.prices(p.id),
+                }
+                for p in self.packs
+            ],
+            "items": [
+                {
+                    "id": s.id,
+                    "name": s.name,
+                    "category": s.category,
+                    "price_usd": s.price_usd,
+                    "price_fc": columns.price(s.id, FC_CURRENCY),
+                    "prices": columns.prices(s.id),
+                }
+                for s in self.items
+            ],
+            "rate_version": columns.version,
+            "totals": totals,
+            "list_prices": list_prices,
+            "total_usd": self.total_usd,
+            "total_fc": totals[FC_CURRENCY],
+            "list_price_usd": self.list_price_usd,
+            "list_price_fc": list_prices[FC_CURRENCY],
+            "savings_usd": self.list_price_usd - self.total_usd,
+            "savings_fc": list_prices[FC_CURRENCY] - totals[FC_CURRENCY],
+        }
+
+
+class PricingEngine:
+    """Prices baskets of service ids against a fixed catalog.
+
+    Pack ids may be requested directly; they expand to their member services
+    and the optimizer then decides how to sell the resulting set (a pack is
+    always kept when it is the cheapest cover).
+    """
+
+    def __init__(self, services_database: dict, packs: List[dict], cache_size: int = 4096):
+        self.services: Dict[str, ServicePrice] = {}
+        for category_id, category in services_database.items():
+            for service in category["services"]:
+                self.services[service["id"]] = ServicePrice(
+                    id=service["id"],
+                    name=service["name"],
+                    category=category_id,
+                    price_usd=service["price_usd"],
+                )
+
+        self.packs: Dict[str, PackPrice] = {}
+        for pack in packs:
+            self.packs[pack["id"]] = PackPrice(
+                id=pack["id"],
+                name=pack["name"],
+                services=frozenset(pack["services"]),
+                price_usd=pack["price_usd"],
+            )
+
+        self._price_canonical = lru_cache(maxsize=cache_size)(self._optimize)
+
+    def canonical(self, service_ids: Iterable[str]) -> Tuple[str, ...]:
+        """Expand pack ids, validate and return the sorted, de-duplicated basket"""
+        requested = set()
+        unknown = []
+        for service_id in service_ids:
+            if service_id in self.services:
+                requested.add(service_id)
+            elif service_id in self.packs:
+                requested.update(self.packs[service_id].services)
+            else:
+                unknown.append(service_id)
+        if unknown:
+            raise UnknownServiceError(sorted(set(unknown)))
+        return tuple(sorted(requested))
+
+    def price(self, service_ids: Iterable[str]) -> QuoteBreakdown:
+        """Cheapest pack + à-la-carte mix covering every requested id"""
+        return self._price_canonical(self.canonical(service_ids))
+
+    def cache_info(self):
+        return self._price_canonical.cache_info()
+
+    def _optimize(self, basket: Tuple[str, ...]) -> QuoteBreakdown:
+        requested = frozenset(basket)
+        list_usd = sum(self.services[s].price_usd for s in basket)
+
+        # A pack is only worth considering when it beats buying the requested
+        # services it covers one by one; anything else is dominated.
+        candidates = []
+        for pack in self.packs.values():
+            covered = pack.services & requested
+            if not covered:
+                continue
+            alone = sum(self.services[s].price_usd for s in covered)
+            if pack.price_usd < alone:
+                candidates.append((alone - pack.price_usd, pack))
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        packs = [pack for _, pack in candidates]
+
+        best_cost = list_usd
+        best_packs: Tuple[PackPrice, ...] = ()
+
+        def search(index: int, chosen: Tuple[PackPrice, ...], covered: frozenset, cost: float):
+            nonlocal best_cost, best_packs
+            remaining = requested - covered
+            total = cost + sum(self.services[s].price_usd for s in remaining)
+            if total < best_cost:
+                best_cost, best_packs = total, chosen
+            if cost >= best_cost:
+                return
+            for i in range(index, len(packs)):
+                pack = packs[i]
+                if not (pack.services & remaining):
+                    continue
+                search(
+                    i + 1,
+                    chosen + (pack,),
+                    covered | pack.services,
+                    cost + pack.price_usd,
+                )
+
+        search(0, (), frozenset(), 0)
+
+        covered_by_packs = frozenset().union(*(p.services for p in best_packs))
+        items = tuple(self.services[s] for s in basket if s not in covered_by_packs)
+        return QuoteBreakdown(
+            services=basket,
+            packs=best_packs,
+            items=items,
+            total_usd=best_cost,
+            list_price_usd=list_usd,
+        )
+
+    def lookup(self, service_id: str) -> Optional[ServicePrice]:
+        return self.services.get(service_id)
+
+    def matrix(self, rates=None) -> PricingMatrix:
+        """Pricing matrix over every service and pack, USD base prices"""
+        prices = {s.id: s.price_usd for s in self.services.values()}
+        prices.update({p.id: p.price_usd for p in self.packs.values()})
+        return PricingMatrix(prices, rates)
@@ -0,0 +1,192 @@
+"""Opt-in, sampled per-request profiling.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_TOKEN>`` or is
+picked by ``PROFILE_SAMPLE_RATE``. While at least one profiled request is in
+flight, a daemon thread wakes every ``interval`` seconds and records the
+stack of each profiled task: the Python stack when the task is running on
+the event loop, or its chain of awaiting coroutines (tagged ``[await]``)
+when it is suspended, which makes the result a wall-clock profile. Stacks
+are stored in collapsed format (``frame;frame;frame count``), ready for
+flamegraph.pl or speedscope, under the request id the access log uses (see
+log_pipeline.py), so a slow request in the logs leads to its profile. When
+nothing is being profiled the thread is not running and unsampled requests
+only pay for one header lookup.
+
+The running task is found with ``asyncio.current_task(loop)``, and its
+Python stack with ``sys._current_frames()``, which CPython documents but
+other interpreters may lack. Tested on CPython 3.11 and 3.12; without
+``sys._current_frames`` the running task is sampled like a suspended one,
+from its coroutine chain (tagged ``[running]``), so the profile loses
+only the frames below the outermost coroutine that is executing.
+"""
+import asyncio
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from log_pipeline import current_request_id
+
+# CPython-specific; see the module docstring for what is lost without it
+_current_frames = getattr(sys, "_current_frames", None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+def _running_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _awaiting_stack(task: asyncio.Task, tag: str = "[await]") -> List[str]:
+    stack = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_label(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    stack.append(tag)
+    return stack
+
+
+class Profile:
+    def __init__(self, profile_id: str, method: str, path: str, task: asyncio.Task):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.task = task
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.status: Optional[int] = None
+        self.samples: Counter = Counter()
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.samples.values()),
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class Profiler:
+    def __init__(self, interval: float = 0.005, keep: int = 50):
+        self.interval = interval
+        self.keep = keep
+        self._active: Dict[asyncio.Task, Profile] = {}
+        self._done: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def begin(self, profile_id: str, method: str, path: str) -> Profile:
+        task = asyncio.current_task()
+        profile = Profile(profile_id, method, path, task)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+            self._active[task] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def end(self, profile: Profile, status: Optional[int]):
+        profile.duration = time.time() - profile.started_at
+        profile.status = status
+        with self._lock:
+            self._active.pop(profile.task, None)
+            profile.task = None
+            self._done[profile.id] = profile
+            while len(self._done) > self.keep:
+                self._done.popitem(last=False)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._done.values())]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._done.get(profile_id)
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active.items())
+                loop, thread_id = self._loop, self._loop_thread_id
+            running = asyncio.current_task(loop)
+            frame = _current_frames().get(thread_id) if _current_frames is not None else None
+            for task, profile in active:
+                try:
+                    if task is running and frame is not None:
+                        stack = _running_stack(frame)
+                    elif task is running:
+                        stack = _awaiting_stack(task, "[running]")
+                    else:
+                        stack = _awaiting_stack(task)
+                except (AttributeError, RuntimeError, ValueError):
+                    # The task moved on while we were walking it; skip this tick
+                    continue
+                profile.samples[";".join(stack)] += 1
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware deciding per request whether to profile it"""
+
+    def __init__(self, app, profiler: Profiler, token: Optional[str] = None, sample_rate: float = 0.0):
+        self.app = app
+        self.profiler = profiler
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+
+    def _wanted(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = current_request_id() or str(uuid.uuid4())
+        profile = self.profiler.begin(profile_id, scope["method"], scope["path"])
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.end(profile, status)
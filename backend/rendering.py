@@ -0,0 +1,114 @@
+"""HTML rendering for notification emails and printable quotes.
+
+Templates live in ``templates/`` and are compiled once when the renderer
+is built, with auto-escaping on, so user input (names, messages, notes)
+can never inject markup. Quote renders are cached per (template, quote id):
+a quote never changes after creation, so resends and document downloads
+reuse the first render.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup, escape
+
+TEMPLATES = ("contact_notification.html", "quote_notification.html", "quote_document.html")
+
+
+def amount(value) -> str:
+    if value is None:
+        return "-"
+    value = float(value)
+    return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+
+
+def received(value) -> str:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.strftime('%d/%m/%Y à %H:%M')
+
+
+def linebreaks(value) -> Markup:
+    """Escape, then keep the sender's line breaks"""
+    return Markup("<br>\n").join(escape(value).split("\n"))
+
+
+class NotificationRenderer:
+    def __init__(self, directory: Path, lookup: Callable[[str], Optional[dict]], cache_size: int = 1000):
+        """``lookup(service_id)`` returns ``{"name", "price_usd", "price_fc"}`` or None"""
+        self.lookup = lookup
+        self.cache_size = cache_size
+        self.environment = Environment(
+            loader=FileSystemLoader(str(directory)),
+            autoescape=True,
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        self.environment.filters.update(amount=amount, received=received, linebreaks=linebreaks)
+        self.templates = {name: self.environment.get_template(name) for name in TEMPLATES}
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contact_notification(self, contact: dict) -> str:
+        return self.templates["contact_notification.html"].render(contact=contact, created_at=contact["created_at"])
+
+    def quote_notification(self, quote: dict) -> str:
+        return self._render_quote("quote_notification.html", quote)
+
+    def quote_document(self, quote: dict) -> str:
+        return self._render_quote("quote_document.html", quote)
+
+    def _render_quote(self, name: str, quote: dict) -> str:
+        key = (name, quote["id"])
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                return html
+
+        pricing = quote.get("pricing") or {}
+        html = self.templates[name].render(
+            quote=quote,
+            lines=self.quote_lines(quote),
+            created_at=quote["created_at"],
+            savings_usd=pricing.get("savings_usd"),
+        )
+        with self._lock:
+            self._cache[key] = html
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return html
+
+    def _name(self, service_id: str) -> str:
+        service = self.lookup(service_id)
+        return service["name"] if service else service_id
+
+    def quote_lines(self, quote: dict) -> List[dict]:
+        """Sold lines with names and prices: packs first, then à-la-carte services"""
+        pricing = quote.get("pricing")
+        if pricing:
+            lines = [
+                {
+                    "name": pack["name"],
+                    "includes": [self._name(s) for s in pack["services"]],
+                    "price_usd": pack["price_usd"],
+                    "price_fc": pack.get("price_fc"),
+                }
+                for pack in pricing["packs"]
+            ]
+            lines.extend(
+                {"name": item["name"], "includes": [], "price_usd": item["price_usd"], "price_fc": item.get("price_fc")}
+                for item in pricing["items"]
+            )
+            return lines
+
+        # Quotes stored before server-side pricing only have ids
+        lines = []
+        for service_id in quote["services"]:
+            service = self.lookup(service_id) or {"name": service_id, "price_usd": None, "price_fc": None}
+            lines.append({**service, "includes": []})
+        return lines
@@ -0,0 +1,226 @@
+"""Tiered retention for quotes and contacts.
+
+Each RetentionPolicy names a hot collection and an age in days. Documents
+whose ``created_at`` is older than that are moved, in batches, into the
+``archive`` collection: every batch becomes one chunk document per calendar
+month, holding the BSON-encoded documents compressed with zstd (zlib when
+the zstandard package is missing), the list of their ids and the
+created_at range they cover. Once the chunks are written, the documents
+are deleted from the hot collection, so its size and indexes follow recent
+traffic while old records stay reachable:
+
+* ``find_archived`` fetches one record by id through the ``ids`` index;
+* ``iter_archived`` streams the records of a created_at window, chunk by
+  chunk, for the exports.
+
+Chunk ids are derived from their content, and a chunk is written with
+``$setOnInsert``, so a run interrupted between the archive write and the
+delete simply writes the same chunk again. Only one process archives at a
+time: runs take a lease in the ``locks`` collection.
+
+Nothing is archived unless RETENTION_POLICIES names the collections:
+
+    RETENTION_POLICIES=quotes=730,contacts=365 python retention.py   # archive expired records now
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+import bson
+from bson.codec_options import CodecOptions
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+try:
+    import zstandard
+except ImportError:  # chunks are written with zlib instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "archive"
+
+_CODEC_OPTIONS = CodecOptions(tz_aware=True)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    collection: str
+    archive_after_days: int
+
+
+def parse_policies(value: str) -> List[RetentionPolicy]:
+    """``"quotes=365,contacts=180"`` -> one policy per collection"""
+    policies = []
+    for item in value.split(","):
+        name, _, days = item.partition("=")
+        if name.strip() and days.strip():
+            policies.append(RetentionPolicy(name.strip(), int(days)))
+    return policies
+
+
+def compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive chunk is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def chunk_documents(chunk: dict) -> List[dict]:
+    """The records stored in one archive chunk"""
+    return bson.decode(decompress(chunk["codec"], chunk["data"]), codec_options=_CODEC_OPTIONS)["docs"]
+
+
+def build_chunk(collection: str, month: str, docs: List[dict]) -> dict:
+    ids = [doc["id"] for doc in docs]
+    codec, data = compress(bson.encode({"docs": docs}))
+    digest = hashlib.sha256("\0".join(ids).encode()).hexdigest()[:24]
+    return {
+        "_id": f"{collection}:{month}:{digest}",
+        "collection": collection,
+        "month": month,
+        "codec": codec,
+        "ids": ids,
+        "count": len(docs),
+        "first_created_at": docs[0]["created_at"],
+        "last_created_at": docs[-1]["created_at"],
+        "data": bson.Binary(data),
+    }
+
+
+async def archive_batch(db, policy: RetentionPolicy, cutoff: datetime, batch_size: int) -> int:
+    """Archive the oldest expired documents; returns how many left the hot collection"""
+    hot = db[policy.collection]
+    # Legacy string created_at values are skipped until migrate_created_at converts them
+    docs = await hot.find(
+        {"created_at": {"$lt": cutoff}}, {"_id": 0}
+    ).sort("created_at", 1).limit(batch_size).to_list(batch_size)
+    if not docs:
+        return 0
+
+    months: Dict[str, List[dict]] = {}
+    for doc in docs:
+        months.setdefault(doc["created_at"].strftime("%Y-%m"), []).append(doc)
+    chunks = [build_chunk(policy.collection, month, group) for month, group in months.items()]
+    await db[ARCHIVE_COLLECTION].bulk_write(
+        [UpdateOne({"_id": chunk["_id"]}, {"$setOnInsert": chunk}, upsert=True) for chunk in chunks],
+        ordered=False,
+    )
+    result = await hot.delete_many({"id": {"$in": [doc["id"] for doc in docs]}, "created_at": {"$lt": cutoff}})
+    return result.deleted_count
+
+
+async def acquire_lease(db, owner: str, seconds: float) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        await db.locks.find_one_and_update(
+            {"_id": "retention", "$or": [{"until": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Held by another process
+        return False
+    return True
+
+
+async def release_lease(db, owner: str):
+    await db.locks.delete_one({"_id": "retention", "owner": owner})
+
+
+async def apply_retention(db, policies: Iterable[RetentionPolicy], batch_size: int = 500,
+                          pause: float = 0.0, lease: float = 600.0) -> Dict[str, int]:
+    """Archive every document past its policy; returns the count moved per collection"""
+    owner = f"{os.uname().nodename}:{os.getpid()}"
+    if not await acquire_lease(db, owner, lease):
+        return {}
+    counts = {}
+    try:
+        now = datetime.now(timezone.utc)
+        for policy in policies:
+            cutoff = now - timedelta(days=policy.archive_after_days)
+            moved = 0
+            while True:
+                archived = await archive_batch(db, policy, cutoff, batch_size)
+                if not archived:
+                    break
+                moved += archived
+                await acquire_lease(db, owner, lease)
+                if pause:
+                    # Leave room for request traffic between batches
+                    await asyncio.sleep(pause)
+            counts[policy.collection] = moved
+            if moved:
+                logger.info(f"Archived {moved} {policy.collection} documents older than {cutoff:%Y-%m-%d}")
+    finally:
+        await release_lease(db, owner)
+    return counts
+
+
+async def find_archived(db, collection: str, doc_id: str) -> Optional[dict]:
+    chunk = await db[ARCHIVE_COLLECTION].find_one({"collection": collection, "ids": doc_id})
+    if chunk is None:
+        return None
+    for doc in chunk_documents(chunk):
+        if doc["id"] == doc_id:
+            return doc
+    return None
+
+
+async def iter_archived(
+    db,
+    collection: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    predicate: Optional[Callable[[dict], bool]] = None,
+) -> AsyncIterator[dict]:
+    """Archived records created in [since, until), oldest chunk first; one chunk in memory at a time"""
+    query = {"collection": collection}
+    if since:
+        query["last_created_at"] = {"$gte": since}
+    if until:
+        query["first_created_at"] = {"$lt": until}
+    # Chunks one by one: each is already a batch of documents
+    cursor = db[ARCHIVE_COLLECTION].find(query).sort("first_created_at", 1).batch_size(1)
+    async for chunk in cursor:
+        for doc in chunk_documents(chunk):
+            created_at = doc["created_at"]
+            if since and created_at < since or until and created_at >= until:
+                continue
+            if predicate is None or predicate(doc):
+                yield doc
+
+
+async def _main(argv: List[str]) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        policies = parse_policies(os.environ.get('RETENTION_POLICIES', ''))
+        await apply_retention(client[os.environ['DB_NAME']], policies)
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
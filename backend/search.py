@@ -0,0 +1,165 @@
+"""In-memory catalog search.
+
+Services and packs are indexed once per catalog version. Text is folded to
+lowercase ASCII (``"Vidéo"`` -> ``"video"``) and split into tokens; an
+inverted index maps tokens to the entries and fields they occur in, a
+sorted vocabulary answers prefix lookups for autocomplete, and a trigram
+index over the vocabulary finds near spellings (``"prototpye"``) when a
+query token has no exact or prefix match.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+STOPWORDS = frozenset(
+    "a au aux avec d de des du en et l la le les ou par pour sur un une".split()
+)
+
+# How much a hit in each field counts
+FIELD_WEIGHTS = {"name": 3.0, "id": 2.0, "category": 1.0, "description": 1.0}
+
+PREFIX_FACTOR = 0.8
+FUZZY_FACTOR = 0.6
+FUZZY_MIN_SIMILARITY = 0.4
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Folded tokens; hyphenated words also yield their joined form (e-commerce -> ecommerce)"""
+    tokens = []
+    for word in fold(text).split():
+        parts = [p for p in _NON_ALNUM.split(word) if p]
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+        tokens.extend(parts)
+    return [t for t in tokens if len(t) > 1 and t not in STOPWORDS]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class SearchEntry:
+    id: str
+    name: str
+    kind: str  # "service" or "pack"
+    category: Optional[str]
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    entry: SearchEntry
+    score: float
+
+
+class CatalogSearchIndex:
+    def __init__(self, services_database: dict, packs: List[dict]):
+        self.entries: List[SearchEntry] = []
+        # token -> entry index -> best field weight
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+
+        for category_id, category in services_database.items():
+            for service in category["services"]:
+                self._add(
+                    SearchEntry(service["id"], service["name"], "service", category_id),
+                    {"name": service["name"], "id": service["id"], "category": category["name"]},
+                )
+        for pack in packs:
+            self._add(
+                SearchEntry(pack["id"], pack["name"], "pack", None),
+                {"name": pack["name"], "id": pack["id"], "description": pack.get("description", "")},
+            )
+
+        self.postings = dict(self.postings)
+        self.vocabulary = sorted(self.postings)
+        self.trigram_index: Dict[str, Set[str]] = defaultdict(set)
+        self.trigram_counts: Dict[str, int] = {}
+        for token in self.vocabulary:
+            grams = trigrams(token)
+            self.trigram_counts[token] = len(grams)
+            for gram in grams:
+                self.trigram_index[gram].add(token)
+        self.trigram_index = dict(self.trigram_index)
+
+    def _add(self, entry: SearchEntry, fields: Dict[str, str]):
+        index = len(self.entries)
+        self.entries.append(entry)
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                postings = self.postings[token]
+                if postings.get(index, 0) < weight:
+                    postings[index] = weight
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        matches = []
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def _similar(self, token: str) -> List[Tuple[str, float]]:
+        grams = trigrams(token)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self.trigram_index.get(gram, ()):
+                shared[candidate] += 1
+        similar = []
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + self.trigram_counts[candidate] - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                similar.append((candidate, similarity))
+        return similar
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """Vocabulary tokens a query token stands for, with a match factor"""
+        if token in self.postings:
+            return [(token, 1.0)]
+        prefixed = [(t, PREFIX_FACTOR) for t in self._prefixed(token)]
+        if prefixed:
+            return prefixed
+        return [(t, FUZZY_FACTOR * s) for t, s in self._similar(token)]
+
+    def search(self, query: str, category: Optional[str] = None, limit: int = 10) -> List[SearchHit]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for token in dict.fromkeys(tokens):
+            best: Dict[int, float] = {}
+            for candidate, factor in self._expand(token):
+                for index, weight in self.postings[candidate].items():
+                    score = weight * factor
+                    if score > best.get(index, 0):
+                        best[index] = score
+            for index, score in best.items():
+                scores[index] += score
+                matched[index] += 1
+
+        distinct = len(dict.fromkeys(tokens))
+        hits = []
+        for index, score in scores.items():
+            entry = self.entries[index]
+            if category is not None and entry.category != category:
+                continue
+            # Entries matching every query token rank above partial matches
+            coverage = matched[index] / distinct
+            hits.append(SearchHit(entry, round(score * coverage, 4)))
+        hits.sort(key=lambda h: (-h.score, h.entry.name))
+        return hits[:limit]
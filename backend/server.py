@@ -1,137 +1,255 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
+import secrets
+import re
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
-# SendGrid imports
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from pricing import PricingEngine, UnknownServiceError
+from currency import DEFAULT_RATES, FC_CURRENCY, CurrencyColumns, PricingMatrix, RateTable, UnknownCurrencyError
+from catalog import CatalogError, CatalogSnapshot, CatalogStore, FileCatalogSource, MongoCatalogSource
+from catalog_cache import CatalogResponseCache, encoded_response
+from bootstrap import BootstrapResponses, UnknownSectionError, parse_fields
+from search import CatalogSearchIndex
+from assistant import QUIZ_QUESTIONS, InvalidQuizAnswers, RetrievalIndex
+from mailer import MailWorker, transport_from_env
+from indexes import ensure_indexes, verify_query_plans
+from pagination import InvalidCursor, fetch_page
+import export
+from write_coalescer import WriteCoalescer
+from batch import BatchTooLarge, BodyTooLarge, MalformedBatch, read_body, validate_batch
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from cache import AsyncTTLCache
+import metrics
+from profiling import Profiler, ProfilingMiddleware
+from migrations import migrate_created_at
+from retention import apply_retention, find_archived, iter_archived, parse_policies
+from analytics import QuoteRollups
+from rendering import NotificationRenderer
+from admission import AdmissionController, AdmissionMiddleware
+from log_pipeline import LogPipeline, RequestLogMiddleware, parse_rules
+from spool import TRIP_ERRORS, CircuitBreaker, CircuitOpenError, SpoolFullError, SpoolReplayer, WriteSpool
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI(title="Neuronova API")
+# MongoDB connection, opened per process by the app lifespan (see create_app)
+client: Optional[AsyncIOMotorClient] = None
+db = None
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+def env_flag(name: str, default: str = '') -> bool:
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+# Configure logging: queued JSON lines, written off the event loop (see log_pipeline.py)
+log_pipeline = LogPipeline.install(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    json_format=os.environ.get('LOG_FORMAT', 'json') != 'text',
+    queue_size=int(os.environ.get('LOG_QUEUE_SIZE', '10000')),
+    # Per logger: fraction of info lines kept, info lines per second
+    sample=parse_rules(os.environ.get('LOG_SAMPLE', '')),
+    rate_limits=parse_rules(os.environ.get('LOG_RATE_LIMIT', 'access=100,mailer=20')),
 )
 logger = logging.getLogger(__name__)
 
-# ============== SERVICES DATABASE ==============
-SERVICES_DATABASE = {
-    "creation": {
-        "name": "Création & Développement",
-        "services": [
-            {"id": "site-vitrine", "name": "Site vitrine simple (1-5 pages)", "price_usd": 400, "price_fc": 880000},
-            {"id": "site-pro", "name": "Site pro complet (5-10 pages)", "price_usd": 800, "price_fc": 1760000},
-            {"id": "ecommerce", "name": "E-commerce (avec paiement)", "price_usd": 1300, "price_fc": 2860000},
-            {"id": "app-mobile", "name": "Application mobile (Android/iOS)", "price_usd": 2000, "price_fc": 4400000},
-            {"id": "app-web", "name": "Application web", "price_usd": 1000, "price_fc": 2200000},
-            {"id": "maintenance", "name": "Maintenance site mensuelle", "price_usd": 50, "price_fc": 110000},
-            {"id": "refonte", "name": "Mise à jour & refonte", "price_usd": 100, "price_fc": 220000},
-        ]
-    },
-    "ai": {
-        "name": "Intelligence Artificielle & Automatisation",
-        "services": [
-            {"id": "agent-ai", "name": "Agent AI (WhatsApp, Web, etc.)", "price_usd": 250, "price_fc": 550000},
-            {"id": "generateur-devis", "name": "Générateur automatique de devis", "price_usd": 150, "price_fc": 330000},
-            {"id": "integration-ia", "name": "Intégration IA sur site", "price_usd": 200, "price_fc": 440000},
-            {"id": "agent-julia", "name": "Agent Julia personnalisé (chatbot avancé)", "price_usd": 300, "price_fc": 660000},
-            {"id": "automatisation", "name": "Automatisation des tâches récurrentes", "price_usd": 180, "price_fc": 396000},
-        ]
-    },
-    "design": {
-        "name": "Design & Contenu Visuel",
-        "services": [
-            {"id": "logo", "name": "Logo professionnel", "price_usd": 50, "price_fc": 110000},
-            {"id": "identite-visuelle", "name": "Identité visuelle complète", "price_usd": 120, "price_fc": 264000},
-            {"id": "affiche", "name": "Affiche/flyer pro", "price_usd": 30, "price_fc": 66000},
-            {"id": "video-promo", "name": "Vidéo promotionnelle", "price_usd": 100, "price_fc": 220000},
-            {"id": "powerpoint", "name": "Présentation PowerPoint pro", "price_usd": 40, "price_fc": 88000},
-            {"id": "motion-design", "name": "Vidéo animée/motion design", "price_usd": 90, "price_fc": 198000},
-            {"id": "montage-video", "name": "Montage vidéo photo événementielle", "price_usd": 80, "price_fc": 176000},
-        ]
-    },
-    "security": {
-        "name": "Sécurité, Cloud & Hébergement",
-        "services": [
-            {"id": "hebergement", "name": "Hébergement cloud (mensuel)", "price_usd": 25, "price_fc": 55000},
-            {"id": "ssl", "name": "Sécurisation site / installation SSL", "price_usd": 30, "price_fc": 66000},
-            {"id": "firewall", "name": "Firewall & protection cyber", "price_usd": 150, "price_fc": 330000},
-            {"id": "monitoring", "name": "Monitoring & sauvegarde", "price_usd": 60, "price_fc": 132000},
-        ]
-    },
-    "business": {
-        "name": "Entrepreneuriat & Business",
-        "services": [
-            {"id": "business-plan", "name": "Création de business plan", "price_usd": 500, "price_fc": 1100000},
-            {"id": "creation-entreprise", "name": "Accompagnement création d'entreprise", "price_usd": 200, "price_fc": 440000},
-            {"id": "coaching", "name": "Coaching entrepreneurial (par séance)", "price_usd": 40, "price_fc": 88000},
-            {"id": "formation", "name": "Formation entrepreneuriale (pack)", "price_usd": 150, "price_fc": 330000},
-            {"id": "diagnostic", "name": "Diagnostic d'entreprise numérique", "price_usd": 70, "price_fc": 154000},
-            {"id": "levee-fonds", "name": "Préparation à la levée de fonds", "price_usd": 150, "price_fc": 330000},
-            {"id": "pitch-deck", "name": "Élaboration de pitch deck", "price_usd": 60, "price_fc": 132000},
-            {"id": "mentorat", "name": "Mentorat 1 mois", "price_usd": 150, "price_fc": 330000},
-        ]
-    },
-    "innovation": {
-        "name": "Prototypage & Innovation",
-        "services": [
-            {"id": "prototype-gadget", "name": "Conception de prototype de gadget", "price_usd": 500, "price_fc": 1100000},
-            {"id": "fabrication-prototype", "name": "Fabrication de prototype tech simple", "price_usd": 800, "price_fc": 1760000},
-            {"id": "prototype-ai-iot", "name": "Prototype AI ou IoT", "price_usd": 600, "price_fc": 1320000},
-        ]
-    }
-}
-
-PACKS = [
-    {
-        "id": "pack-lancement",
-        "name": "Pack Lancement d'Entreprise",
-        "description": "Idéal pour démarrer votre activité",
-        "services": ["logo", "site-vitrine", "business-plan", "powerpoint", "coaching"],
-        "price_usd": 370,
-        "price_fc": 814000,
-        "savings": "Économie de 260$"
-    },
-    {
-        "id": "pack-digitalisation",
-        "name": "Pack Digitalisation PME",
-        "description": "Transformez digitalement votre entreprise",
-        "services": ["site-pro", "agent-ai", "hebergement", "ssl", "diagnostic", "formation"],
-        "price_usd": 1200,
-        "price_fc": 2640000,
-        "savings": "Économie de 255$"
-    },
-    {
-        "id": "pack-createur",
-        "name": "Pack Créateur de Contenu",
-        "description": "Boostez votre image de marque",
-        "services": ["identite-visuelle", "video-promo", "affiche", "montage-video"],
-        "price_usd": 300,
-        "price_fc": 660000,
-        "savings": "Économie de 100$"
+# One line per request on the "access" logger
+ACCESS_LOG = env_flag('ACCESS_LOG', '1')
+
+@dataclass(frozen=True)
+class Settings:
+    """Per-process connection settings for create_app"""
+    mongo_url: str
+    db_name: str
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 10
+    # Connections opened before serving the first request
+    mongo_warm_connections: int = 10
+    cors_origins: List[str] = field(default_factory=lambda: ['*'])
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        min_pool = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+        return cls(
+            mongo_url=os.environ['MONGO_URL'],
+            db_name=os.environ['DB_NAME'],
+            mongo_max_pool_size=int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+            mongo_min_pool_size=min_pool,
+            mongo_warm_connections=int(os.environ.get('MONGO_WARM_CONNECTIONS', str(min_pool))),
+            cors_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        )
+
+# Page sizes for the cursor-paginated list routes
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', '50'))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', '500'))
+
+# Documents per batch when streaming exports
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Optional group commit for quote/contact inserts (see write_coalescer.py)
+WRITE_COALESCING = env_flag('WRITE_COALESCING')
+WRITE_COALESCE_MAX_BATCH = int(os.environ.get('WRITE_COALESCE_MAX_BATCH', '100'))
+WRITE_COALESCE_MAX_DELAY_MS = float(os.environ.get('WRITE_COALESCE_MAX_DELAY_MS', '5'))
+
+# Largest accepted payload for the batch submission routes
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '2000'))
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', str(4 * 1024 * 1024)))
+
+# Background conversion of legacy string created_at values (see migrations.py)
+MIGRATE_CREATED_AT = env_flag('MIGRATE_CREATED_AT', '1')
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '500'))
+
+# Age in days past which quotes/contacts move to the compressed archive (see retention.py), e.g.
+# "quotes=730,contacts=365"; off unless set
+RETENTION_POLICIES = parse_policies(os.environ.get('RETENTION_POLICIES', ''))
+RETENTION_INTERVAL_HOURS = float(os.environ.get('RETENTION_INTERVAL_HOURS', '24'))
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '500'))
+
+# Operator-only routes expect `Authorization: Bearer <ADMIN_TOKEN>`; they refuse every call while it is unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Opt-in request profiling: send `X-Profile: <PROFILE_TOKEN>` or sample a fraction of traffic; profiles are read
+# back with the ADMIN_TOKEN under the request's X-Request-ID
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+
+# Catalog source: "file" (CATALOG_FILE) or "mongo" (the `catalog` collection, the file while it is empty)
+CATALOG_SOURCE = os.environ.get('CATALOG_SOURCE', 'file')
+CATALOG_FILE = Path(os.environ.get('CATALOG_FILE', str(ROOT_DIR / 'catalog.json')))
+CATALOG_POLL_INTERVAL = float(os.environ.get('CATALOG_POLL_INTERVAL', '30'))
+
+# How often each worker checks MongoDB for a rate table saved by another worker
+EXCHANGE_RATES_POLL_INTERVAL = float(os.environ.get('EXCHANGE_RATES_POLL_INTERVAL', '30'))
+
+# Spam and double-submit protection on the public form routes (see admission.py)
+ADMISSION_CONTROL = env_flag('ADMISSION_CONTROL', '1')
+ADMISSION_PATHS = ("/api/contact", "/api/quotes")
+ADMISSION_BATCH_PATHS = ("/api/contact/batch", "/api/quotes/batch")
+
+# Quote/contact writes: time limit, breaker thresholds and the local spool used while it is open
+DB_WRITE_TIMEOUT = float(os.environ.get('DB_WRITE_TIMEOUT', '2'))
+DB_SLOW_WRITE = float(os.environ.get('DB_SLOW_WRITE', '0.5'))
+DB_BREAKER_FAILURES = int(os.environ.get('DB_BREAKER_FAILURES', '5'))
+DB_BREAKER_RESET = float(os.environ.get('DB_BREAKER_RESET', '10'))
+WRITE_SPOOL_DIR = os.environ.get('WRITE_SPOOL_DIR', str(ROOT_DIR / 'spool'))
+WRITE_SPOOL_SEGMENT_BYTES = int(os.environ.get('WRITE_SPOOL_SEGMENT_BYTES', str(4 * 1024 * 1024)))
+WRITE_SPOOL_MAX_BYTES = int(os.environ.get('WRITE_SPOOL_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# ============== CATALOG ==============
+
+# Services, packs, the legacy services list and fallback testimonials live in
+# catalog.json or, with CATALOG_SOURCE=mongo, in the `catalog` collection
+catalog_store = CatalogStore.from_file(CATALOG_FILE)
+
+def catalog() -> CatalogSnapshot:
+    """Current catalog version; take it once per request for a consistent view"""
+    return catalog_store.snapshot
+
+def build_pricing_engine(snapshot: CatalogSnapshot) -> PricingEngine:
+    return PricingEngine(snapshot.categories, snapshot.packs)
+
+def pricing_engine() -> PricingEngine:
+    return catalog().derive("pricing_engine", build_pricing_engine)
+
+def search_index() -> CatalogSearchIndex:
+    return catalog().derive("search_index", lambda c: CatalogSearchIndex(c.categories, c.packs))
+
+def assistant_index() -> RetrievalIndex:
+    return catalog().derive("assistant_index", lambda c: RetrievalIndex(c.categories, c.packs))
+
+# Base USD prices x exchange rates; EXCHANGE_RATES (JSON) overrides the defaults
+exchange_rates = RateTable(
+    version=1, rates={**DEFAULT_RATES, **json.loads(os.environ.get('EXCHANGE_RATES', '{}'))},
+)
+
+def pricing_matrix() -> PricingMatrix:
+    """Prices of the current catalog in every currency of the current rate table"""
+    matrix = catalog().derive(
+        "pricing_matrix", lambda c: c.derive("pricing_engine", build_pricing_engine).matrix(exchange_rates),
+    )
+    if matrix.rates is not exchange_rates:
+        matrix.set_rates(exchange_rates)
+    return matrix
+
+# Catalog routes are served from bytes encoded once per catalog version
+catalog_responses = CatalogResponseCache(max_age=300)
+
+def priced(entry: dict, columns: CurrencyColumns) -> dict:
+    """Catalog entry with its prices in every currency for the current rates"""
+    return {**entry, "price_fc": columns.price(entry["id"], FC_CURRENCY), "prices": columns.prices(entry["id"])}
+
+def publish_catalog(snapshot: Optional[CatalogSnapshot] = None):
+    """Encode the catalog payloads and switch to them as a new version"""
+    data = (snapshot or catalog()).to_dict()
+    columns = pricing_matrix().columns()
+    categories = {
+        category_id: {**category, "services": [priced(s, columns) for s in category["services"]]}
+        for category_id, category in data["categories"].items()
     }
-]
+    packs = [priced(p, columns) for p in data["packs"]]
+    rates = exchange_rates
+    return catalog_responses.publish({
+        "services-pricing": {
+            "categories": categories,
+            "packs": packs,
+            "exchange_rate": {
+                "usd_to_fc": rates.rates[FC_CURRENCY],
+                "version": rates.version,
+                "rates": dict(rates.rates),
+            },
+        },
+        "packs": packs,
+        "services": data["services"],
+    })
+
+publish_catalog()
+catalog_store.on_change = publish_catalog
+
+def apply_rates(table: RateTable):
+    """Switch to a new rate version and republish the catalog"""
+    global exchange_rates
+    exchange_rates = table
+    publish_catalog()
+
+async def load_exchange_rates():
+    """Pick up the rate table saved by an earlier rate update, if newer"""
+    try:
+        saved = await db.exchange_rates.find_one({"_id": "current"})
+    except Exception as e:
+        logger.error(f"Failed to load exchange rates: {str(e)}")
+        return
+    if saved and saved["version"] > exchange_rates.version:
+        apply_rates(RateTable(version=saved["version"], rates=saved["rates"], updated_at=saved["updated_at"]))
+
+rates_watch: Optional[asyncio.Task] = None
+
+async def poll_exchange_rates():
+    """Apply rate updates made through other workers; load_exchange_rates only switches on a newer version"""
+    while True:
+        await asyncio.sleep(EXCHANGE_RATES_POLL_INTERVAL)
+        await load_exchange_rates()
+
+async def follow_catalog():
+    """Switch to the configured catalog source and poll it for changes"""
+    source = FileCatalogSource(CATALOG_FILE)
+    if CATALOG_SOURCE == 'mongo':
+        source = MongoCatalogSource(db.catalog, fallback=source)
+    await catalog_store.follow(source, CATALOG_POLL_INTERVAL)
 
 # ============== MODELS ==============
 
@@ -160,6 +278,10 @@ class QuoteRequest(BaseModel):
     services: List[str]
     total_usd: float
     total_fc: float
+    # Total in the currency the client asked for
+    currency: str = "USD"
+    total: Optional[float] = None
+    pricing: Optional[dict] = None
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -169,10 +291,16 @@ class QuoteRequestCreate(BaseModel):
     client_phone: Optional[str] = None
     company_name: Optional[str] = None
     services: List[str]
-    total_usd: float
-    total_fc: float
+    currency: str = "USD"
+    # Ignored: totals are always computed server-side from the catalog
+    total_usd: Optional[float] = None
+    total_fc: Optional[float] = None
     notes: Optional[str] = None
 
+class ContactPage(BaseModel):
+    items: List[ContactMessage]
+    next_cursor: Optional[str] = None
+
 class Testimonial(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -184,84 +312,256 @@ class Testimonial(BaseModel):
 
 # ============== EMAIL SERVICE ==============
 
-def send_notification_email(to_email: str, subject: str, content: str):
-    """Send email notification via SendGrid"""
-    sendgrid_api_key = os.environ.get('SENDGRID_API_KEY')
-    sender_email = os.environ.get('SENDER_EMAIL', 'noreply@neuronova.com')
-    
-    if not sendgrid_api_key:
-        logger.warning("SendGrid API key not configured, skipping email")
-        return False
-    
-    message = Mail(
-        from_email=sender_email,
-        to_emails=to_email,
-        subject=subject,
-        html_content=content
-    )
-    
-    try:
-        sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
-        logger.info(f"Email sent successfully: {response.status_code}")
-        return response.status_code == 202
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return False
+# Delivery runs on a long-lived worker fed from the Mongo outbox;
+# the outbox and transport are attached per process by the app lifespan
+mail_worker = MailWorker(None, None)
 
-def send_contact_notification(contact: ContactMessage):
-    """Send notification email for new contact message"""
+async def send_notification_email(to_email: str, subject: str, content: str):
+    """Queue an email notification for the mail worker"""
+    return await mail_worker.enqueue(to_email, subject, content)
+
+def catalog_line(service_id: str) -> Optional[dict]:
+    """Name and current prices of a service, for rendering quotes that only carry ids"""
+    service = pricing_engine().lookup(service_id)
+    if service is None:
+        return None
+    return {
+        "name": service.name,
+        "price_usd": service.price_usd,
+        "price_fc": pricing_matrix().columns().price(service_id, FC_CURRENCY),
+    }
+
+# Templates are compiled once; quote renders are cached per quote id
+renderer = NotificationRenderer(ROOT_DIR / "templates", catalog_line)
+
+def contact_notification(contact: ContactMessage):
+    """(recipient, subject, html) of the notification for a contact message"""
     admin_email = os.environ.get('ADMIN_EMAIL', 'serviceneuronova@gmail.com')
     subject = f"Nouveau message de contact - {contact.name}"
-    content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; padding: 20px;">
-            <h2 style="color: #38BDF8;">Nouveau Message de Contact</h2>
-            <p><strong>Nom:</strong> {contact.name}</p>
-            <p><strong>Email:</strong> {contact.email}</p>
-            <p><strong>Téléphone:</strong> {contact.phone or 'Non fourni'}</p>
-            <div style="background: #f5f5f5; padding: 15px; border-radius: 8px; margin-top: 15px;">
-                <strong>Message:</strong>
-                <p>{contact.message}</p>
-            </div>
-            <p style="color: #666; font-size: 12px; margin-top: 20px;">
-                Reçu le {contact.created_at.strftime('%d/%m/%Y à %H:%M')}
-            </p>
-        </body>
-    </html>
-    """
-    send_notification_email(admin_email, subject, content)
+    return admin_email, subject, renderer.contact_notification(contact.model_dump())
 
-def send_quote_notification(quote: QuoteRequest):
-    """Send notification email for new quote request"""
+def quote_notification(quote: dict):
+    """(recipient, subject, html) of the notification for a quote request"""
     admin_email = os.environ.get('ADMIN_EMAIL', 'serviceneuronova@gmail.com')
-    subject = f"Nouvelle demande de devis - {quote.client_name}"
-    services_list = "<br>".join([f"• {s}" for s in quote.services])
-    content = f"""
-    <html>
-        <body style="font-family: Arial, sans-serif; padding: 20px;">
-            <h2 style="color: #F59E0B;">Nouvelle Demande de Devis</h2>
-            <p><strong>Client:</strong> {quote.client_name}</p>
-            <p><strong>Entreprise:</strong> {quote.company_name or 'Non spécifié'}</p>
-            <p><strong>Email:</strong> {quote.client_email or 'Non fourni'}</p>
-            <p><strong>Téléphone:</strong> {quote.client_phone or 'Non fourni'}</p>
-            <div style="background: #f5f5f5; padding: 15px; border-radius: 8px; margin-top: 15px;">
-                <strong>Services demandés:</strong><br>
-                {services_list}
-            </div>
-            <div style="background: #38BDF8; color: white; padding: 15px; border-radius: 8px; margin-top: 15px;">
-                <strong>Total:</strong> {quote.total_usd}$ / {quote.total_fc:,.0f} FC
-            </div>
-            <p style="color: #666; font-size: 12px; margin-top: 20px;">
-                Reçu le {quote.created_at.strftime('%d/%m/%Y à %H:%M')}
-            </p>
-        </body>
-    </html>
-    """
-    send_notification_email(admin_email, subject, content)
+    subject = f"Nouvelle demande de devis - {quote['client_name']}"
+    return admin_email, subject, renderer.quote_notification(quote)
+
+async def send_contact_notification(contact: ContactMessage):
+    """Send notification email for new contact message"""
+    await send_notification_email(*contact_notification(contact))
+
+async def send_quote_notification(quote: QuoteRequest):
+    """Send notification email for new quote request"""
+    await send_notification_email(*quote_notification(quote.model_dump()))
+
+# ============== WRITES ==============
+
+write_coalescers = {}
+
+async def insert_document(collection: str, doc: dict):
+    """Insert one document, through the group-commit coalescer when enabled"""
+    coalescer = write_coalescers.get(collection)
+    if coalescer is None:
+        await db[collection].insert_one(doc)
+    else:
+        await coalescer.insert(doc)
+
+async def insert_documents(collection: str, docs: List[dict]) -> dict:
+    """Unordered bulk insert; returns {position in docs: error message}"""
+    if not docs:
+        return {}
+    try:
+        await db[collection].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return {err["index"]: err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])}
+    return {}
+
+write_breaker = CircuitBreaker(
+    failure_threshold=DB_BREAKER_FAILURES,
+    timeout=DB_WRITE_TIMEOUT,
+    slow_call=DB_SLOW_WRITE,
+    reset_timeout=DB_BREAKER_RESET,
+)
+write_spool = WriteSpool(WRITE_SPOOL_DIR, WRITE_SPOOL_SEGMENT_BYTES, WRITE_SPOOL_MAX_BYTES)
+spool_replayer: Optional[SpoolReplayer] = None
+
+async def spool_submissions(collection: str, docs: List[dict]):
+    try:
+        await write_spool.append_many(collection, docs)
+    except SpoolFullError:
+        logger.error("Write spool full, rejecting %d %s", len(docs), collection)
+        raise HTTPException(status_code=503, detail="Service momentanément indisponible, veuillez réessayer")
+
+async def store_submission(collection: str, doc: dict) -> bool:
+    """Insert through the breaker; False when the database was unavailable and ``doc`` went to the spool"""
+    try:
+        await write_breaker.call(lambda: insert_document(collection, doc))
+        return True
+    except CircuitOpenError:
+        pass
+    except TRIP_ERRORS as e:
+        logger.warning("Insert into %s failed, spooling %s: %s", collection, doc['id'], type(e).__name__)
+    await spool_submissions(collection, [doc])
+    return False
+
+async def store_submissions(collection: str, docs: List[dict]) -> Optional[dict]:
+    """Batch counterpart of store_submission: the per-position insert errors, or None when ``docs`` went to the spool"""
+    if not docs:
+        return {}
+    # A large insert_many is allowed proportionally longer before it counts against the breaker
+    scale = max(1.0, len(docs) / 100)
+    try:
+        return await write_breaker.call(
+            lambda: insert_documents(collection, docs), timeout=DB_WRITE_TIMEOUT * scale, slow_call=DB_SLOW_WRITE * scale,
+        )
+    except CircuitOpenError:
+        pass
+    except TRIP_ERRORS as e:
+        logger.warning("Batch insert of %d %s failed, spooling: %s", len(docs), collection, type(e).__name__)
+    await spool_submissions(collection, docs)
+    return None
+
+follow_up_writes = set()
+
+async def follow_up(coro):
+    """Await a secondary write (rollups, outbox) for at most DB_WRITE_TIMEOUT, then let it finish in the background"""
+    task = asyncio.ensure_future(coro)
+    follow_up_writes.add(task)
+    task.add_done_callback(follow_up_writes.discard)
+    try:
+        await asyncio.wait_for(asyncio.shield(task), DB_WRITE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Follow-up write still running after the write timeout")
+
+async def replayed_submissions(collection: str, docs: List[dict]):
+    """Spool replay hook: the side effects skipped while the documents were spooled"""
+    if collection == "quotes":
+        quotes = [QuoteRequest(**doc) for doc in docs]
+        invalidate_quotes([q.id for q in quotes])
+        await record_rollups(quotes)
+        await mail_worker.enqueue_many([quote_notification(q.model_dump()) for q in quotes])
+    elif collection == "contacts":
+        await mail_worker.enqueue_many([contact_notification(ContactMessage(**doc)) for doc in docs])
+
+def build_quote(input: QuoteRequestCreate) -> QuoteRequest:
+    """Price a submission server-side; raises UnknownServiceError or UnknownCurrencyError"""
+    currency = input.currency.upper()
+    columns = pricing_matrix().columns()
+    columns.column(currency)
+    breakdown = pricing_engine().price(input.services)
+    pricing = breakdown.to_dict(columns)
+    return QuoteRequest(**{
+        **input.model_dump(),
+        "services": list(breakdown.services),
+        "total_usd": breakdown.total_usd,
+        "total_fc": pricing["total_fc"],
+        "currency": currency,
+        "total": pricing["totals"][currency],
+        "pricing": pricing,
+    })
+
+def quote_document(quote: QuoteRequest) -> dict:
+    # created_at stays a datetime and is stored as a native BSON date
+    return quote.model_dump()
+
+def contact_document(contact: ContactMessage) -> dict:
+    return contact.model_dump()
+
+async def read_batch(request: Request, model):
+    try:
+        declared_length = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="En-tête Content-Length invalide")
+    try:
+        if declared_length > BATCH_MAX_BYTES:
+            raise BodyTooLarge(BATCH_MAX_BYTES)
+        body = await read_body(request.stream(), BATCH_MAX_BYTES)
+        return validate_batch(body, model, BATCH_MAX_ITEMS)
+    except BodyTooLarge:
+        raise HTTPException(status_code=413, detail="Requête trop volumineuse")
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Lot trop volumineux ({e.args[0]} éléments, maximum {BATCH_MAX_ITEMS})")
+    except MalformedBatch:
+        raise HTTPException(status_code=400, detail="Le corps doit être un tableau JSON")
+
+def batch_summary(results: List[dict]) -> dict:
+    results.sort(key=lambda r: r["index"])
+    accepted = sum(1 for r in results if r["status"] in ("created", "accepted"))
+    return {
+        "status": "success" if accepted == len(results) else "partial",
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results,
+    }
+
+# ============== ANALYTICS ==============
+
+def rollup_list_price(service_id: str) -> float:
+    service = pricing_engine().lookup(service_id)
+    return service.price_usd if service else 0
+
+def rollup_category(service_id: str) -> Optional[str]:
+    service = pricing_engine().lookup(service_id)
+    return service.category if service else None
+
+def quote_rollups() -> QuoteRollups:
+    return QuoteRollups(db.quote_stats, rollup_list_price, rollup_category)
+
+async def record_rollups(quotes: List[QuoteRequest]):
+    """Write hook: fold new quotes into the analytics rollups (never fails the request)"""
+    try:
+        await quote_rollups().record(q.model_dump() for q in quotes)
+    except Exception as e:
+        logger.error(f"Failed to update quote rollups: {str(e)}")
+
+# ============== READ CACHES ==============
+
+# Quotes never change after creation; unknown ids are remembered briefly
+quote_cache = AsyncTTLCache(
+    "quotes",
+    maxsize=int(os.environ.get('QUOTE_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('QUOTE_CACHE_TTL', '3600')),
+    negative_ttl=5.0,
+)
+testimonial_cache = AsyncTTLCache("testimonials", maxsize=1, ttl=float(os.environ.get('TESTIMONIAL_CACHE_TTL', '300')))
+
+async def load_testimonials():
+    testimonials = await db.testimonials.find({}, {"_id": 0}).to_list(20)
+    return testimonials or [dict(t) for t in catalog().testimonials]
+
+# First-load payload spliced from the catalog bytes and the cached testimonials
+bootstrap_responses = BootstrapResponses(
+    catalog_responses, lambda t: Testimonial(**t).model_dump(),
+)
+
+def invalidate_quotes(quote_ids):
+    """Write hook: forget cached lookups (including misses) for these ids"""
+    for quote_id in quote_ids:
+        quote_cache.invalidate(quote_id)
+
+def invalidate_testimonials():
+    """Write hook for anything that changes the testimonials collection"""
+    testimonial_cache.invalidate()
+
+# Per-process buckets and replay stores for ADMISSION_PATHS and ADMISSION_BATCH_PATHS
+admission_controller = AdmissionController(
+    ip_rate=float(os.environ.get('ADMISSION_IP_RATE', '0.2')),
+    ip_burst=float(os.environ.get('ADMISSION_IP_BURST', '10')),
+    email_rate=float(os.environ.get('ADMISSION_EMAIL_RATE', '0.05')),
+    email_burst=float(os.environ.get('ADMISSION_EMAIL_BURST', '3')),
+    dedupe_window=float(os.environ.get('ADMISSION_DEDUPE_WINDOW', '60')),
+    # Number of reverse proxies appending to X-Forwarded-For (TRUST_FORWARDED_FOR=1 means one)
+    forwarded_hops=int(os.environ.get('FORWARDED_HOPS', '1' if env_flag('TRUST_FORWARDED_FOR') else '0')),
+)
 
 # ============== ROUTES ==============
 
+def require_admin_token(request: Request):
+    """Dependency guarding the operator-only routes"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if not ADMIN_TOKEN or scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Accès refusé")
+
 @api_router.get("/")
 async def root():
     return {"message": "Bienvenue sur l'API Neuronova"}
@@ -272,130 +572,594 @@ async def health_check():
 
 # Services & Pricing
 @api_router.get("/services-pricing")
-async def get_services_pricing():
+async def get_services_pricing(request: Request):
     """Get all services with pricing"""
-    return {
-        "categories": SERVICES_DATABASE,
-        "packs": PACKS,
-        "exchange_rate": {"usd_to_fc": 2200}
-    }
+    return catalog_responses.respond("services-pricing", request)
 
 @api_router.get("/packs")
-async def get_packs():
+async def get_packs(request: Request):
     """Get all service packs"""
-    return PACKS
+    return catalog_responses.respond("packs", request)
+
+# Catalog (admin)
+@api_router.get("/catalog/version")
+async def get_catalog_version():
+    """Version and content digest of the catalog being served"""
+    snapshot = catalog()
+    return {"version": snapshot.version, "digest": snapshot.digest, "source": CATALOG_SOURCE}
+
+@api_router.post("/catalog/reload", dependencies=[Depends(require_admin_token)])
+async def reload_catalog():
+    """Re-read the catalog source now instead of waiting for the next poll (admin)"""
+    try:
+        changed = await catalog_store.reload()
+    except CatalogError as e:
+        raise HTTPException(status_code=400, detail=f"Catalogue invalide: {str(e)}")
+    snapshot = catalog()
+    return {"changed": changed, "version": snapshot.version, "digest": snapshot.digest}
+
+# Exchange rates
+class ExchangeRateUpdate(BaseModel):
+    rate: float = Field(gt=0)
+
+@api_router.get("/exchange-rates")
+async def get_exchange_rates():
+    """Current rate table (units per USD) and its version"""
+    return exchange_rates.to_dict()
+
+@api_router.put("/exchange-rates/{currency}", dependencies=[Depends(require_admin_token)])
+async def update_exchange_rate(currency: str, input: ExchangeRateUpdate):
+    """Set one currency's rate and reprice the catalog (admin)"""
+    await load_exchange_rates()
+    try:
+        table = exchange_rates.with_rate(currency.upper(), input.rate)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Taux invalide pour {currency}")
+    try:
+        # Only over an older version: two workers updating at once cannot both win
+        await db.exchange_rates.update_one(
+            {"_id": "current", "version": {"$lt": table.version}}, {"$set": table.to_dict()}, upsert=True,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Taux modifiés entre-temps, veuillez réessayer")
+    apply_rates(table)
+    return table.to_dict()
 
 # Quote endpoints
 @api_router.post("/quotes", response_model=dict)
-async def create_quote(input: QuoteRequestCreate, background_tasks: BackgroundTasks):
+async def create_quote(input: QuoteRequestCreate):
     """Create a new quote request"""
-    quote = QuoteRequest(**input.model_dump())
-    doc = quote.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    try:
+        quote = build_quote(input)
+    except UnknownServiceError as e:
+        raise HTTPException(status_code=400, detail=f"Services inconnus: {', '.join(e.unknown)}")
+    except UnknownCurrencyError as e:
+        raise HTTPException(status_code=400, detail=f"Devise inconnue: {e.currency}")
     
-    await db.quotes.insert_one(doc)
+    if not await store_submission("quotes", quote_document(quote)):
+        # Spooled: rollups and the notification follow when it is replayed
+        return JSONResponse(status_code=202, content={
+            "status": "accepted",
+            "quote_id": quote.id,
+            "pricing": quote.pricing,
+            "message": "Votre devis a été reçu. Notre équipe vous contactera sous 24h.",
+        })
+    invalidate_quotes([quote.id])
+    await follow_up(record_rollups([quote]))
     
-    # Send email notification in background
-    background_tasks.add_task(send_quote_notification, quote)
+    # Queue email notification for the mail worker
+    await follow_up(send_quote_notification(quote))
     
     return {
         "status": "success",
         "quote_id": quote.id,
+        "pricing": quote.pricing,
         "message": "Votre devis a été enregistré. Notre équipe vous contactera sous 24h."
     }
 
-@api_router.get("/quotes/{quote_id}")
-async def get_quote(quote_id: str):
-    """Get a specific quote by ID"""
+@api_router.post("/quotes/batch", response_model=dict)
+async def create_quotes_batch(request: Request):
+    """Create many quote requests from one JSON array (partners, offline sync)"""
+    valid, results = await read_batch(request, QuoteRequestCreate)
+    
+    quotes = []
+    for index, item in valid:
+        try:
+            quotes.append((index, build_quote(item)))
+        except UnknownServiceError as e:
+            results.append({"index": index, "status": "invalid", "errors": [
+                {"loc": ["services"], "msg": f"Services inconnus: {', '.join(e.unknown)}"}
+            ]})
+        except UnknownCurrencyError as e:
+            results.append({"index": index, "status": "invalid", "errors": [
+                {"loc": ["currency"], "msg": f"Devise inconnue: {e.currency}"}
+            ]})
+    
+    errors = await store_submissions("quotes", [quote_document(q) for _, q in quotes])
+    invalidate_quotes(q.id for _, q in quotes)
+    if errors is None:
+        # Spooled: rollups and notifications happen when the spool is replayed
+        for index, quote in quotes:
+            results.append({"index": index, "status": "accepted", "quote_id": quote.id, "pricing": quote.pricing})
+        return JSONResponse(status_code=202, content=batch_summary(results))
+    stored = []
+    for position, (index, quote) in enumerate(quotes):
+        if position in errors:
+            results.append({"index": index, "status": "error", "detail": errors[position]})
+        else:
+            stored.append(quote)
+            results.append({"index": index, "status": "created", "quote_id": quote.id, "pricing": quote.pricing})
+    
+    await record_rollups(stored)
+    await mail_worker.enqueue_many([quote_notification(q.model_dump()) for q in stored])
+    return batch_summary(results)
+
+async def find_quote(quote_id: str) -> Optional[dict]:
+    """Hot collection first, then the archive"""
     quote = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
+    if quote is None:
+        quote = await find_archived(db, "quotes", quote_id)
+    return quote
+
+async def load_quote(quote_id: str) -> dict:
+    quote = await quote_cache.get_or_load(quote_id, lambda: find_quote(quote_id))
     if not quote:
         raise HTTPException(status_code=404, detail="Devis non trouvé")
     return quote
 
+@api_router.get("/quotes/{quote_id}")
+async def get_quote(quote_id: str):
+    """Get a specific quote by ID"""
+    return ORJSONResponse(await load_quote(quote_id))
+
+@api_router.get("/quotes/{quote_id}/document", response_class=HTMLResponse)
+async def get_quote_document(quote_id: str):
+    """Printable HTML version of a quote"""
+    return HTMLResponse(renderer.quote_document(await load_quote(quote_id)))
+
+@api_router.post("/quotes/{quote_id}/notification", dependencies=[Depends(require_admin_token)])
+async def resend_quote_notification(quote_id: str):
+    """Queue the admin notification for a quote again (admin)"""
+    await send_notification_email(*quote_notification(await load_quote(quote_id)))
+    return {"status": "success"}
+
 @api_router.get("/quotes/client/{email}")
-async def get_client_quotes(email: str):
-    """Get all quotes for a client by email"""
-    quotes = await db.quotes.find({"client_email": email}, {"_id": 0}).to_list(50)
-    return quotes
+async def get_client_quotes(
+    email: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+):
+    """Get a client's quotes by email, newest first, one page at a time"""
+    try:
+        quotes, next_cursor = await fetch_page(db.quotes, {"client_email": email}, cursor, limit, {"_id": 0})
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return ORJSONResponse({"items": quotes, "next_cursor": next_cursor})
 
 # Contact endpoints
 @api_router.post("/contact", response_model=dict)
-async def create_contact(input: ContactMessageCreate, background_tasks: BackgroundTasks):
+async def create_contact(input: ContactMessageCreate):
     """Submit a contact message"""
     contact = ContactMessage(**input.model_dump())
-    doc = contact.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.contacts.insert_one(doc)
+    if not await store_submission("contacts", contact_document(contact)):
+        return JSONResponse(status_code=202, content={
+            "status": "accepted",
+            "message": "Votre message a bien été reçu. Nous vous répondrons dans les plus brefs délais.",
+        })
     
-    # Send email notification in background
-    background_tasks.add_task(send_contact_notification, contact)
+    # Queue email notification for the mail worker
+    await follow_up(send_contact_notification(contact))
     
     return {
         "status": "success",
         "message": "Votre message a été envoyé avec succès. Nous vous répondrons dans les plus brefs délais."
     }
 
-@api_router.get("/contacts", response_model=List[ContactMessage])
-async def get_contacts():
-    """Get all contact messages (admin)"""
-    contacts = await db.contacts.find({}, {"_id": 0}).to_list(100)
-    for contact in contacts:
-        if isinstance(contact.get('created_at'), str):
-            contact['created_at'] = datetime.fromisoformat(contact['created_at'])
-    return contacts
+@api_router.post("/contact/batch", response_model=dict)
+async def create_contacts_batch(request: Request):
+    """Submit many contact messages from one JSON array"""
+    valid, results = await read_batch(request, ContactMessageCreate)
+    
+    contacts = [(index, ContactMessage(**item.model_dump())) for index, item in valid]
+    errors = await store_submissions("contacts", [contact_document(c) for _, c in contacts])
+    if errors is None:
+        results.extend({"index": index, "status": "accepted", "id": contact.id} for index, contact in contacts)
+        return JSONResponse(status_code=202, content=batch_summary(results))
+    stored = []
+    for position, (index, contact) in enumerate(contacts):
+        if position in errors:
+            results.append({"index": index, "status": "error", "detail": errors[position]})
+        else:
+            stored.append(contact)
+            results.append({"index": index, "status": "created", "id": contact.id})
+    
+    await mail_worker.enqueue_many([contact_notification(c) for c in stored])
+    return batch_summary(results)
+
+@api_router.get("/contacts", response_model=ContactPage)
+async def get_contacts(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+):
+    """Get contact messages (admin), newest first, one page at a time"""
+    try:
+        contacts, next_cursor = await fetch_page(db.contacts, {}, cursor, limit, {"_id": 0})
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    # Documents go out as stored; response_model only documents the shape
+    return ORJSONResponse({"items": contacts, "next_cursor": next_cursor})
 
 # Testimonials endpoints
 @api_router.get("/testimonials", response_model=List[Testimonial])
 async def get_testimonials():
     """Get all testimonials"""
-    testimonials = await db.testimonials.find({}, {"_id": 0}).to_list(20)
-    
-    if not testimonials:
-        return [
-            {
-                "id": "1",
-                "name": "Marie Kabongo",
-                "company": "TechStart RDC",
-                "content": "Neuronova a transformé notre présence en ligne. Leur équipe est professionnelle et créative.",
-                "rating": 5,
-                "image_url": "https://images.pexels.com/photos/3769021/pexels-photo-3769021.jpeg?auto=compress&cs=tinysrgb&w=150"
-            },
-            {
-                "id": "2",
-                "name": "Patrick Mukendi",
-                "company": "FinanceHub Africa",
-                "content": "L'agent IA développé par Neuronova a révolutionné notre service client.",
-                "rating": 5,
-                "image_url": "https://images.pexels.com/photos/2379004/pexels-photo-2379004.jpeg?auto=compress&cs=tinysrgb&w=150"
-            }
-        ]
-    return testimonials
+    return await testimonial_cache.get_or_load("all", load_testimonials)
+
+# First page load
+@api_router.get("/bootstrap")
+async def get_bootstrap(request: Request, fields: Optional[str] = None):
+    """Services, priced catalog, packs and testimonials in one response (?fields=packs,testimonials)"""
+    try:
+        sections = parse_fields(fields)
+    except UnknownSectionError as e:
+        raise HTTPException(status_code=400, detail=f"Section inconnue: {e.section}")
+    testimonials = None
+    if "testimonials" in sections:
+        testimonials = await testimonial_cache.get_or_load("all", load_testimonials)
+    # Testimonials can change between visits, so browsers always revalidate
+    return encoded_response(bootstrap_responses.payload(sections, testimonials), request, "no-cache")
+
+@api_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def get_metrics():
+    """Prometheus text exposition of the process metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/cache/stats", dependencies=[Depends(require_admin_token)])
+async def get_cache_stats():
+    """Hit/miss counters of the read caches (admin)"""
+    return [quote_cache.stats(), testimonial_cache.stats()]
+
+# Request profiles (admin)
+profiler = Profiler(interval=PROFILE_INTERVAL_MS / 1000, keep=PROFILE_KEEP)
+
+@api_router.get("/profiles", dependencies=[Depends(require_admin_token)])
+async def list_profiles():
+    """Most recent request profiles, newest first (admin)"""
+    return profiler.list()
+
+@api_router.get("/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin_token)])
+async def get_profile(profile_id: str):
+    """Collapsed stacks of one profiled request (id = its X-Request-ID), for flamegraph.pl or speedscope (admin)"""
+    profile = profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profil non trouvé")
+    # Request ids may come from clients: keep the filename to safe characters
+    filename = re.sub(r"[^A-Za-z0-9._-]", "_", profile_id)
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="{filename}.folded"'},
+    )
+
+@api_router.get("/services/search")
+async def search_services(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Services and packs matching free text, best first (accents and small typos tolerated)"""
+    if category is not None and category not in catalog().categories:
+        raise HTTPException(status_code=400, detail=f"Catégorie inconnue: {category}")
+    columns = pricing_matrix().columns()
+    return ORJSONResponse([
+        {
+            "id": hit.entry.id,
+            "name": hit.entry.name,
+            "type": hit.entry.kind,
+            "category": hit.entry.category,
+            "score": hit.score,
+            "prices": columns.prices(hit.entry.id),
+        }
+        for hit in search_index().search(q, category, limit)
+    ])
+
+# Julia assistant
+class AssistantRequest(BaseModel):
+    quiz_answers: Optional[List[int]] = None
+    message: Optional[str] = Field(None, max_length=1000)
+
+def assistant_item(index: RetrievalIndex, item_id: str, columns: CurrencyColumns) -> dict:
+    document = index.by_id[item_id]
+    return {"id": item_id, "name": document.name, "type": document.kind, "prices": columns.prices(item_id)}
+
+@api_router.get("/assistant/quiz")
+async def get_assistant_quiz():
+    """Quiz questions; answers are sent back to /assistant as option indices"""
+    return ORJSONResponse([
+        {"id": q["id"], "question": q["question"], "options": [o["text"] for o in q["options"]]}
+        for q in QUIZ_QUESTIONS
+    ])
+
+@api_router.post("/assistant")
+async def ask_assistant(input: AssistantRequest):
+    """Recommendation for quiz answers, or a reply to a free-text message"""
+    index = assistant_index()
+    columns = pricing_matrix().columns()
+    if input.quiz_answers is not None:
+        try:
+            reply = index.recommend(input.quiz_answers)
+        except InvalidQuizAnswers:
+            raise HTTPException(status_code=400, detail="Réponses au quiz invalides")
+        return ORJSONResponse({
+            "text": reply["text"],
+            "budget": reply["budget"],
+            "pack": assistant_item(index, reply["pack"], columns) if reply["pack"] else None,
+            "services": [assistant_item(index, s, columns) for s in reply["services"]],
+        })
+    if input.message is not None:
+        reply = index.answer(input.message)
+        return ORJSONResponse({
+            "text": reply["text"],
+            "matches": [assistant_item(index, m, columns) for m in reply["matches"]],
+        })
+    raise HTTPException(status_code=400, detail="Message ou réponses au quiz requis")
 
 # Services list (legacy)
 @api_router.get("/services")
-async def get_services():
+async def get_services(request: Request):
     """Get list of services"""
-    return [
-        {"id": "web", "title": "Création de Sites Web", "description": "Sites vitrines, e-commerce, applications web.", "icon": "Globe"},
-        {"id": "ai", "title": "Agents IA", "description": "Chatbots intelligents et automatisation.", "icon": "Bot"},
-        {"id": "gadgets", "title": "Gadgets Tech", "description": "Conception et fabrication IoT.", "icon": "Cpu"},
-        {"id": "security", "title": "Cybersécurité", "description": "Audits et protection des données.", "icon": "Shield"},
-        {"id": "design", "title": "Design & Montage Vidéo", "description": "Identité visuelle et vidéos.", "icon": "Palette"},
-        {"id": "coaching", "title": "Coaching Entrepreneurial", "description": "Accompagnement stratégique.", "icon": "Rocket"}
-    ]
-
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
+    return catalog_responses.respond("services", request)
+
+# Analytics (admin)
+@api_router.get("/analytics/quotes", dependencies=[Depends(require_admin_token)])
+async def get_quote_analytics(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Quote counts and attributed revenue by day, service and category, from the rollups"""
+    return ORJSONResponse(await quote_rollups().query(since, until))
+
+# Export endpoints (admin)
+def created_at_range(since: Optional[datetime], until: Optional[datetime]) -> dict:
+    """Mongo filter on created_at for an optional [since, until) window"""
+    bounds = {}
+    if since:
+        bounds["$gte"] = since.astimezone(timezone.utc)
+    if until:
+        bounds["$lt"] = until.astimezone(timezone.utc)
+    if not bounds:
+        return {}
+    # Legacy string values still match until migrate_created_at has converted them
+    legacy = {op: value.isoformat() for op, value in bounds.items()}
+    return {"$or": [{"created_at": bounds}, {"created_at": legacy}]}
+
+def archived_range(collection: str, since: Optional[datetime], until: Optional[datetime], predicate=None):
+    """Archived records for an export window, in the same UTC terms as created_at_range"""
+    return iter_archived(
+        db, collection,
+        since.astimezone(timezone.utc) if since else None,
+        until.astimezone(timezone.utc) if until else None,
+        predicate,
+    )
+
+def export_response(collection: str, query: dict, format: str, archived=None):
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {format}")
+    if format in export.COLUMNAR_FORMATS and export.pa is None:
+        raise HTTPException(status_code=501, detail="Export colonnaire indisponible (pyarrow manquant)")
+    cursor = db[collection].find(query, {"_id": 0}).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+    if archived is not None:
+        # Archived records are older than anything left in the hot collection
+        cursor = export.concat(archived, cursor)
+    extension = "arrows" if format == "arrow" else format
+    return StreamingResponse(
+        export.export_stream(cursor, collection, format, EXPORT_BATCH_SIZE),
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{extension}"'},
+    )
+
+@api_router.get("/export/quotes", dependencies=[Depends(require_admin_token)])
+async def export_quotes(
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    service: Optional[str] = None,
+):
+    """Stream every matching quote (admin)"""
+    query = created_at_range(since, until)
+    if service:
+        query["services"] = service
+    predicate = (lambda doc: service in doc.get("services", ())) if service else None
+    return export_response("quotes", query, format, archived_range("quotes", since, until, predicate))
+
+@api_router.get("/export/contacts", dependencies=[Depends(require_admin_token)])
+async def export_contacts(
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Stream every matching contact message (admin)"""
+    return export_response("contacts", created_at_range(since, until), format, archived_range("contacts", since, until))
+
+# Scrape-time gauges over state the app already tracks
+metrics.registry.gauge("log_queue_depth", "Log records waiting for the writer thread", lambda: log_pipeline.depth)
+metrics.registry.gauge("log_records_dropped_total", "Log records dropped on a full queue", lambda: log_pipeline.dropped, kind="counter")
+metrics.registry.gauge(
+    "log_records_sampled_out_total", "Info lines skipped by LOG_SAMPLE",
+    lambda: log_pipeline.sampling.sampled_out, kind="counter",
+)
+metrics.registry.gauge(
+    "log_records_rate_limited_total", "Info lines skipped by LOG_RATE_LIMIT",
+    lambda: log_pipeline.sampling.rate_limited, kind="counter",
+)
+metrics.registry.gauge("email_queue_depth", "Messages waiting in the in-memory mail queue", lambda: mail_worker.depth)
+metrics.registry.gauge("emails_sent_total", "Emails handed to the transport", lambda: mail_worker.sent, kind="counter")
+metrics.registry.gauge("emails_failed_total", "Emails given up on", lambda: mail_worker.failed, kind="counter")
+metrics.registry.gauge(
+    "write_coalescer_pending", "Inserts buffered for the next group commit",
+    lambda: sum(c.pending for c in write_coalescers.values()),
 )
+for _reason in admission_controller.rejected:
+    metrics.registry.gauge(
+        f"admission_rejected_{_reason}_total", f"Submissions rejected by admission control ({_reason})",
+        lambda r=_reason: admission_controller.rejected[r], kind="counter",
+    )
+metrics.registry.gauge(
+    "admission_replayed_total", "Submissions answered with a stored response",
+    lambda: admission_controller.replayed, kind="counter",
+)
+metrics.registry.gauge(
+    "db_write_circuit_open", "1 while quote/contact writes bypass MongoDB",
+    lambda: 0 if write_breaker.state == CircuitBreaker.CLOSED else 1,
+)
+metrics.registry.gauge("db_write_circuit_trips_total", "Times the write breaker opened", lambda: write_breaker.trips, kind="counter")
+metrics.registry.gauge("write_spool_bytes", "Bytes of submissions waiting in the local spool", lambda: write_spool.size)
+metrics.registry.gauge("write_spool_appended_total", "Submissions written to the spool", lambda: write_spool.spooled, kind="counter")
+metrics.registry.gauge(
+    "write_spool_replayed_total", "Spooled submissions inserted into MongoDB",
+    lambda: spool_replayer.replayed if spool_replayer else 0, kind="counter",
+)
+metrics.registry.gauge("asyncio_tasks", "Tasks alive on the event loop", lambda: len(asyncio.all_tasks()))
+for _cache in (quote_cache, testimonial_cache):
+    metrics.registry.gauge(f"cache_{_cache.name}_hits_total", f"{_cache.name} cache hits", lambda c=_cache: c.hits, kind="counter")
+    metrics.registry.gauge(f"cache_{_cache.name}_misses_total", f"{_cache.name} cache misses", lambda c=_cache: c.misses, kind="counter")
+
+# ============== APP FACTORY ==============
+
+async def provision_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Failed to ensure indexes: {str(e)}")
+        return
+    # Opt-in: fails startup loudly if a route's query would scan a collection
+    if env_flag('VERIFY_QUERY_PLANS'):
+        await verify_query_plans(db)
+
+created_at_migration: Optional[asyncio.Task] = None
+
+async def run_created_at_migration():
+    try:
+        await migrate_created_at(db, batch_size=MIGRATION_BATCH_SIZE, pause=0.05)
+    except Exception as e:
+        logger.error(f"created_at migration failed: {str(e)}")
+
+retention_task: Optional[asyncio.Task] = None
+
+async def run_retention():
+    """Archive expired quotes and contacts now, then every RETENTION_INTERVAL_HOURS"""
+    while True:
+        try:
+            await apply_retention(db, RETENTION_POLICIES, batch_size=RETENTION_BATCH_SIZE, pause=0.05)
+        except Exception as e:
+            logger.error(f"Retention run failed: {str(e)}")
+        await asyncio.sleep(RETENTION_INTERVAL_HOURS * 3600)
+
+def start_write_coalescers():
+    if not WRITE_COALESCING:
+        return
+    for collection in ("quotes", "contacts"):
+        write_coalescers[collection] = WriteCoalescer(
+            db[collection],
+            max_batch=WRITE_COALESCE_MAX_BATCH,
+            max_delay=WRITE_COALESCE_MAX_DELAY_MS / 1000,
+        )
+
+async def warm_pool(database, connections: int):
+    """Open ``connections`` pooled sockets now rather than on the first requests"""
+    if connections <= 0:
+        return
+    try:
+        await asyncio.gather(*(database.command("ping") for _ in range(connections)))
+    except Exception as e:
+        logger.error(f"Failed to warm the MongoDB pool: {str(e)}")
+
+def create_app(settings: Optional[Settings] = None, database=None, mail_transport=None) -> FastAPI:
+    """Build the ASGI app; the Motor client is opened by the lifespan, in the serving process.
+
+    ``database`` and ``mail_transport`` replace the MongoDB database and the
+    env-configured mail transport (used by the benchmarks).
+    """
+    settings = settings or Settings.from_env()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        global client, db, created_at_migration, retention_task, rates_watch, spool_replayer
+        if database is None:
+            client = AsyncIOMotorClient(
+                settings.mongo_url,
+                tz_aware=True,
+                maxPoolSize=settings.mongo_max_pool_size,
+                minPoolSize=settings.mongo_min_pool_size,
+                event_listeners=[metrics.MongoCommandListener()],
+            )
+            db = client[settings.db_name]
+            await warm_pool(db, settings.mongo_warm_connections)
+        else:
+            client, db = None, database
+
+        await provision_indexes()
+        await load_exchange_rates()
+        if EXCHANGE_RATES_POLL_INTERVAL > 0:
+            rates_watch = asyncio.create_task(poll_exchange_rates())
+        await follow_catalog()
+        if MIGRATE_CREATED_AT:
+            created_at_migration = asyncio.create_task(run_created_at_migration())
+        if RETENTION_POLICIES:
+            retention_task = asyncio.create_task(run_retention())
+        mail_worker.outbox = db.outbox
+        mail_worker.transport = mail_transport or transport_from_env(os.environ)
+        await mail_worker.start()
+        start_write_coalescers()
+        write_spool.open()
+        spool_replayer = SpoolReplayer(write_spool, write_breaker, db, replayed_submissions)
+        spool_replayer.start()
+        try:
+            yield
+        finally:
+            await spool_replayer.stop()
+            write_spool.close()
+            await catalog_store.stop()
+            for coalescer in write_coalescers.values():
+                await coalescer.stop()
+            write_coalescers.clear()
+            if created_at_migration is not None:
+                created_at_migration.cancel()
+                created_at_migration = None
+            if retention_task is not None:
+                retention_task.cancel()
+                retention_task = None
+            if rates_watch is not None:
+                rates_watch.cancel()
+                rates_watch = None
+            await mail_worker.stop()
+            if client is not None:
+                client.close()
+
+    app = FastAPI(title="Neuronova API", lifespan=lifespan)
+    app.include_router(api_router)
+
+    # Inside CORS, so browsers can read the 429s
+    if ADMISSION_CONTROL:
+        app.add_middleware(
+            AdmissionMiddleware, controller=admission_controller, paths=ADMISSION_PATHS,
+            batch_paths=ADMISSION_BATCH_PATHS, batch_max_body=BATCH_MAX_BYTES,
+        )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, token=PROFILE_TOKEN, sample_rate=PROFILE_SAMPLE_RATE)
+
+    # Sets the request id that every log line of the request carries
+    if ACCESS_LOG:
+        app.add_middleware(RequestLogMiddleware)
+
+    # Outermost, so latency covers CORS and error handling too
+    app.add_middleware(metrics.MetricsMiddleware)
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# `uvicorn server:app`; building the app opens no connections, so it is safe to preload before forking
+app = create_app()
@@ -0,0 +1,377 @@
+"""Keep accepting submissions while MongoDB is slow or down.
+
+Writes from the public routes go through a CircuitBreaker. Each call is
+bounded by a timeout. Consecutive failures, timeouts or over-slow calls
+open the breaker, and while it is open nothing is sent to MongoDB. After
+``reset_timeout`` a single probe call decides whether it closes again.
+
+Documents that cannot be written (breaker open, timeout, connection error)
+go to a WriteSpool: append-only JSON-lines segment files, fsync'd before
+the request is answered, rotated at ``segment_bytes`` and capped at
+``max_bytes`` in total. The SpoolReplayer drains the oldest segment into
+MongoDB whenever the breaker lets it. It upserts on ``id`` with
+``$setOnInsert``, so replaying a segment twice (after a crash, or after a
+timed-out insert that did land) never duplicates a record.
+
+A spooled document never had its follow-up work (notification, rollups)
+done by the request, even when its timed-out insert landed anyway. So the
+replayer reports every spooled document to ``on_replayed`` unless it has a
+marker in the ``spool_notified`` collection, then writes that marker: a
+segment replayed again after a crash repeats at most the batch that was in
+progress. Markers live apart from the records so that reads, exports and
+archives never see them, and expire after a TTL (see indexes.py).
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+# Errors that say something about the database's health, not the document
+TRIP_ERRORS = (asyncio.TimeoutError, ConnectionFailure)
+
+_JSON_OPTIONS = json_util.JSONOptions(tz_aware=True, json_mode=json_util.JSONMode.RELAXED)
+
+# One ``{"_id": "<collection>:<id>"}`` marker per replayed document whose follow-up work was done
+NOTIFIED_COLLECTION = "spool_notified"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the breaker is open"""
+
+
+class SpoolFullError(Exception):
+    """Raised when an append would take the spool past its size bound"""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        timeout: float = 2.0,
+        slow_call: float = 0.5,
+        reset_timeout: float = 10.0,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.timeout = timeout
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def ready(self) -> bool:
+        """Whether allow() would let a call through, without claiming the probe"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return self.clock() - self._opened_at >= self.reset_timeout
+        return not self._probing
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.trips += 1
+            logger.warning(f"Database circuit opened after {self._failures} bad calls")
+        self.state = self.OPEN
+        self._opened_at = self.clock()
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+
+    def record_success(self, elapsed: float, slow_call: Optional[float] = None):
+        if elapsed >= (slow_call or self.slow_call):
+            # Answered, but too slowly to keep sending traffic
+            self.record_failure()
+            return
+        if self.state != self.CLOSED:
+            logger.info("Database circuit closed")
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    async def call(self, operation: Callable[[], Awaitable], timeout: Optional[float] = None,
+                   slow_call: Optional[float] = None):
+        """Run ``operation`` unless the breaker is open; ``timeout``/``slow_call`` override the defaults"""
+        if not self.allow():
+            raise CircuitOpenError()
+        started = self.clock()
+        try:
+            result = await asyncio.wait_for(operation(), timeout or self.timeout)
+        except TRIP_ERRORS:
+            self.record_failure()
+            raise
+        except Exception:
+            # The database answered (e.g. duplicate key): healthy, the document is not
+            self.record_success(self.clock() - started, slow_call)
+            raise
+        except BaseException:
+            self._probing = False
+            raise
+        self.record_success(self.clock() - started, slow_call)
+        return result
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WriteSpool:
+    """Segments live in ``<root>/<pid>/``, so worker processes never share a file"""
+
+    def __init__(self, root: Path, segment_bytes: int = 4 * 1024 * 1024, max_bytes: int = 256 * 1024 * 1024):
+        self.root = Path(root)
+        self.directory = self.root / str(os.getpid())
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.spooled = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._sequence = 0
+        self._active_bytes = 0
+        self._closed_bytes = 0
+
+    @property
+    def size(self) -> int:
+        return self._closed_bytes + self._active_bytes
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob("*.jsonl"))
+
+    def open(self):
+        """Create this process's directory and adopt segments left by processes that are gone"""
+        self.directory = self.root / str(os.getpid())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            sequence = int(self._segments()[-1].stem) if self._segments() else 0
+            for other in sorted(self.root.iterdir()):
+                if other == self.directory or not other.name.isdigit() or _alive(int(other.name)):
+                    continue
+                for segment in sorted(other.glob("*.jsonl")):
+                    sequence += 1
+                    try:
+                        segment.rename(self.directory / f"{sequence:012d}.jsonl")
+                    except FileNotFoundError:
+                        pass  # adopted by another process first
+                try:
+                    other.rmdir()
+                except OSError:
+                    pass
+            segments = self._segments()
+            self._closed_bytes = sum(p.stat().st_size for p in segments)
+            self._sequence = int(segments[-1].stem) if segments else 0
+            self._file = None
+            self._active_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._closed_bytes += self._active_bytes
+                self._active_bytes = 0
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._closed_bytes += self._active_bytes
+        self._sequence += 1
+        self._file = open(self.directory / f"{self._sequence:012d}.jsonl", "ab")
+        self._active_bytes = 0
+        # Make the new file's directory entry durable too
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _append(self, lines: bytes, count: int):
+        with self._lock:
+            if self.size + len(lines) > self.max_bytes:
+                raise SpoolFullError()
+            if self._file is None or self._active_bytes >= self.segment_bytes:
+                self._rotate()
+            self._file.write(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._active_bytes += len(lines)
+            self.spooled += count
+
+    async def append(self, collection: str, doc: dict):
+        """Durably record ``doc`` for ``collection``; returns once it is on disk"""
+        await self.append_many(collection, [doc])
+
+    async def append_many(self, collection: str, docs: List[dict]):
+        """Durably record all of ``docs`` with one write and one fsync, or none of them"""
+        lines = b"".join(
+            json_util.dumps({"collection": collection, "doc": doc}, json_options=_JSON_OPTIONS).encode() + b"\n"
+            for doc in docs
+        )
+        await asyncio.to_thread(self._append, lines, len(docs))
+
+    def _take(self) -> Optional[Path]:
+        with self._lock:
+            segments = self._segments()
+            if not segments:
+                return None
+            active = self._file is not None and segments[-1].stem == f"{self._sequence:012d}"
+            if active and len(segments) == 1:
+                if not self._active_bytes:
+                    return None
+                # Only the active segment has data: seal it so it can be replayed
+                self._file.close()
+                self._file = None
+                self._closed_bytes += self._active_bytes
+                self._active_bytes = 0
+            return segments[0]
+
+    def oldest_segment(self) -> Optional[Tuple[Path, Dict[str, List[dict]]]]:
+        """The oldest sealed segment and its documents per collection"""
+        path = self._take()
+        if path is None:
+            return None
+        records: Dict[str, List[dict]] = {}
+        with open(path, "rb") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json_util.loads(line, json_options=_JSON_OPTIONS)
+                except (ValueError, json.JSONDecodeError):
+                    # A torn last line from a crash mid-append; it was never acknowledged
+                    logger.warning(f"Skipping unreadable spool line {path.name}:{number}")
+                    continue
+                records.setdefault(record["collection"], []).append(record["doc"])
+        return path, records
+
+    def remove(self, path: Path):
+        with self._lock:
+            size = path.stat().st_size
+            path.unlink()
+            self._closed_bytes -= size
+
+
+class SpoolReplayer:
+    def __init__(
+        self,
+        spool: WriteSpool,
+        breaker: CircuitBreaker,
+        database,
+        on_replayed: Optional[Callable[[str, List[dict]], Awaitable]] = None,
+        interval: float = 1.0,
+        batch_size: int = 500,
+    ):
+        self.spool = spool
+        self.breaker = breaker
+        self.database = database
+        self.on_replayed = on_replayed
+        self.interval = interval
+        self.batch_size = batch_size
+        self.replayed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                drained = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Spool replay failed: {str(e)}")
+                drained = False
+            if not drained:
+                await asyncio.sleep(self.interval)
+
+    async def drain_once(self) -> bool:
+        """Replay the oldest segment if the breaker allows; True when one was removed"""
+        if self.spool.size == 0 or not self.breaker.ready():
+            return False
+        segment = self.spool.oldest_segment()
+        if segment is None:
+            return False
+        path, records = segment
+        for collection, docs in records.items():
+            for start in range(0, len(docs), self.batch_size):
+                batch = docs[start:start + self.batch_size]
+                try:
+                    await self._upsert(collection, batch)
+                    pending = await self._unnotified(collection, batch)
+                    if pending and self.on_replayed is not None:
+                        await self.on_replayed(collection, pending)
+                    await self._mark_notified(collection, pending)
+                except (CircuitOpenError, *TRIP_ERRORS):
+                    # The segment stays on disk and is replayed from the top next time
+                    return False
+                self.replayed += len(pending)
+        self.spool.remove(path)
+        logger.info(f"Replayed spool segment {path.name}")
+        return True
+
+    async def _upsert(self, collection: str, docs: List[dict]):
+        requests = [UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs]
+        await self.breaker.call(lambda: self.database[collection].bulk_write(requests, ordered=False))
+
+    async def _unnotified(self, collection: str, docs: List[dict]) -> List[dict]:
+        """The documents whose follow-up work has not been done yet"""
+        query = {"_id": {"$in": [f"{collection}:{doc['id']}" for doc in docs]}}
+        found = await self.breaker.call(
+            lambda: self.database[NOTIFIED_COLLECTION].find(query, {"_id": 1}).to_list(len(docs))
+        )
+        done = {marker["_id"] for marker in found}
+        return [doc for doc in docs if f"{collection}:{doc['id']}" not in done]
+
+    async def _mark_notified(self, collection: str, docs: List[dict]):
+        if docs:
+            now = datetime.now(timezone.utc)
+            requests = [
+                UpdateOne({"_id": f"{collection}:{doc['id']}"}, {"$setOnInsert": {"notified_at": now}}, upsert=True)
+                for doc in docs
+            ]
+            await self.breaker.call(
+                lambda: self.database[NOTIFIED_COLLECTION].bulk_write(requests, ordered=False)
+            )
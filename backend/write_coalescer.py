@@ -0,0 +1,93 @@
+"""Group commit for single-document inserts.
+
+Concurrent ``insert`` calls are collected for at most ``max_delay`` seconds
+or ``max_batch`` documents and written with one unordered ``insert_many``.
+Every caller awaits its own future and gets back exactly the outcome of its
+document: success, its own write error (e.g. a duplicate key), or the error
+that failed the whole batch.
+"""
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+logger = logging.getLogger(__name__)
+
+
+def _write_error(error: dict) -> WriteError:
+    if error.get("code") == 11000:
+        return DuplicateKeyError(error.get("errmsg", "duplicate key"), 11000, error)
+    return WriteError(error.get("errmsg", "write error"), error.get("code"), error)
+
+
+class WriteCoalescer:
+    def __init__(self, collection, max_batch: int = 100, max_delay: float = 0.005):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.documents = 0
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def insert(self, doc: dict):
+        """Insert ``doc`` as part of the next batch and wait for its outcome"""
+        if self._closed:
+            await self.collection.insert_one(doc)
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush_now)
+        await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        docs = [doc for doc, _ in batch]
+        errors = {}
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: _write_error(error) for error in e.details.get("writeErrors", [])}
+            if not errors:
+                errors = {i: e for i in range(len(batch))}
+        except Exception as e:
+            logger.error(f"Batched insert into {self.collection.name} failed: {str(e)}")
+            errors = {i: e for i in range(len(batch))}
+
+        self.batches += 1
+        self.documents += len(batch)
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(None)
+
+    async def stop(self):
+        """Flush whatever is pending and wait for in-flight batches"""
+        self._closed = True
+        self._flush_now()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
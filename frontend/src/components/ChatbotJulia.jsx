@@ -12,133 +12,6 @@ import axios from "axios";
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
-// Services Database
-const SERVICES_DB = {
-  creation: {
-    name: "Création & Développement",
-    services: [
-      { id: "site-vitrine", name: "Site vitrine simple (1-5 pages)", price_usd: 400, price_fc: 880000 },
-      { id: "site-pro", name: "Site pro complet (5-10 pages)", price_usd: 800, price_fc: 1760000 },
-      { id: "ecommerce", name: "E-commerce (avec paiement)", price_usd: 1300, price_fc: 2860000 },
-      { id: "app-mobile", name: "Application mobile (Android/iOS)", price_usd: 2000, price_fc: 4400000 },
-      { id: "app-web", name: "Application web", price_usd: 1000, price_fc: 2200000 },
-      { id: "maintenance", name: "Maintenance site mensuelle", price_usd: 50, price_fc: 110000 },
-      { id: "refonte", name: "Mise à jour & refonte", price_usd: 100, price_fc: 220000 },
-    ]
-  },
-  ai: {
-    name: "Intelligence Artificielle",
-    services: [
-      { id: "agent-ai", name: "Agent AI (WhatsApp, Web)", price_usd: 250, price_fc: 550000 },
-      { id: "generateur-devis", name: "Générateur automatique de devis", price_usd: 150, price_fc: 330000 },
-      { id: "integration-ia", name: "Intégration IA sur site", price_usd: 200, price_fc: 440000 },
-      { id: "agent-julia", name: "Agent Julia personnalisé", price_usd: 300, price_fc: 660000 },
-      { id: "automatisation", name: "Automatisation des tâches", price_usd: 180, price_fc: 396000 },
-    ]
-  },
-  design: {
-    name: "Design & Contenu",
-    services: [
-      { id: "logo", name: "Logo professionnel", price_usd: 50, price_fc: 110000 },
-      { id: "identite-visuelle", name: "Identité visuelle complète", price_usd: 120, price_fc: 264000 },
-      { id: "affiche", name: "Affiche/flyer pro", price_usd: 30, price_fc: 66000 },
-      { id: "video-promo", name: "Vidéo promotionnelle", price_usd: 100, price_fc: 220000 },
-      { id: "powerpoint", name: "Présentation PowerPoint", price_usd: 40, price_fc: 88000 },
-      { id: "motion-design", name: "Motion design", price_usd: 90, price_fc: 198000 },
-      { id: "montage-video", name: "Montage vidéo", price_usd: 80, price_fc: 176000 },
-    ]
-  },
-  security: {
-    name: "Sécurité & Hébergement",
-    services: [
-      { id: "hebergement", name: "Hébergement cloud (mensuel)", price_usd: 25, price_fc: 55000 },
-      { id: "ssl", name: "Sécurisation site / SSL", price_usd: 30, price_fc: 66000 },
-      { id: "firewall", name: "Firewall & protection cyber", price_usd: 150, price_fc: 330000 },
-      { id: "monitoring", name: "Monitoring & sauvegarde", price_usd: 60, price_fc: 132000 },
-    ]
-  },
-  business: {
-    name: "Entrepreneuriat",
-    services: [
-      { id: "business-plan", name: "Création de business plan", price_usd: 500, price_fc: 1100000 },
-      { id: "creation-entreprise", name: "Accompagnement création entreprise", price_usd: 200, price_fc: 440000 },
-      { id: "coaching", name: "Coaching entrepreneurial (séance)", price_usd: 40, price_fc: 88000 },
-      { id: "formation", name: "Formation entrepreneuriale", price_usd: 150, price_fc: 330000 },
-      { id: "diagnostic", name: "Diagnostic entreprise numérique", price_usd: 70, price_fc: 154000 },
-      { id: "pitch-deck", name: "Élaboration pitch deck", price_usd: 60, price_fc: 132000 },
-      { id: "mentorat", name: "Mentorat 1 mois", price_usd: 150, price_fc: 330000 },
-    ]
-  },
-  innovation: {
-    name: "Prototypage & Innovation",
-    services: [
-      { id: "prototype-gadget", name: "Conception prototype gadget", price_usd: 500, price_fc: 1100000 },
-      { id: "fabrication-prototype", name: "Fabrication prototype tech", price_usd: 800, price_fc: 1760000 },
-      { id: "prototype-ai-iot", name: "Prototype AI ou IoT", price_usd: 600, price_fc: 1320000 },
-    ]
-  }
-};
-
-const PACKS = [
-  {
-    id: "pack-lancement",
-    name: "Pack Lancement d'Entreprise",
-    description: "Logo + Site vitrine + Business plan + PowerPoint + Coaching",
-    price_usd: 370,
-    price_fc: 814000,
-    savings: 260
-  },
-  {
-    id: "pack-digitalisation",
-    name: "Pack Digitalisation PME",
-    description: "Site pro + Agent AI + Hébergement + SSL + Diagnostic + Formation",
-    price_usd: 1200,
-    price_fc: 2640000,
-    savings: 255
-  },
-  {
-    id: "pack-createur",
-    name: "Pack Créateur de Contenu",
-    description: "Identité visuelle + Vidéo promo + Affiches + Montage vidéo",
-    price_usd: 300,
-    price_fc: 660000,
-    savings: 100
-  }
-];
-
-const QUIZ_QUESTIONS = [
-  {
-    id: 1,
-    question: "Quel est votre objectif principal ?",
-    options: [
-      { text: "Créer ma présence en ligne", tags: ["site-vitrine", "logo"] },
-      { text: "Vendre en ligne", tags: ["ecommerce", "site-pro"] },
-      { text: "Automatiser mon business", tags: ["agent-ai", "automatisation"] },
-      { text: "Lancer mon entreprise", tags: ["business-plan", "coaching"] }
-    ]
-  },
-  {
-    id: 2,
-    question: "Quel est votre budget approximatif ?",
-    options: [
-      { text: "Moins de 200$", budget: 200 },
-      { text: "200$ - 500$", budget: 500 },
-      { text: "500$ - 1000$", budget: 1000 },
-      { text: "Plus de 1000$", budget: 2000 }
-    ]
-  },
-  {
-    id: 3,
-    question: "Quel est votre secteur d'activité ?",
-    options: [
-      { text: "Commerce / Retail", tags: ["ecommerce", "identite-visuelle"] },
-      { text: "Services / Consulting", tags: ["site-pro", "agent-ai"] },
-      { text: "Tech / Startup", tags: ["app-web", "prototype-ai-iot"] },
-      { text: "Autre", tags: ["site-vitrine", "logo"] }
-    ]
-  }
-];
-
 export default function ChatbotJulia() {
   const [isOpen, setIsOpen] = useState(false);
   const [messages, setMessages] = useState([]);
@@ -147,8 +20,10 @@ export default function ChatbotJulia() {
   const [currentView, setCurrentView] = useState("chat"); // chat, quote, services, quiz
   const [selectedServices, setSelectedServices] = useState([]);
   const [clientInfo, setClientInfo] = useState({ name: "", email: "", phone: "", company: "" });
+  const [quizQuestions, setQuizQuestions] = useState([]);
   const [quizAnswers, setQuizAnswers] = useState([]);
   const [currentQuizQuestion, setCurrentQuizQuestion] = useState(0);
+  const [catalog, setCatalog] = useState({ categories: {}, packs: [] });
   const messagesEndRef = useRef(null);
 
   const scrollToBottom = () => {
@@ -159,6 +34,13 @@ export default function ChatbotJulia() {
     scrollToBottom();
   }, [messages]);
 
+  useEffect(() => {
+    if (!isOpen || catalog.packs.length) return;
+    axios.get(`${API}/bootstrap`, { params: { fields: "pricing" } })
+      .then(response => setCatalog(response.data.pricing))
+      .catch(error => console.error("Error loading catalog:", error));
+  }, [isOpen, catalog.packs.length]);
+
   useEffect(() => {
     if (isOpen && messages.length === 0) {
       addBotMessage(
@@ -205,12 +87,7 @@ export default function ChatbotJulia() {
         addBotMessage("Voici nos catégories de services. Clique sur une catégorie pour voir les détails et les prix ! 💼");
         break;
       case "quiz":
-        setCurrentView("quiz");
-        setCurrentQuizQuestion(0);
-        setQuizAnswers([]);
-        addBotMessage(QUIZ_QUESTIONS[0].question, 
-          QUIZ_QUESTIONS[0].options.map(o => ({ text: o.text, action: "quiz-answer", data: o }))
-        );
+        startQuiz();
         break;
       case "contact":
         addBotMessage(
@@ -258,49 +135,64 @@ export default function ChatbotJulia() {
     }
   };
 
-  const handleQuizAnswer = (data) => {
-    const newAnswers = [...quizAnswers, data];
+  const askQuizQuestion = (question) => {
+    addBotMessage(question.question,
+      question.options.map((text, index) => ({ text, action: "quiz-answer", data: index }))
+    );
+  };
+
+  const startQuiz = async () => {
+    try {
+      const response = await axios.get(`${API}/assistant/quiz`);
+      setQuizQuestions(response.data);
+      setCurrentView("quiz");
+      setCurrentQuizQuestion(0);
+      setQuizAnswers([]);
+      askQuizQuestion(response.data[0]);
+    } catch (error) {
+      addBotMessage("Oups ! Le quiz est indisponible pour le moment. Tu peux générer un devis directement ! 📊", [
+        { text: "📊 Générer un devis", action: "quote" }
+      ]);
+    }
+  };
+
+  const handleQuizAnswer = (index) => {
+    const newAnswers = [...quizAnswers, index];
     setQuizAnswers(newAnswers);
 
-    if (currentQuizQuestion < QUIZ_QUESTIONS.length - 1) {
+    if (currentQuizQuestion < quizQuestions.length - 1) {
       const nextQ = currentQuizQuestion + 1;
       setCurrentQuizQuestion(nextQ);
-      setTimeout(() => {
-        addBotMessage(QUIZ_QUESTIONS[nextQ].question,
-          QUIZ_QUESTIONS[nextQ].options.map(o => ({ text: o.text, action: "quiz-answer", data: o }))
-        );
-      }, 500);
+      setTimeout(() => askQuizQuestion(quizQuestions[nextQ]), 500);
     } else {
-      // Generate recommendation
       generateRecommendation(newAnswers);
     }
   };
 
-  const generateRecommendation = (answers) => {
-    const budget = answers.find(a => a.budget)?.budget || 500;
-    const tags = answers.flatMap(a => a.tags || []);
-    
-    let recommendation = "";
-    let suggestedPack = null;
-
-    if (budget <= 200) {
-      recommendation = "Avec ton budget, je te recommande de commencer par un logo professionnel et une page de présentation. C'est la base ! 🎯";
-    } else if (budget <= 500) {
-      recommendation = "Parfait ! Tu peux te lancer avec notre Pack Lancement d'Entreprise. Il inclut tout ce dont tu as besoin pour démarrer ! 🚀";
-      suggestedPack = PACKS[0];
-    } else if (budget <= 1000) {
-      recommendation = "Excellent budget ! Je te conseille le Pack Digitalisation PME pour une transformation digitale complète. 💼";
-      suggestedPack = PACKS[1];
-    } else {
-      recommendation = "Avec ce budget, tu peux vraiment faire des choses incroyables ! Je te propose un devis personnalisé. 🌟";
+  const formatItem = (item) =>
+    `• ${item.name}: ${item.prices.USD}$ (${item.prices.CDF.toLocaleString()} FC)`;
+
+  const generateRecommendation = async (answers) => {
+    setCurrentView("chat");
+    let recommendation;
+    try {
+      const response = await axios.post(`${API}/assistant`, { quiz_answers: answers });
+      recommendation = response.data;
+    } catch (error) {
+      addBotMessage("Oups ! Je n'ai pas pu préparer ta recommandation. Contacte-nous directement ! 📱", [
+        { text: "📞 Parler à un conseiller", action: "contact" }
+      ]);
+      return;
     }
 
-    addBotMessage(recommendation);
+    const { text, pack, services } = recommendation;
+    addBotMessage(services.length ? `${text}\n\n${services.map(formatItem).join("\n")}` : text);
 
-    if (suggestedPack) {
+    if (pack) {
+      const suggestedPack = { ...catalog.packs.find(p => p.id === pack.id), ...pack, price_usd: pack.prices.USD, price_fc: pack.prices.CDF };
       setTimeout(() => {
         addBotMessage(
-          `✨ ${suggestedPack.name}\n${suggestedPack.description}\n\n💰 Prix: ${suggestedPack.price_usd}$ (${suggestedPack.price_fc.toLocaleString()} FC)\n🎁 Économie: ${suggestedPack.savings}$`,
+          `✨ ${suggestedPack.name}\n${suggestedPack.description}\n\n💰 Prix: ${suggestedPack.price_usd}$ (${suggestedPack.price_fc.toLocaleString()} FC)${suggestedPack.savings ? `\n🎁 ${suggestedPack.savings}` : ""}`,
           [
             { text: "✅ Je prends ce pack !", action: "pack", data: suggestedPack },
             { text: "🔧 Je préfère personnaliser", action: "quote" },
@@ -316,8 +208,6 @@ export default function ChatbotJulia() {
         ]);
       }, 1000);
     }
-
-    setCurrentView("chat");
   };
 
   const selectPack = (pack) => {
@@ -326,23 +216,20 @@ export default function ChatbotJulia() {
     setCurrentView("collect-info");
   };
 
-  const handleDefaultResponse = (text) => {
-    const lowerText = text.toLowerCase();
-    
-    if (lowerText.includes("prix") || lowerText.includes("coût") || lowerText.includes("tarif")) {
-      addBotMessage("Pour les tarifs, je te conseille de consulter notre section Tarifs ou de générer un devis personnalisé ! 💰", [
-        { text: "📊 Générer un devis", action: "quote" },
-        { text: "🛒 Voir les tarifs", action: "services" }
-      ]);
-    } else if (lowerText.includes("délai") || lowerText.includes("temps") || lowerText.includes("combien de temps")) {
-      addBotMessage("Nos délais sont optimisés ⚡\n\n• Site vitrine: 72h\n• Application web: 168h (7 jours)\n• Projet IA: 2 semaines\n\nOn est rapides ! 🚀");
-    } else if (lowerText.includes("bonjour") || lowerText.includes("salut") || lowerText.includes("hello")) {
-      addBotMessage("Salut ! 👋 Bienvenue chez Neuronova ! Comment puis-je t'aider aujourd'hui ?", [
-        { text: "📊 Générer un devis", action: "quote" },
-        { text: "🛒 Voir nos services", action: "services" },
-        { text: "❓ Poser une question", action: "question" }
-      ]);
-    } else {
+  const handleDefaultResponse = async (text) => {
+    try {
+      const response = await axios.post(`${API}/assistant`, { message: text });
+      const { text: reply, matches } = response.data;
+      addBotMessage(
+        matches.length ? `${reply}\n\n${matches.map(formatItem).join("\n")}` : reply,
+        [
+          { text: "📊 Générer un devis", action: "quote" },
+          matches.length
+            ? { text: "🛒 Voir nos services", action: "services" }
+            : { text: "📞 Parler à l'équipe", action: "contact" }
+        ]
+      );
+    } catch (error) {
       addBotMessage("Merci pour ton message ! 😊 Pour mieux t'aider, tu peux :", [
         { text: "📊 Générer un devis", action: "quote" },
         { text: "📞 Parler à l'équipe", action: "contact" }
@@ -382,20 +269,16 @@ export default function ChatbotJulia() {
   };
 
   const finalizeQuote = async (info) => {
-    const total_usd = selectedServices.reduce((sum, s) => sum + (s.price_usd || 0), 0);
-    const total_fc = selectedServices.reduce((sum, s) => sum + (s.price_fc || 0), 0);
-
     try {
-      await axios.post(`${API}/quotes`, {
+      const response = await axios.post(`${API}/quotes`, {
         client_name: info.name,
         client_email: info.email || null,
         client_phone: info.phone || null,
         company_name: info.company,
-        services: selectedServices.map(s => s.name),
-        total_usd,
-        total_fc,
+        services: selectedServices.map(s => s.id),
         notes: selectedServices.some(s => s.isPack) ? "Pack sélectionné" : "Services à la carte"
       });
+      const { total_usd, total_fc } = response.data.pricing;
 
       addBotMessage(
         `🎉 Excellent ${info.name} ! Ton devis est prêt !\n\n` +
@@ -586,7 +469,7 @@ export default function ChatbotJulia() {
               {currentView === "quote" && (
                 <div className="p-4">
                   <div className="space-y-4">
-                    {Object.entries(SERVICES_DB).map(([catId, category]) => (
+                    {Object.entries(catalog.categories).map(([catId, category]) => (
                       <div key={catId} className="rounded-xl border border-white/10 overflow-hidden">
                         <div className="bg-slate-800 px-4 py-3">
                           <h4 className="font-semibold text-white text-sm">{category.name}</h4>
@@ -653,7 +536,7 @@ export default function ChatbotJulia() {
                   <div className="text-center mb-4">
                     <p className="text-slate-400 text-sm">Nos packs populaires 🔥</p>
                   </div>
-                  {PACKS.map((pack) => (
+                  {catalog.packs.map((pack) => (
                     <motion.div
                       key={pack.id}
                       initial={{ opacity: 0, y: 10 }}
@@ -666,7 +549,7 @@ export default function ChatbotJulia() {
                         <div>
                           <span className="text-lg font-bold text-primary">{pack.price_usd}$</span>
                           <span className="text-xs text-slate-400 ml-2">({pack.price_fc.toLocaleString()} FC)</span>
-                          <span className="block text-xs text-green-400">Économie: {pack.savings}$</span>
+                          <span className="block text-xs text-green-400">{pack.savings}</span>
                         </div>
                         <Button 
                           size="sm"
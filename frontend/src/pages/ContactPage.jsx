@@ -61,6 +61,10 @@ export default function ContactPage() {
       toast.success(response.data.message);
       setFormData({ name: "", email: "", phone: "", message: "" });
     } catch (error) {
+      if (error.response?.status === 429) {
+        toast.error("Trop d'envois rapprochés. Veuillez patienter quelques instants.");
+        return;
+      }
       toast.error("Une erreur est survenue. Veuillez réessayer.");
       console.error("Contact submission error:", error);
     } finally {
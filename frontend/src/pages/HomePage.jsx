@@ -417,6 +417,10 @@ export default function HomePage() {
       toast.success(response.data.message);
       setContactForm({ name: "", email: "", phone: "", message: "" });
     } catch (error) {
+      if (error.response?.status === 429) {
+        toast.error("Trop d'envois rapprochés. Veuillez patienter quelques instants.");
+        return;
+      }
       toast.error("Une erreur est survenue. Veuillez réessayer.");
     } finally {
       setIsLoading(false);
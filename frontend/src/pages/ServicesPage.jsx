@@ -91,8 +91,8 @@ export default function ServicesPage() {
 
   const fetchServices = async () => {
     try {
-      const response = await axios.get(`${API}/services`);
-      setServices(response.data);
+      const response = await axios.get(`${API}/bootstrap`, { params: { fields: "services" } });
+      setServices(response.data.services);
     } catch (error) {
       console.error("Error fetching services:", error);
     }
@@ -0,0 +1,131 @@
+import asyncio
+
+import orjson
+import pytest
+
+from admission import AdmissionController, AdmissionMiddleware, TokenBuckets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_a_burst_then_refills_at_rate():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1, capacity=3, clock=clock)
+    assert [buckets.take("a") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a") == pytest.approx(1)
+    clock.now = 0.5
+    assert buckets.take("a") == pytest.approx(0.5)
+    clock.now = 1
+    assert buckets.take("a") == 0
+
+
+def test_buckets_are_per_key():
+    buckets = TokenBuckets(rate=1, capacity=1, clock=Clock())
+    assert buckets.take("a") == 0
+    assert buckets.take("a") > 0
+    assert buckets.take("b") == 0
+
+
+def test_cost_above_capacity_needs_a_full_bucket_and_leaves_debt():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1, capacity=10, clock=clock)
+    assert buckets.take("a", 25) == 0
+    # 15 tokens in debt: a full token is 16 seconds away
+    assert buckets.take("a") == pytest.approx(16)
+    clock.now = 16
+    assert buckets.take("a") == 0
+    assert buckets.take("a", 25) == pytest.approx(10)
+
+
+def test_sweep_keeps_buckets_until_they_are_full_again():
+    clock = Clock()
+    buckets = TokenBuckets(rate=1, capacity=2, clock=clock)
+    buckets.take("a", 5)
+    buckets.take("b")
+    clock.now = 2
+    buckets.sweep()
+    assert len(buckets) == 1
+    clock.now = 5
+    buckets.sweep()
+    assert len(buckets) == 0
+
+
+@pytest.mark.parametrize("hops, header, expected", [
+    (0, b"1.1.1.1", "10.0.0.1"),
+    (1, b"6.6.6.6, 1.1.1.1", "1.1.1.1"),
+    (2, b"6.6.6.6, 1.1.1.1, 10.0.0.2", "1.1.1.1"),
+    (2, b"1.1.1.1", "10.0.0.1"),
+])
+def test_client_ip_trusts_only_the_proxy_hops(hops, header, expected):
+    controller = AdmissionController(forwarded_hops=hops)
+    scope = {"headers": [(b"x-forwarded-for", header)], "client": ("10.0.0.1", 1234)}
+    assert controller.client_ip(scope) == expected
+
+
+async def accepted(scope, receive, send):
+    message = await receive()
+    body = orjson.dumps({"received": len(message["body"])})
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def post(app, path, payload, headers=()):
+    body = orjson.dumps(payload)
+    scope = {
+        "type": "http", "method": "POST", "path": path,
+        "headers": [(b"content-type", b"application/json"), *headers], "client": ("10.0.0.1", 1234),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"]
+
+
+def middleware(**kwargs):
+    controller = AdmissionController(**{"ip_rate": 0.001, "ip_burst": 5, "email_rate": 0.001, "email_burst": 2, **kwargs})
+    app = AdmissionMiddleware(accepted, controller, paths=["/api/contact"], batch_paths=["/api/contact/batch"])
+    return controller, app
+
+
+def test_per_email_limit_and_content_dedupe():
+    controller, app = middleware()
+    assert post(app, "/api/contact", {"email": "A@x.co", "message": "1"}) == 200
+    # The same body again is answered from the stored response
+    assert post(app, "/api/contact", {"message": "1", "email": "A@x.co"}) == 200
+    assert controller.replayed == 1
+    # Both took a token from the (case-insensitive) email's bucket
+    assert post(app, "/api/contact", {"email": "a@x.co", "message": "2"}) == 429
+    assert controller.rejected["email"] == 1
+
+
+def test_batches_are_charged_per_item():
+    controller, app = middleware()
+    items = [{"email": f"u{i}@x.co", "message": "m"} for i in range(4)]
+    assert post(app, "/api/contact/batch", items) == 200
+    assert post(app, "/api/contact/batch", items[:1] + [{"email": "v@x.co", "message": "m"}]) == 429
+    assert controller.rejected["ip"] == 1
+
+
+def test_batch_items_share_their_email_bucket():
+    controller, app = middleware()
+    assert post(app, "/api/contact", {"email": "a@x.co", "message": "0"}) == 200
+    same = [{"email": "a@x.co", "message": str(i)} for i in range(1, 3)]
+    assert post(app, "/api/contact/batch", same) == 429
+    assert controller.rejected["email"] == 1
+
+
+def test_other_paths_and_methods_pass_through():
+    controller, app = middleware(ip_burst=0)
+    assert post(app, "/api/quotes", {"email": "a@x.co"}) == 200
@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timezone
+
+from analytics import QuoteRollups
+from bench.memory_db import MemoryDatabase
+
+
+def day(d, hour=0):
+    return datetime(2026, 10, d, hour, tzinfo=timezone.utc)
+
+
+def rollups_with_quotes_on(days):
+    rollups = QuoteRollups(MemoryDatabase().quote_stats, lambda service_id: 10, lambda service_id: "design")
+    asyncio.run(rollups.record(
+        {"services": ["logo"], "total_usd": 10, "created_at": day(d, 15)} for d in days
+    ))
+    return rollups
+
+
+def query_days(rollups, since=None, until=None):
+    result = asyncio.run(rollups.query(since, until))
+    return [row["day"].day for row in result["by_day"]]
+
+
+def test_query_window_is_half_open_at_day_granularity():
+    rollups = rollups_with_quotes_on([16, 17, 18, 19])
+    assert query_days(rollups, since=day(17), until=day(19)) == [17, 18]
+    # Partial days: since rounds down into its day, until excludes its own day
+    assert query_days(rollups, since=day(17, 12), until=day(18, 12)) == [17]
+    assert query_days(rollups, until=day(18, 23)) == [16, 17]
+    assert query_days(rollups) == [16, 17, 18, 19]
+
+
+def test_naive_bounds_are_read_as_utc():
+    rollups = rollups_with_quotes_on([17, 18])
+    assert query_days(rollups, since=datetime(2026, 10, 18, 5), until=datetime(2026, 10, 19)) == [18]
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from batch import BatchTooLarge, BodyTooLarge, MalformedBatch, read_body, validate_batch
+
+
+class Item(BaseModel):
+    name: str
+    qty: int
+
+
+def test_valid_batch_keeps_every_index():
+    items, invalid = validate_batch(b'[{"name":"a","qty":1},{"name":"b","qty":2}]', Item, 10)
+    assert [i for i, _ in items] == [0, 1]
+    assert items[1][1] == Item(name="b", qty=2)
+    assert invalid == []
+
+
+def test_bad_items_are_reported_without_rejecting_the_batch():
+    body = b'[{"name":"a","qty":1},{"name":"b","qty":"x"},{"qty":3},{"name":"d","qty":4}]'
+    items, invalid = validate_batch(body, Item, 10)
+    assert [(i, item.name) for i, item in items] == [(0, "a"), (3, "d")]
+    assert [(e["index"], e["status"]) for e in invalid] == [(1, "invalid"), (2, "invalid")]
+    assert invalid[0]["errors"][0]["loc"] == ["qty"]
+    assert invalid[1]["errors"][0]["loc"] == ["name"]
+
+
+def test_oversized_batch_is_refused_before_validation():
+    with pytest.raises(BatchTooLarge):
+        validate_batch(b'[1, 2, 3]', Item, 2)
+
+
+@pytest.mark.parametrize("body", [b"not json", b'{"name":"a","qty":1}'])
+def test_malformed_batch(body):
+    with pytest.raises(MalformedBatch):
+        validate_batch(body, Item, 10)
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_read_body_within_the_limit():
+    assert asyncio.run(read_body(_chunks(b"ab", b"cd"), 4)) == b"abcd"
+
+
+def test_read_body_stops_once_past_the_limit():
+    with pytest.raises(BodyTooLarge):
+        asyncio.run(read_body(_chunks(b"ab", b"cd", b"e"), 4))
+
+
+def _post_batch(monkeypatch, content, headers=None, **limits):
+    import httpx
+    from bench.run import load_server
+
+    server = load_server(0)
+    for name, value in limits.items():
+        monkeypatch.setattr(server, name, value)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/contact/batch", content=content, headers=headers or {})
+
+    return asyncio.run(run())
+
+
+def test_route_refuses_too_many_items(monkeypatch):
+    response = _post_batch(monkeypatch, b"[{}, {}, {}]", BATCH_MAX_ITEMS=2)
+    assert response.status_code == 413
+
+
+def test_route_refuses_a_declared_length_over_the_limit(monkeypatch):
+    response = _post_batch(monkeypatch, b"[]", {"content-length": "99999"}, BATCH_MAX_BYTES=10)
+    assert response.status_code == 413
+
+
+def test_route_rejects_a_malformed_content_length(monkeypatch):
+    response = _post_batch(monkeypatch, b"[]", {"content-length": "abc"})
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from starlette.requests import Request
+
+from bootstrap import BootstrapResponses, UnknownSectionError, parse_fields
+from catalog_cache import CatalogResponseCache, encoded_response
+
+CATALOG = {"services": [{"id": "web"}], "services-pricing": {"web": 100}, "packs": [{"id": "p"}]}
+TESTIMONIALS = [{"id": "1", "name": "Ana"}]
+
+
+def responses(publishes=1):
+    catalog = CatalogResponseCache()
+    for _ in range(publishes):
+        catalog.publish(CATALOG)
+    return BootstrapResponses(catalog)
+
+
+def request(**headers):
+    return Request({
+        "type": "http", "method": "GET", "path": "/api/bootstrap",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+def test_parse_fields():
+    assert parse_fields(None) == ("services", "pricing", "packs", "testimonials")
+    assert parse_fields("packs, services") == ("services", "packs")
+    with pytest.raises(UnknownSectionError):
+        parse_fields("services,secrets")
+
+
+def test_body_holds_the_requested_sections():
+    body = json.loads(responses().payload(("services", "testimonials"), TESTIMONIALS).identity)
+    assert set(body) == {"version", "services", "testimonials"}
+    assert body["testimonials"] == TESTIMONIALS
+
+
+def test_same_content_gives_the_same_bytes_in_every_process():
+    one = responses(publishes=1)
+    other = responses(publishes=4)
+    other.payload(("packs",))
+    a = one.payload(parse_fields(None), TESTIMONIALS)
+    b = other.payload(parse_fields(None), [dict(t) for t in TESTIMONIALS])
+    assert a.identity == b.identity
+    assert a.etag == b.etag
+
+
+def test_new_testimonials_change_the_version_and_etag():
+    bootstrap = responses()
+    before = bootstrap.payload(parse_fields(None), TESTIMONIALS)
+    after = bootstrap.payload(parse_fields(None), TESTIMONIALS + [{"id": "2", "name": "Ben"}])
+    assert json.loads(before.identity)["version"] != json.loads(after.identity)["version"]
+    assert before.etag != after.etag
+
+
+def test_304_on_a_matching_etag_from_another_process():
+    etag = encoded_response(responses(1).payload(parse_fields(None), TESTIMONIALS), request(), "no-cache").headers["etag"]
+    payload = responses(2).payload(parse_fields(None), TESTIMONIALS)
+    response = encoded_response(payload, request(if_none_match=etag), "no-cache")
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == "no-cache"
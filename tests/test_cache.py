@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+import cache
+from cache import AsyncTTLCache
+
+
+class Loader:
+    def __init__(self, value="v", delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_concurrent_misses_share_one_load():
+    store, load = AsyncTTLCache("t"), Loader(delay=0.01)
+
+    async def run():
+        return await asyncio.gather(*(store.get_or_load("k", load) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["v"] * 10
+    assert load.calls == 1
+    assert (store.misses, store.coalesced) == (1, 9)
+
+
+def test_hits_until_ttl_expires(clock):
+    store, load = AsyncTTLCache("t", ttl=60), Loader()
+    asyncio.run(store.get_or_load("k", load))
+    clock[0] += 59
+    asyncio.run(store.get_or_load("k", load))
+    assert (load.calls, store.hits) == (1, 1)
+    clock[0] += 1
+    asyncio.run(store.get_or_load("k", load))
+    assert load.calls == 2
+
+
+def test_none_is_only_cached_for_negative_ttl(clock):
+    store, load = AsyncTTLCache("t", ttl=60, negative_ttl=5), Loader(value=None)
+    asyncio.run(store.get_or_load("k", load))
+    asyncio.run(store.get_or_load("k", load))
+    assert load.calls == 1
+    clock[0] += 5
+    asyncio.run(store.get_or_load("k", load))
+    assert load.calls == 2
+
+    uncached = AsyncTTLCache("t", ttl=60)
+    asyncio.run(uncached.get_or_load("k", load))
+    asyncio.run(uncached.get_or_load("k", load))
+    assert load.calls == 4
+
+
+def test_least_recently_used_entry_is_evicted():
+    store = AsyncTTLCache("t", maxsize=2)
+
+    async def run():
+        for key in ("a", "b", "a", "c"):
+            await store.get_or_load(key, Loader(key))
+
+    asyncio.run(run())
+    assert store.evictions == 1
+    assert store._lookup("b") is cache._MISSING
+    assert store._lookup("a") == "a"
+
+
+def test_invalidation_during_a_load_keeps_the_result_out():
+    store = AsyncTTLCache("t")
+
+    async def run():
+        pending = asyncio.ensure_future(store.get_or_load("k", Loader("stale", delay=0.01)))
+        await asyncio.sleep(0)
+        store.invalidate("k")
+        assert await pending == "stale"
+        return await store.get_or_load("k", Loader("fresh"))
+
+    assert asyncio.run(run()) == "fresh"
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    store = AsyncTTLCache("t")
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    async def run():
+        results = await asyncio.gather(*(store.get_or_load("k", broken) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        return await store.get_or_load("k", Loader("ok"))
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_cancelled_caller_does_not_fail_the_shared_load():
+    store, load = AsyncTTLCache("t"), Loader(delay=0.02)
+
+    async def run():
+        first = asyncio.ensure_future(store.get_or_load("k", load))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(store.get_or_load("k", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "v"
+        assert first.cancelled()
+        return await store.get_or_load("k", load)
+
+    assert asyncio.run(run()) == "v"
+    assert load.calls == 1
+
+
+def test_invalidating_another_key_does_not_discard_a_load():
+    store, load = AsyncTTLCache("t"), Loader(delay=0.01)
+
+    async def run():
+        pending = asyncio.ensure_future(store.get_or_load("k", load))
+        await asyncio.sleep(0)
+        store.invalidate("other")
+        await pending
+        return await store.get_or_load("k", load)
+
+    assert asyncio.run(run()) == "v"
+    assert (load.calls, store.hits) == (1, 1)
+
+
+def test_callers_after_an_invalidation_do_not_join_the_stale_load():
+    store = AsyncTTLCache("t")
+    stale, fresh = Loader("stale", delay=0.02), Loader("fresh")
+
+    async def run():
+        first = asyncio.ensure_future(store.get_or_load("k", stale))
+        await asyncio.sleep(0)
+        store.invalidate("k")
+        second = await store.get_or_load("k", fresh)
+        return await first, second, await store.get_or_load("k", stale)
+
+    assert asyncio.run(run()) == ("stale", "fresh", "fresh")
+    assert stale.calls == 1
@@ -0,0 +1,83 @@
+import asyncio
+import copy
+
+import pytest
+
+from catalog import CatalogError, CatalogSnapshot, CatalogStore, validate_catalog
+
+
+def catalog(**overrides):
+    data = {
+        "categories": {
+            "web": {"name": "Web", "services": [
+                {"id": "site", "name": "Site", "price_usd": 400},
+                {"id": "logo", "name": "Logo", "price_usd": 50},
+            ]},
+        },
+        "packs": [{"id": "pack", "name": "Pack", "services": ["site", "logo"], "price_usd": 420}],
+    }
+    data.update(overrides)
+    return data
+
+
+def broken(mutate):
+    data = copy.deepcopy(catalog())
+    mutate(data)
+    return data
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"categories": {}}, "at least one category"),
+    (broken(lambda d: d["categories"]["web"]["services"].append({"id": "site", "name": "Again", "price_usd": 1})),
+     "Duplicate id site"),
+    (broken(lambda d: d["categories"]["web"]["services"][0].update(price_usd=0)), "price_usd must be a positive"),
+    (broken(lambda d: d["categories"]["web"]["services"][0].update(price_usd=True)), "price_usd must be a positive"),
+    (broken(lambda d: d["packs"][0].update(services=["site", "ghost"])), "unknown services ghost"),
+    (broken(lambda d: d["packs"][0].update(id="logo")), "Duplicate id logo"),
+    (catalog(testimonials={}), "testimonials must be a list"),
+])
+def test_invalid_catalogs_are_rejected(data, message):
+    with pytest.raises(CatalogError, match=message):
+        validate_catalog(data)
+
+
+def test_pack_savings_are_computed_from_list_prices():
+    pack = CatalogSnapshot.build(catalog(), version=1).packs_by_id["pack"]
+    assert pack["savings_usd"] == 30
+    assert pack["savings"] == "Économie de 30$"
+
+
+class Source:
+    def __init__(self, data):
+        self.data = data
+
+    async def load(self):
+        return self.data
+
+
+def test_reload_publishes_only_changed_content():
+    published = []
+    store = CatalogStore(CatalogSnapshot.build(catalog(), version=1), on_change=published.append)
+    source = Source(catalog())
+    store.source = source
+
+    assert asyncio.run(store.reload()) is False
+    source.data = broken(lambda d: d["packs"][0].update(price_usd=400))
+    assert asyncio.run(store.reload()) is True
+    assert store.snapshot.version == 2
+    assert store.snapshot.packs_by_id["pack"]["savings_usd"] == 50
+    assert published == [store.snapshot]
+
+
+def test_a_rejected_update_keeps_the_current_snapshot():
+    store = CatalogStore(CatalogSnapshot.build(catalog(), version=1))
+    current = store.snapshot
+
+    async def run():
+        await store.follow(Source({"categories": {}}), interval=0)
+
+    asyncio.run(run())
+    assert store.snapshot is current
+    with pytest.raises(CatalogError):
+        store.publish({"categories": {}})
+    assert store.snapshot is current
@@ -0,0 +1,59 @@
+import gzip
+
+from starlette.requests import Request
+
+from catalog_cache import CatalogResponseCache
+
+
+def request(**headers):
+    return Request({
+        "type": "http", "method": "GET", "path": "/api/packs",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+def cache_with(payloads, publishes=1):
+    cache = CatalogResponseCache(max_age=60)
+    for _ in range(publishes):
+        cache.publish(payloads)
+    return cache
+
+
+def test_etag_depends_on_content_only():
+    first = cache_with({"packs": [{"id": "p"}]}, publishes=1)
+    second = cache_with({"packs": [{"id": "p"}]}, publishes=3)
+    changed = cache_with({"packs": [{"id": "q"}]})
+    assert first.get("packs").etag == second.get("packs").etag
+    assert first.get("packs").etag != changed.get("packs").etag
+
+
+def test_full_response_then_304_on_a_matching_etag():
+    cache = cache_with({"packs": [{"id": "p"}]})
+    response = cache.respond("packs", request())
+    assert response.status_code == 200
+    assert response.body == b'[{"id":"p"}]'
+    etag = response.headers["etag"]
+
+    revalidated = cache.respond("packs", request(if_none_match=etag))
+    assert revalidated.status_code == 304
+    assert revalidated.body == b""
+    assert revalidated.headers["etag"] == etag
+
+
+def test_304_for_weak_and_other_coding_etags():
+    cache = cache_with({"packs": [{"id": "p"}]})
+    gzipped = cache.respond("packs", request(accept_encoding="gzip"))
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzipped.body) == b'[{"id":"p"}]'
+
+    for if_none_match in (f'W/{gzipped.headers["etag"]}', f'"other", {gzipped.headers["etag"]}', "*"):
+        assert cache.respond("packs", request(if_none_match=if_none_match)).status_code == 304
+
+
+def test_stale_etag_gets_the_new_body():
+    cache = cache_with({"packs": [{"id": "p"}]})
+    etag = cache.respond("packs", request()).headers["etag"]
+    cache.publish({"packs": [{"id": "q"}]})
+    response = cache.respond("packs", request(if_none_match=etag))
+    assert response.status_code == 200
+    assert response.body == b'[{"id":"q"}]'
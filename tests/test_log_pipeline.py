@@ -0,0 +1,51 @@
+import logging
+import threading
+import time
+
+from log_pipeline import LogPipeline, SamplingFilter
+
+
+class SlowOutput(logging.Handler):
+    """Holds the listener thread on its first record until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.busy = threading.Event()
+        self.resume = threading.Event()
+
+    def emit(self, record):
+        if not self.busy.is_set():
+            self.busy.set()
+            self.resume.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def test_a_full_queue_drops_records_and_reports_them_once():
+    output = SlowOutput()
+    pipeline = LogPipeline(output, 1, SamplingFilter())
+    logger = logging.getLogger("test.log_pipeline")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(pipeline.handler)
+    pipeline.start()
+    try:
+        logger.info("first")
+        assert output.busy.wait(5)
+        logger.info("queued")
+        logger.info("lost %d", 1)
+        logger.info("lost %d", 2)
+        assert pipeline.dropped == 2
+        assert pipeline.depth == 1
+
+        output.resume.set()
+        deadline = time.monotonic() + 5
+        while pipeline.depth and time.monotonic() < deadline:
+            time.sleep(0.001)
+        logger.info("after")
+    finally:
+        output.resume.set()
+        pipeline.stop()
+        logger.removeHandler(pipeline.handler)
+
+    assert output.messages == ["first", "2 log records dropped, queue full", "queued", "after"]
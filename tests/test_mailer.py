@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+
+from bench.memory_db import MemoryDatabase
+from mailer import MailError, MailTransport, MailWorker, MemoryTransport, TransientMailError
+
+
+class FailingTransport(MailTransport):
+    batch_size = 10
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    async def send(self, to_email, messages):
+        raise self.error
+
+
+def outbox_doc(doc_id, **fields):
+    now = datetime.now(timezone.utc)
+    return {
+        "id": doc_id, "to": "a@x.co", "subject": "s", "html": "<p>h</p>",
+        "status": "pending", "attempts": 0, "next_attempt_at": now, "created_at": now, **fields,
+    }
+
+
+def stored(db, doc_id):
+    return asyncio.run(db.outbox.find_one({"id": doc_id}, {"_id": 0}))
+
+
+def deliver(worker, docs):
+    asyncio.run(worker.outbox.insert_many([dict(doc) for doc in docs]))
+    asyncio.run(worker._deliver(docs))
+
+
+def test_transient_failure_is_retried_with_jittered_backoff():
+    db = MemoryDatabase()
+    worker = MailWorker(db.outbox, FailingTransport(TransientMailError("429")), backoff_base=2)
+    before = datetime.now(timezone.utc)
+    deliver(worker, [outbox_doc("m1", status="sending", locked_until=before)])
+
+    doc = stored(db, "m1")
+    assert (doc["status"], doc["attempts"], doc["last_error"]) == ("pending", 1, "429")
+    assert "locked_until" not in doc
+    assert before + timedelta(seconds=1) <= doc["next_attempt_at"] <= datetime.now(timezone.utc) + timedelta(seconds=2)
+
+
+def test_backoff_is_capped():
+    db = MemoryDatabase()
+    worker = MailWorker(db.outbox, FailingTransport(TransientMailError("down")), max_attempts=50,
+                        backoff_base=2, backoff_max=30)
+    deliver(worker, [outbox_doc("m1", attempts=20)])
+    delay = stored(db, "m1")["next_attempt_at"] - datetime.now(timezone.utc)
+    assert delay <= timedelta(seconds=30)
+
+
+def test_gives_up_after_max_attempts():
+    db = MemoryDatabase()
+    worker = MailWorker(db.outbox, FailingTransport(TransientMailError("down")), max_attempts=3)
+    deliver(worker, [outbox_doc("m1", attempts=2)])
+    assert stored(db, "m1")["status"] == "failed"
+    assert worker.failed == 1
+
+
+def test_permanent_failure_is_not_retried():
+    db = MemoryDatabase()
+    worker = MailWorker(db.outbox, FailingTransport(MailError("bad address")))
+    deliver(worker, [outbox_doc("m1")])
+    assert stored(db, "m1")["status"] == "failed"
+
+
+def test_claims_due_messages_and_expired_leases_only():
+    db = MemoryDatabase()
+    now = datetime.now(timezone.utc)
+    asyncio.run(db.outbox.insert_many([
+        outbox_doc("due"),
+        outbox_doc("later", next_attempt_at=now + timedelta(minutes=5)),
+        outbox_doc("expired", status="sending", locked_until=now - timedelta(seconds=1)),
+        outbox_doc("leased", status="sending", locked_until=now + timedelta(minutes=1)),
+        outbox_doc("done", status="sent"),
+    ]))
+    worker = MailWorker(db.outbox, MemoryTransport(), lease_seconds=60)
+
+    claimed = asyncio.run(worker._claim_due())
+    assert sorted(doc["id"] for doc in claimed) == ["due", "expired"]
+    assert {doc["status"] for doc in claimed} == {"sending"}
+    assert stored(db, "expired")["locked_until"] > now + timedelta(seconds=30)
+    # Leased now, so a second poller gets nothing
+    assert asyncio.run(MailWorker(db.outbox, MemoryTransport())._claim_due()) == []
+
+
+def test_claim_is_bounded_by_max_batch():
+    db = MemoryDatabase()
+    asyncio.run(db.outbox.insert_many([outbox_doc(f"m{i}") for i in range(5)]))
+    worker = MailWorker(db.outbox, MemoryTransport(), max_batch=2)
+    assert len(asyncio.run(worker._claim_due())) == 2
+    assert len(asyncio.run(worker._claim_due())) == 2
+
+
+def test_worker_delivers_queued_messages_before_stopping():
+    db = MemoryDatabase()
+    transport = MemoryTransport()
+    worker = MailWorker(db.outbox, transport, poll_interval=0.01)
+
+    async def run():
+        await worker.start()
+        await worker.enqueue_many([("a@x.co", "s1", "h1"), ("a@x.co", "s2", "h2"), ("b@x.co", "s3", "h3")])
+        await worker.stop()
+
+    asyncio.run(run())
+    assert sorted(message["subject"] for _, message in transport.sent) == ["s1", "s2", "s3"]
+    assert asyncio.run(db.outbox.count_documents({"status": "sent"})) == 3
+    assert worker.queue is None
@@ -0,0 +1,66 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from bench.memory_db import MemoryDatabase
+from pagination import InvalidCursor, decode_cursor, encode_cursor, fetch_page
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_cursor_round_trips_a_datetime():
+    created_at = START + timedelta(microseconds=123)
+    assert decode_cursor(encode_cursor({"created_at": created_at, "id": "q1"})) == (created_at, "q1")
+
+
+def test_cursor_round_trips_a_legacy_string():
+    assert decode_cursor(encode_cursor({"created_at": "2023-05-01T10:00:00", "id": "q1"})) == ("2023-05-01T10:00:00", "q1")
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor({"created_at": START, "id": "?/+=" * 5})
+    assert not set(cursor) & set("+/=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'["2024-01-01", 5, false]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "q1", true]').decode(),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def _page_through(collection, limit):
+    async def run():
+        seen, cursor = [], None
+        while True:
+            docs, cursor = await fetch_page(collection, {}, cursor, limit, {"_id": 0})
+            seen.extend(doc["id"] for doc in docs)
+            if cursor is None:
+                return seen
+    return asyncio.run(run())
+
+
+def test_pages_cover_every_document_once_newest_first():
+    db = MemoryDatabase()
+    # Ties on created_at are broken by id
+    docs = [{"id": f"c{i:02d}", "created_at": START + timedelta(minutes=i // 3)} for i in range(25)]
+    asyncio.run(db.contacts.insert_many([dict(d) for d in docs]))
+    expected = [d["id"] for d in sorted(docs, key=lambda d: (d["created_at"], d["id"]), reverse=True)]
+    for limit in (1, 4, 25, 100):
+        assert _page_through(db.contacts, limit) == expected
+
+
+def test_paging_runs_from_datetimes_into_legacy_strings():
+    db = MemoryDatabase()
+    asyncio.run(db.contacts.insert_many([
+        {"id": "new", "created_at": START},
+        {"id": "newer", "created_at": START + timedelta(days=1)},
+        {"id": "legacy", "created_at": "2023-01-01T00:00:00"},
+    ]))
+    assert _page_through(db.contacts, 1) == ["newer", "new", "legacy"]
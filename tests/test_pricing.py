@@ -0,0 +1,94 @@
+import itertools
+import json
+from pathlib import Path
+
+import pytest
+
+from pricing import PricingEngine, UnknownServiceError
+
+CATALOG = json.loads((Path(__file__).resolve().parent.parent / "backend" / "catalog.json").read_text(encoding="utf-8"))
+
+SERVICES = {
+    "design": {"name": "Design", "services": [
+        {"id": "a", "name": "A", "price_usd": 100},
+        {"id": "b", "name": "B", "price_usd": 100},
+        {"id": "c", "name": "C", "price_usd": 100},
+        {"id": "d", "name": "D", "price_usd": 40},
+    ]},
+}
+PACKS = [
+    {"id": "ab", "name": "AB", "services": ["a", "b"], "price_usd": 150},
+    {"id": "bc", "name": "BC", "services": ["b", "c"], "price_usd": 150},
+    {"id": "abc", "name": "ABC", "services": ["a", "b", "c"], "price_usd": 260},
+    {"id": "cd", "name": "CD", "services": ["c", "d"], "price_usd": 150},
+]
+
+
+def brute_force(engine: PricingEngine, basket) -> float:
+    """Cheapest cover found by trying every subset of packs"""
+    requested = set(basket)
+    best = sum(engine.services[s].price_usd for s in requested)
+    packs = list(engine.packs.values())
+    for size in range(1, len(packs) + 1):
+        for chosen in itertools.combinations(packs, size):
+            covered = set().union(*(p.services for p in chosen))
+            cost = sum(p.price_usd for p in chosen) + sum(engine.services[s].price_usd for s in requested - covered)
+            best = min(best, cost)
+    return best
+
+
+def test_single_service_is_sold_alone():
+    breakdown = PricingEngine(SERVICES, PACKS).price(["d"])
+    assert breakdown.packs == ()
+    assert [s.id for s in breakdown.items] == ["d"]
+    assert breakdown.total_usd == 40
+
+
+def test_picks_the_cheapest_mix_of_packs_and_services():
+    breakdown = PricingEngine(SERVICES, PACKS).price(["a", "b", "c"])
+    # AB + C (250) beats ABC (260) and three services (300)
+    assert [p.id for p in breakdown.packs] == ["ab"]
+    assert [s.id for s in breakdown.items] == ["c"]
+    assert breakdown.total_usd == 250
+    assert breakdown.list_price_usd == 300
+
+
+def test_ignores_packs_that_cost_more_than_their_covered_services():
+    # CD covers only c here and costs more than c alone
+    breakdown = PricingEngine(SERVICES, PACKS).price(["c"])
+    assert breakdown.packs == ()
+    assert breakdown.total_usd == 100
+
+
+def test_pack_ids_expand_to_their_services():
+    engine = PricingEngine(SERVICES, PACKS)
+    assert engine.canonical(["cd", "a", "a"]) == ("a", "c", "d")
+
+
+def test_unknown_ids_are_reported_sorted():
+    with pytest.raises(UnknownServiceError) as info:
+        PricingEngine(SERVICES, PACKS).price(["zz", "a", "yy"])
+    assert info.value.unknown == ["yy", "zz"]
+
+
+def test_order_and_duplicates_share_one_cached_result():
+    engine = PricingEngine(SERVICES, PACKS)
+    assert engine.price(["c", "a", "b"]) is engine.price(["a", "b", "c", "a"])
+    assert engine.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4])
+def test_matches_brute_force_on_every_small_basket(size):
+    engine = PricingEngine(SERVICES, PACKS)
+    for basket in itertools.combinations(["a", "b", "c", "d"], size):
+        assert engine.price(basket).total_usd == brute_force(engine, basket)
+
+
+def test_matches_brute_force_on_the_shipped_catalog():
+    engine = PricingEngine(CATALOG["categories"], CATALOG["packs"])
+    for pack in CATALOG["packs"]:
+        basket = list(pack["services"]) + ["ssl", "logo"]
+        breakdown = engine.price(basket)
+        assert breakdown.total_usd == pytest.approx(brute_force(engine, engine.canonical(basket)))
+        covered = set().union(*(p.services for p in breakdown.packs)) | {s.id for s in breakdown.items}
+        assert covered == set(engine.canonical(basket))
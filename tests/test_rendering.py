@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from rendering import NotificationRenderer
+
+TEMPLATES = Path(__file__).resolve().parent.parent / "backend" / "templates"
+SCRIPT = "<script>alert(1)</script>"
+CREATED = datetime(2026, 1, 5, 9, 30, tzinfo=timezone.utc).isoformat()
+
+
+@pytest.fixture
+def renderer():
+    return NotificationRenderer(TEMPLATES, lambda service_id: None)
+
+
+def quote(**fields):
+    return {
+        "id": "q1", "client_name": "Ana", "client_email": "ana@example.com", "services": ["web"],
+        "total_usd": 100, "total_fc": 280000, "created_at": CREATED, **fields,
+    }
+
+
+def test_contact_fields_are_escaped(renderer):
+    html = renderer.contact_notification({
+        "name": SCRIPT, "email": "a@example.com", "phone": None,
+        "message": 'line one <b>\n"two" & <img src=x>', "created_at": CREATED,
+    })
+    assert SCRIPT not in html and "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+    assert "<img" not in html and "<b>" not in html
+    assert "line one &lt;b&gt;<br>\n&#34;two&#34; &amp; &lt;img src=x&gt;" in html
+
+
+def test_quote_names_and_notes_are_escaped(renderer):
+    html = renderer.quote_notification(quote(client_name=SCRIPT, company_name="<i>Acme</i>", notes=f"a\n{SCRIPT}"))
+    assert SCRIPT not in html and "<i>Acme" not in html
+    assert "&lt;i&gt;Acme&lt;/i&gt;" in html
+    assert "a<br>\n&lt;script&gt;" in html
+
+
+def test_service_names_are_escaped(renderer):
+    html = renderer.quote_document(quote(services=[SCRIPT]))
+    assert SCRIPT not in html and "&lt;script&gt;" in html
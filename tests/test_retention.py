@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from analytics import QuoteRollups
+from bench.memory_db import MemoryDatabase
+from retention import (
+    ARCHIVE_COLLECTION, RetentionPolicy, acquire_lease, apply_retention, archive_batch, build_chunk,
+    chunk_documents, find_archived, iter_archived, parse_policies,
+)
+
+NOW = datetime.now(timezone.utc)
+POLICY = RetentionPolicy("quotes", 365)
+
+
+def seed(db, ages_in_days):
+    docs = [
+        {"id": f"q{i:02d}", "services": ["logo"], "total_usd": 50, "created_at": NOW - timedelta(days=age)}
+        for i, age in enumerate(ages_in_days)
+    ]
+    asyncio.run(db.quotes.insert_many([dict(doc) for doc in docs]))
+    return docs
+
+
+def test_parse_policies():
+    assert parse_policies("quotes=730, contacts=365,") == [RetentionPolicy("quotes", 730), RetentionPolicy("contacts", 365)]
+    assert parse_policies("") == []
+
+
+def test_only_expired_documents_move_to_the_archive():
+    db = MemoryDatabase()
+    seed(db, [800, 700, 400, 100, 10])
+    assert asyncio.run(apply_retention(db, [POLICY], batch_size=2)) == {"quotes": 3}
+    hot = asyncio.run(db.quotes.find({}, {"_id": 0, "id": 1}).to_list(None))
+    assert sorted(doc["id"] for doc in hot) == ["q03", "q04"]
+
+
+def test_archived_records_keep_their_content():
+    db = MemoryDatabase()
+    docs = seed(db, [800, 700, 100])
+    asyncio.run(apply_retention(db, [POLICY]))
+    found = asyncio.run(find_archived(db, "quotes", "q01"))
+    assert found["services"] == ["logo"]
+    # Stored at BSON millisecond precision, read back timezone-aware
+    assert abs(found["created_at"] - docs[1]["created_at"]) < timedelta(milliseconds=1)
+    assert asyncio.run(find_archived(db, "quotes", "q02")) is None
+
+
+def test_chunks_group_documents_by_month():
+    db = MemoryDatabase()
+    seed(db, [800, 798, 500])
+    asyncio.run(apply_retention(db, [POLICY]))
+    chunks = asyncio.run(db[ARCHIVE_COLLECTION].find({}).to_list(None))
+    months = {chunk["month"] for chunk in chunks}
+    assert len(chunks) == len(months)
+    assert sum(chunk["count"] for chunk in chunks) == 3
+    for chunk in chunks:
+        assert [doc["id"] for doc in chunk_documents(chunk)] == chunk["ids"]
+
+
+def test_iter_archived_filters_by_window_and_predicate():
+    db = MemoryDatabase()
+    seed(db, [900, 800, 700, 600])
+    asyncio.run(apply_retention(db, [POLICY]))
+
+    async def collect(**kwargs):
+        return [doc["id"] async for doc in iter_archived(db, "quotes", **kwargs)]
+
+    assert asyncio.run(collect()) == ["q00", "q01", "q02", "q03"]
+    window = {"since": NOW - timedelta(days=850), "until": NOW - timedelta(days=650)}
+    assert asyncio.run(collect(**window)) == ["q01", "q02"]
+    assert asyncio.run(collect(predicate=lambda doc: doc["id"] != "q02")) == ["q00", "q01", "q03"]
+
+
+def test_rerunning_an_interrupted_batch_does_not_duplicate_chunks():
+    db = MemoryDatabase()
+    docs = seed(db, [800, 790])
+    cutoff = NOW - timedelta(days=365)
+    # The archive write of a run that died before its delete
+    month_docs = {}
+    for doc in docs:
+        month_docs.setdefault(doc["created_at"].strftime("%Y-%m"), []).append(doc)
+    for month, group in month_docs.items():
+        chunk = build_chunk("quotes", month, group)
+        asyncio.run(db[ARCHIVE_COLLECTION].insert_one(chunk))
+
+    assert asyncio.run(archive_batch(db, POLICY, cutoff, 10)) == 2
+    assert asyncio.run(db[ARCHIVE_COLLECTION].count_documents({})) == len(month_docs)
+    assert asyncio.run(db.quotes.count_documents({})) == 0
+
+
+def test_lease_admits_one_runner_at_a_time():
+    db = MemoryDatabase()
+    assert asyncio.run(acquire_lease(db, "a", 60))
+    assert not asyncio.run(acquire_lease(db, "b", 60))
+    assert asyncio.run(acquire_lease(db, "a", 60))
+    assert asyncio.run(apply_retention(db, [POLICY])) == {}
+
+
+def test_rollup_rebuild_counts_archived_quotes_once():
+    db = MemoryDatabase()
+    seed(db, [800, 700, 400, 100])
+    asyncio.run(apply_retention(db, [POLICY]))
+    # An archived quote an interrupted run left in the hot collection too
+    asyncio.run(db.quotes.insert_one(asyncio.run(find_archived(db, "quotes", "q00"))))
+
+    rollups = QuoteRollups(db.quote_stats, lambda service_id: 50, lambda service_id: "design")
+    assert asyncio.run(rollups.rebuild(db.quotes, batch_size=2)) == 4
+    totals = asyncio.run(rollups.query())["totals"]
+    assert totals == {"quotes": 4, "revenue_usd": 200.0}
@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from bench.memory_db import MemoryDatabase
+from spool import NOTIFIED_COLLECTION, CircuitBreaker, CircuitOpenError, SpoolFullError, SpoolReplayer, WriteSpool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def call(breaker, operation):
+    async def run():
+        return await breaker.call(operation)
+    return asyncio.run(run())
+
+
+async def ok():
+    return "ok"
+
+
+async def down():
+    raise ServerSelectionTimeoutError("no servers")
+
+
+def test_breaker_opens_after_consecutive_failures_and_short_circuits():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(3):
+        with pytest.raises(ServerSelectionTimeoutError):
+            call(breaker, down)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 1
+
+    calls = []
+
+    async def tracked():
+        calls.append(1)
+
+    with pytest.raises(CircuitOpenError):
+        call(breaker, tracked)
+    assert calls == []
+
+
+def test_breaker_probes_once_after_reset_timeout():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    with pytest.raises(ServerSelectionTimeoutError):
+        call(breaker, down)
+    clock.now = 9
+    assert not breaker.ready()
+    clock.now = 10
+    assert breaker.ready()
+
+    # A failed probe opens it again for another reset_timeout
+    with pytest.raises(ServerSelectionTimeoutError):
+        call(breaker, down)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now = 20
+    assert call(breaker, ok) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_only_one_probe_at_a_time():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_slow_and_timed_out_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, slow_call=0.5)
+    breaker.record_success(0.6)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(hang, timeout=0.01)
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_document_errors_do_not_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    async def duplicate():
+        raise DuplicateKeyError("E11000")
+
+    with pytest.raises(DuplicateKeyError):
+        call(breaker, duplicate)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def open_spool(tmp_path, **kwargs) -> WriteSpool:
+    spool = WriteSpool(tmp_path, **kwargs)
+    spool.open()
+    return spool
+
+
+def test_spool_round_trips_documents_per_collection(tmp_path):
+    spool = open_spool(tmp_path)
+    created_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    asyncio.run(spool.append_many("quotes", [{"id": "q1", "created_at": created_at}, {"id": "q2", "created_at": created_at}]))
+    asyncio.run(spool.append("contacts", {"id": "c1", "created_at": created_at}))
+    assert spool.spooled == 3
+
+    path, records = spool.oldest_segment()
+    assert records == {
+        "quotes": [{"id": "q1", "created_at": created_at}, {"id": "q2", "created_at": created_at}],
+        "contacts": [{"id": "c1", "created_at": created_at}],
+    }
+    spool.remove(path)
+    assert spool.size == 0
+    assert spool.oldest_segment() is None
+
+
+def test_spool_refuses_appends_past_max_bytes(tmp_path):
+    spool = open_spool(tmp_path, max_bytes=200)
+    asyncio.run(spool.append("contacts", {"id": "c1"}))
+    with pytest.raises(SpoolFullError):
+        asyncio.run(spool.append_many("contacts", [{"id": f"c{i}", "message": "x" * 50} for i in range(5)]))
+    assert spool.spooled == 1
+
+
+def test_spool_skips_a_torn_last_line(tmp_path):
+    spool = open_spool(tmp_path)
+    asyncio.run(spool.append("contacts", {"id": "c1"}))
+    spool.close()
+    segment = next(spool.directory.glob("*.jsonl"))
+    with open(segment, "ab") as f:
+        f.write(b'{"collection": "contacts", "doc": {"id": "c')
+    _, records = spool.oldest_segment()
+    assert records == {"contacts": [{"id": "c1"}]}
+
+
+def replayer(tmp_path, db, notified):
+    async def on_replayed(collection, docs):
+        notified.extend((collection, doc["id"]) for doc in docs)
+
+    spool = open_spool(tmp_path)
+    return spool, SpoolReplayer(spool, CircuitBreaker(), db, on_replayed=on_replayed, batch_size=2)
+
+
+def test_replay_inserts_and_notifies_each_document_once(tmp_path):
+    db, notified = MemoryDatabase(), []
+    spool, replay = replayer(tmp_path, db, notified)
+
+    async def run():
+        # q1's timed-out insert landed before it was spooled
+        await db.quotes.insert_one({"id": "q1", "client_name": "A"})
+        await spool.append_many("quotes", [{"id": "q1", "client_name": "A"}, {"id": "q2"}, {"id": "q3"}])
+        assert await replay.drain_once()
+        # The same documents spooled again, e.g. a segment replayed after a crash
+        await spool.append_many("quotes", [{"id": "q2"}, {"id": "q3"}])
+        assert await replay.drain_once()
+        return await db.quotes.find({}, {"_id": 0}).to_list(None)
+
+    docs = asyncio.run(run())
+    assert sorted(doc["id"] for doc in docs) == ["q1", "q2", "q3"]
+    assert sorted(notified) == [("quotes", "q1"), ("quotes", "q2"), ("quotes", "q3")]
+    assert replay.replayed == 3
+    assert spool.size == 0
+
+
+def test_replay_waits_for_the_breaker_and_keeps_the_segment(tmp_path):
+    db, notified = MemoryDatabase(), []
+    spool, replay = replayer(tmp_path, db, notified)
+    clock = Clock()
+    replay.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    replay.breaker.record_failure()
+
+    async def run():
+        await spool.append("contacts", {"id": "c1"})
+        assert not await replay.drain_once()
+        assert await db.contacts.count_documents({}) == 0
+        clock.now = 10
+        assert await replay.drain_once()
+        return await db.contacts.count_documents({})
+
+    assert asyncio.run(run()) == 1
+    assert notified == [("contacts", "c1")]
+
+
+def test_replay_markers_stay_out_of_the_records(tmp_path):
+    db, notified = MemoryDatabase(), []
+    spool, replay = replayer(tmp_path, db, notified)
+
+    async def run():
+        await spool.append("contacts", {"id": "c1", "name": "A"})
+        await replay.drain_once()
+        record = await db.contacts.find_one({"id": "c1"}, {"_id": 0})
+        markers = await db[NOTIFIED_COLLECTION].find({}).to_list(None)
+        return record, markers
+
+    record, markers = asyncio.run(run())
+    assert record == {"id": "c1", "name": "A"}
+    assert [marker["_id"] for marker in markers] == ["contacts:c1"]
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from bench.memory_db import MemoryDatabase
+from write_coalescer import WriteCoalescer
+
+
+def contacts_with_unique_id():
+    db = MemoryDatabase()
+    asyncio.run(db.contacts.create_indexes([IndexModel([("id", 1)], name="id_unique", unique=True)]))
+    return db.contacts
+
+
+def test_concurrent_inserts_share_one_batch():
+    collection = contacts_with_unique_id()
+    coalescer = WriteCoalescer(collection, max_batch=10, max_delay=0.01)
+
+    async def run():
+        await asyncio.gather(*(coalescer.insert({"id": f"c{i}"}) for i in range(4)))
+        return await collection.count_documents({})
+
+    assert asyncio.run(run()) == 4
+    assert (coalescer.batches, coalescer.documents) == (1, 4)
+
+
+def test_a_full_batch_is_written_without_waiting_for_the_delay():
+    collection = contacts_with_unique_id()
+    coalescer = WriteCoalescer(collection, max_batch=2, max_delay=60)
+
+    async def run():
+        await asyncio.wait_for(asyncio.gather(coalescer.insert({"id": "a"}), coalescer.insert({"id": "b"})), 1)
+
+    asyncio.run(run())
+    assert coalescer.batches == 1
+
+
+def test_each_caller_gets_its_own_write_error():
+    collection = contacts_with_unique_id()
+    asyncio.run(collection.insert_one({"id": "taken"}))
+    coalescer = WriteCoalescer(collection, max_batch=10, max_delay=0.01)
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.insert({"id": "new"}), coalescer.insert({"id": "taken"}), coalescer.insert({"id": "other"}),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], DuplicateKeyError)
+    assert asyncio.run(collection.count_documents({})) == 3
+
+
+def test_a_failed_batch_fails_every_caller():
+    collection = contacts_with_unique_id()
+
+    async def down(docs, ordered=True):
+        raise ServerSelectionTimeoutError("no servers")
+
+    collection.insert_many = down
+    coalescer = WriteCoalescer(collection, max_batch=10, max_delay=0.01)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.insert({"id": f"c{i}"}) for i in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ServerSelectionTimeoutError) for r in asyncio.run(run()))
+
+
+def test_stop_drains_pending_inserts_then_writes_directly():
+    collection = contacts_with_unique_id()
+    coalescer = WriteCoalescer(collection, max_batch=100, max_delay=60)
+
+    async def run():
+        pending = [asyncio.ensure_future(coalescer.insert({"id": f"c{i}"})) for i in range(3)]
+        await asyncio.sleep(0)
+        assert coalescer.pending == 3
+        await coalescer.stop()
+        await asyncio.gather(*pending)
+        await coalescer.insert({"id": "late"})
+        return await collection.count_documents({})
+
+    assert asyncio.run(run()) == 4
+    assert coalescer.batches == 1
+
+    with pytest.raises(DuplicateKeyError):
+        asyncio.run(coalescer.insert({"id": "late"}))